@@ -5,19 +5,27 @@ Supports Postgres via `DATABASE_URL` (psycopg) and falls back to SQLite using `U
 """
 import os
 import json
+import time
+import hashlib
 from datetime import datetime, timedelta
+from collections import OrderedDict
 from typing import Optional
 from contextlib import contextmanager
 from pathlib import Path
 from pathlib import Path as _Path
 import sqlite3
-import requests
+import threading
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import bcrypt
 from jose import JWTError, jwt
 from pydantic import BaseModel, EmailStr
 
+from Backend import http_client
+from Backend.cache import TTLCache
+from Backend.shared_cache import shared_store
+from Backend.http_client import UpstreamError
+
 # Try to auto-load a .env file from the repository root if python-dotenv is present.
 try:
     from dotenv import load_dotenv as _load_dotenv
@@ -35,11 +43,25 @@ try:
 except Exception:
     HAS_PSYCOPG = False
 
+# Optional Postgres pool; without it every get_conn() opens a new connection
+try:
+    from psycopg_pool import ConnectionPool
+    HAS_PSYCOPG_POOL = True
+except Exception:
+    HAS_PSYCOPG_POOL = False
+
 # ---------------- CONFIG ----------------
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production-2026")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# Validated Supabase tokens are reused until their `exp` (at most this many seconds)
+AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "1024"))
+# Local user rows (with favorites) by email; dropped on every write to that user
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+
 security = HTTPBearer()
 
 # ---------------- Supabase config (optional) ----------------
@@ -63,24 +85,109 @@ else:
     print(f"AUTH: ⚠️  SQLite is EPHEMERAL on Render - data will be lost on redeploy!")
     print(f"AUTH: ⚠️  Set DATABASE_URL to your Supabase PostgreSQL connection string")
 
+# Postgres pool sizing and recycling (connections are health-checked before use)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))            # seconds to wait for a free connection
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))  # recycle connections after this long
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))         # close surplus connections idle this long
+# Statements executed this many times on a connection are prepared server-side.
+# Set to "off" behind a transaction-mode pooler that cannot keep prepared statements.
+DB_PREPARE_THRESHOLD = os.getenv("DB_PREPARE_THRESHOLD", "1")
+
+_pool = None
+_pool_lock = threading.Lock()
+_sqlite_local = threading.local()
+
+
+def _pg_connect_kwargs() -> dict:
+    if DB_PREPARE_THRESHOLD.strip().lower() in ("off", "none", ""):
+        return {"prepare_threshold": None}
+    return {"prepare_threshold": int(DB_PREPARE_THRESHOLD)}
+
+
+def _get_pool():
+    """Create the Postgres pool on first use (shared by every thread)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    DATABASE_URL,
+                    min_size=DB_POOL_MIN,
+                    max_size=max(DB_POOL_MAX, DB_POOL_MIN),
+                    timeout=DB_POOL_TIMEOUT,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    max_idle=DB_POOL_MAX_IDLE,
+                    kwargs=_pg_connect_kwargs(),
+                    check=ConnectionPool.check_connection,
+                    name="auth",
+                    open=True,
+                )
+                print(f"AUTH: Postgres pool opened (min={DB_POOL_MIN}, max={DB_POOL_MAX})")
+    return _pool
+
+
+def close_pool():
+    """Close the Postgres pool (app shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def _sqlite_conn() -> sqlite3.Connection:
+    """One SQLite connection per thread, in WAL mode so readers never block the writer."""
+    conn = getattr(_sqlite_local, "conn", None)
+    if conn is None or getattr(_sqlite_local, "pid", None) != os.getpid():
+        # New thread, or a connection inherited across fork (never reused)
+        conn = sqlite3.connect(USERS_DB_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _sqlite_local.conn, _sqlite_local.pid = conn, os.getpid()
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
 @contextmanager
 def get_conn():
-    """Yield a tuple (conn, is_pg). If DATABASE_URL is set, returns a psycopg connection."""
+    """
+    Yield a tuple (conn, is_pg). If DATABASE_URL is set, returns a pooled psycopg connection;
+    otherwise this thread's SQLite connection. Either way the open transaction is committed
+    when the block exits normally and rolled back on error.
+    """
     if DATABASE_URL:
         if not HAS_PSYCOPG:
             raise RuntimeError("psycopg is required to use DATABASE_URL. Install psycopg[binary].")
-        conn = psycopg.connect(DATABASE_URL)
-        try:
+        if not HAS_PSYCOPG_POOL:
+            conn = psycopg.connect(DATABASE_URL, **_pg_connect_kwargs())
+            try:
+                yield conn, True
+            finally:
+                conn.close()
+            return
+        # Returned to the pool (and replaced if broken) when the block exits
+        with _get_pool().connection() as conn:
             yield conn, True
-        finally:
-            conn.close()
     else:
-        conn = sqlite3.connect(USERS_DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = _sqlite_conn()
         try:
             yield conn, False
-        finally:
-            conn.close()
+        except BaseException:
+            conn.rollback()
+            raise
+        if conn.in_transaction:
+            conn.commit()
+
+
+def db_pool_stats() -> dict:
+    """Pool counters for the debug endpoints."""
+    if not DATABASE_URL:
+        return {"backend": "sqlite", "mode": "per-thread connection (WAL)"}
+    if _pool is None:
+        return {"backend": "postgres", "pooled": HAS_PSYCOPG_POOL, "open": False}
+    return {"backend": "postgres", "pooled": True, "open": True, **_pool.get_stats()}
 
 # ---------------- Pydantic models ----------------
 class UserRegister(BaseModel):
@@ -195,6 +302,11 @@ try:
     init_db()
 except Exception as e:
     print(f"DB init warning: {e}")
+# Workers forked after import (gunicorn --preload) must open their own connections
+close_pool()
+if getattr(_sqlite_local, "conn", None) is not None:
+    _sqlite_local.conn.close()
+    _sqlite_local.conn = None
 
 # ---------------- Password & JWT helpers ----------------
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -237,7 +349,7 @@ def decode_token(token: str) -> dict:
 
 
 # ---------------- Supabase helper functions ----------------
-def supabase_admin_create_user(email: str, password: str, name: Optional[str] = None) -> dict:
+async def supabase_admin_create_user(email: str, password: str, name: Optional[str] = None) -> dict:
     """Create a user via Supabase Admin API. Requires SUPABASE_SERVICE_ROLE_KEY."""
     # If service role key is available, use admin endpoint (recommended for server-side creation)
     if SUPABASE_SERVICE_AVAILABLE:
@@ -251,8 +363,8 @@ def supabase_admin_create_user(email: str, password: str, name: Optional[str] =
             "apikey": SUPABASE_SERVICE_ROLE_KEY,
         }
         try:
-            r = requests.post(url, data=json.dumps(payload), headers=headers, timeout=10)
-        except requests.RequestException as req_err:
+            r = await http_client.request("POST", url, content=json.dumps(payload), headers=headers, timeout=10)
+        except UpstreamError as req_err:
             raise HTTPException(status_code=502, detail={"supabase_error": str(req_err)})
         if r.status_code not in (200, 201):
             try:
@@ -270,8 +382,8 @@ def supabase_admin_create_user(email: str, password: str, name: Optional[str] =
             payload["data"] = {"name": name}
         headers = {"Content-Type": "application/json", "apikey": SUPABASE_ANON_KEY}
         try:
-            r = requests.post(url, data=json.dumps(payload), headers=headers, timeout=10)
-        except requests.RequestException as req_err:
+            r = await http_client.request("POST", url, content=json.dumps(payload), headers=headers, timeout=10)
+        except UpstreamError as req_err:
             raise HTTPException(status_code=502, detail={"supabase_error": str(req_err)})
         if r.status_code not in (200, 201):
             try:
@@ -284,7 +396,7 @@ def supabase_admin_create_user(email: str, password: str, name: Optional[str] =
     raise HTTPException(status_code=500, detail="Supabase not configured on server. Set SUPABASE_URL and SUPABASE_ANON_KEY in environment or .env")
 
 
-def supabase_sign_in(email: str, password: str) -> dict:
+async def supabase_sign_in(email: str, password: str) -> dict:
     """Sign in a user using Supabase token endpoint. Returns JSON with access_token etc."""
     if not SUPABASE_AVAILABLE:
         raise HTTPException(status_code=500, detail="Supabase not configured on server. Set SUPABASE_URL and SUPABASE_ANON_KEY in environment or .env")
@@ -293,8 +405,8 @@ def supabase_sign_in(email: str, password: str) -> dict:
     headers = {"Content-Type": "application/json", "apikey": SUPABASE_ANON_KEY}
     payload = {"email": email, "password": password}
     try:
-        r = requests.post(url, data=json.dumps(payload), headers=headers, timeout=10)
-    except requests.RequestException as req_err:
+        r = await http_client.request("POST", url, content=json.dumps(payload), headers=headers, timeout=10)
+    except UpstreamError as req_err:
         raise HTTPException(status_code=502, detail={"supabase_error": str(req_err)})
     if r.status_code != 200:
         try:
@@ -305,7 +417,7 @@ def supabase_sign_in(email: str, password: str) -> dict:
     return r.json()
 
 
-def supabase_get_user_from_token(token: str) -> Optional[dict]:
+async def supabase_get_user_from_token(token: str) -> Optional[dict]:
     """Validate an access token with Supabase and return the user object if valid."""
     if not SUPABASE_AVAILABLE:
         return None
@@ -313,8 +425,8 @@ def supabase_get_user_from_token(token: str) -> Optional[dict]:
     url = f"{SUPABASE_URL.rstrip('/')}/auth/v1/user"
     headers = {"Authorization": f"Bearer {token}", "apikey": SUPABASE_ANON_KEY}
     try:
-        r = requests.get(url, headers=headers, timeout=8)
-    except requests.RequestException:
+        r = await http_client.request("GET", url, headers=headers, timeout=8)
+    except UpstreamError:
         return None
     if r.status_code != 200:
         return None
@@ -324,35 +436,109 @@ def supabase_get_user_from_token(token: str) -> Optional[dict]:
         return None
 
 
-def ensure_local_user_from_supabase(email: str, name: Optional[str] = None) -> int:
-    """Ensure a corresponding local user record exists. Returns local user id."""
-    print(f"AUTH: ensure_local_user_from_supabase called with email={email}, name={name}")
-    existing = get_user_by_email(email)
-    if existing:
-        user_id = existing["id"] if isinstance(existing, dict) and "id" in existing else existing[0]
-        print(f"AUTH: Found existing user with id={user_id}")
-        return user_id
-
-    # Insert a placeholder password hash (random) so DB constraints are satisfied
-    # Keep password under 72 bytes for bcrypt
-    random_pw = os.urandom(16).hex()[:72]
-    pw_hash = get_password_hash(random_pw)
+def get_or_create_local_user(email: str, name: Optional[str] = None) -> dict:
+    """Local user dict for a Supabase identity, creating the record if missing (one connection)."""
     with get_conn() as (conn, is_pg):
         cur = conn.cursor()
+        user = _fetch_user(cur, is_pg, email)
+        if user:
+            return user
+
+        # Insert a placeholder password hash (random) so DB constraints are satisfied
+        # Keep password under 72 bytes for bcrypt
+        random_pw = os.urandom(16).hex()[:72]
+        pw_hash = get_password_hash(random_pw)
         if is_pg:
-            cur.execute("INSERT INTO app_users (email, name, password_hash) VALUES (%s, %s, %s) RETURNING id", (email, name or email, pw_hash))
-            user_id = cur.fetchone()[0]
-            cur.execute("INSERT INTO app_user_preferences (user_id) VALUES (%s)", (user_id,))
-            conn.commit()
-            print(f"AUTH: Created new user with id={user_id}")
-            return user_id
+            cur.execute(
+                "INSERT INTO app_users (email, name, password_hash) VALUES (%s, %s, %s) "
+                "ON CONFLICT (email) DO NOTHING RETURNING id",
+                (email, name or email, pw_hash),
+            )
+            row = cur.fetchone()
+            created = row is not None
+            if created:
+                cur.execute("INSERT INTO app_user_preferences (user_id) VALUES (%s)", (row[0],))
         else:
-            cur.execute("INSERT INTO users (email, name, password_hash) VALUES (?, ?, ?)", (email, name or email, pw_hash))
-            user_id = cur.lastrowid
-            cur.execute("INSERT INTO user_preferences (user_id) VALUES (?)", (user_id,))
-            conn.commit()
-            print(f"AUTH: Created new user with id={user_id}")
-            return user_id
+            cur.execute(
+                "INSERT OR IGNORE INTO users (email, name, password_hash) VALUES (?, ?, ?)",
+                (email, name or email, pw_hash),
+            )
+            created = cur.rowcount > 0
+            if created:
+                cur.execute("INSERT INTO user_preferences (user_id) VALUES (?)", (cur.lastrowid,))
+        conn.commit()
+        invalidate_user(email)
+        # A concurrent request may have created the user first; either way it exists now
+        user = _fetch_user(cur, is_pg, email)
+        if created:
+            print(f"AUTH: Created new user with id={user['id']}")
+        return user
+
+
+def ensure_local_user_from_supabase(email: str, name: Optional[str] = None) -> int:
+    """Ensure a corresponding local user record exists. Returns local user id."""
+    print(f"AUTH: ensure_local_user_from_supabase called with email={email}, name={name}")
+    return get_or_create_local_user(email, name)["id"]
+
+# ---------------- Auth caches ----------------
+# sha256(token) -> (expires_at, email, name) for tokens Supabase has accepted
+token_cache = TTLCache("auth_tokens", ttl=AUTH_TOKEN_CACHE_TTL, maxsize=AUTH_TOKEN_CACHE_SIZE)
+# email -> user dict from get_user_by_email (None for unknown emails). The row carries
+# favorites, so it lives in the shared store and every lookup re-reads it there
+# (local_ttl=0): a write in one worker invalidates it for all of them.
+user_cache = TTLCache(
+    "auth_users", ttl=AUTH_USER_CACHE_TTL, maxsize=AUTH_USER_CACHE_SIZE, shared=shared_store, local_ttl=0
+)
+# user id -> email of recently cached users, so writes by id can invalidate (bounded LRU)
+_user_emails: "OrderedDict[int, str]" = OrderedDict()
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _token_expiry(token: str) -> float:
+    """Unix time the token stops being reusable: its `exp` claim, capped at AUTH_TOKEN_CACHE_TTL."""
+    cap = time.time() + AUTH_TOKEN_CACHE_TTL
+    try:
+        # Signature already checked by Supabase; only the expiry is read here
+        return min(float(jwt.get_unverified_claims(token)["exp"]), cap)
+    except Exception:
+        return cap
+
+
+async def _validate_supabase_token(token: str) -> tuple:
+    """(expires_at, email, name) for a token Supabase accepts; raises 401 (never cached) otherwise."""
+    supa_user = await supabase_get_user_from_token(token)
+    if not supa_user or not supa_user.get("email"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    name = None
+    # Supabase may return user_metadata
+    try:
+        name = supa_user.get("user_metadata", {}).get("name") or supa_user.get("aud")
+    except Exception:
+        name = None
+    return _token_expiry(token), supa_user["email"], name
+
+
+def get_cached_user(email: str):
+    """get_user_by_email through the user cache."""
+    user = user_cache.get_or_load(email, lambda: get_user_by_email(email))
+    if user:
+        _user_emails[user["id"]] = email
+        _user_emails.move_to_end(user["id"])
+        while len(_user_emails) > AUTH_USER_CACHE_SIZE:
+            _user_emails.popitem(last=False)
+    return user
+
+
+def invalidate_user(email: Optional[str] = None, user_id: Optional[int] = None) -> None:
+    """Drop a cached user row after a write (by email, or by id for favorites)."""
+    if user_id is not None:
+        email = _user_emails.pop(user_id, email)
+    if email:
+        user_cache.invalidate(email)
+
 
 # ---------------- DB utility functions ----------------
 def _row_to_dict(cursor, row):
@@ -361,19 +547,42 @@ def _row_to_dict(cursor, row):
     cols = [c[0] for c in cursor.description]
     return {cols[i]: row[i] for i in range(len(cols))}
 
+# User row plus their favorites (newest first) in a single query
+_USER_SQL_PG = """
+    SELECT u.id, u.email, u.name, u.password_hash, u.created_at,
+           COALESCE((SELECT json_agg(json_build_object('city', f.city_name, 'added_at', f.added_at)
+                                     ORDER BY f.added_at DESC)
+                     FROM app_favorite_cities f WHERE f.user_id = u.id), '[]'::json) AS favorites
+    FROM app_users u WHERE u.email = %s
+"""
+_USER_SQL_SQLITE = """
+    SELECT u.*,
+           (SELECT json_group_array(json_object('city', city_name, 'added_at', added_at))
+            FROM (SELECT city_name, added_at FROM favorite_cities
+                  WHERE user_id = u.id ORDER BY added_at DESC)) AS favorites
+    FROM users u WHERE u.email = ?
+"""
+
+def _fetch_user(cur, is_pg: bool, email: str):
+    if is_pg:
+        cur.execute(_USER_SQL_PG, (email,))
+        user = _row_to_dict(cur, cur.fetchone())
+        if user and isinstance(user.get("created_at"), datetime):
+            # JSON-safe for the shared user cache (same text FastAPI would send)
+            user["created_at"] = user["created_at"].isoformat()
+        return user
+    cur.execute(_USER_SQL_SQLITE, (email,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    user = dict(row)
+    user["favorites"] = json.loads(user["favorites"] or "[]")
+    return user
+
 def get_user_by_email(email: str):
+    """User dict (including `favorites`: [{city, added_at}]) or None."""
     with get_conn() as (conn, is_pg):
-        cur = conn.cursor()
-        if is_pg:
-            cur.execute("SELECT id, email, name, password_hash, created_at FROM app_users WHERE email = %s", (email,))
-            row = cur.fetchone()
-            return _row_to_dict(cur, row)
-        else:
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM users WHERE email = ?", (email,))
-            row = cur.fetchone()
-            return dict(row) if row else None
+        return _fetch_user(conn.cursor(), is_pg, email)
 
 def create_user(email: str, name: str, password: str):
     password_hash = get_password_hash(password)
@@ -388,6 +597,7 @@ def create_user(email: str, name: str, password: str):
                 user_id = cur.fetchone()[0]
                 cur.execute("INSERT INTO app_user_preferences (user_id) VALUES (%s)", (user_id,))
                 conn.commit()
+                invalidate_user(email)
                 return user_id
             else:
                 cur.execute(
@@ -397,6 +607,7 @@ def create_user(email: str, name: str, password: str):
                 user_id = cur.lastrowid
                 cur.execute("INSERT INTO user_preferences (user_id) VALUES (?)", (user_id,))
                 conn.commit()
+                invalidate_user(email)
                 return user_id
     except Exception as e:
         if isinstance(e, sqlite3.IntegrityError) or (HAS_PSYCOPG and getattr(e, 'pgcode', None) is not None):
@@ -406,29 +617,6 @@ def create_user(email: str, name: str, password: str):
             )
         raise
 
-def get_user_favorites(user_id: int):
-    print(f"AUTH: get_user_favorites called for user_id={user_id}")
-    with get_conn() as (conn, is_pg):
-        cur = conn.cursor()
-        print(f"AUTH: Using {'PostgreSQL' if is_pg else 'SQLite'} for fetching favorites")
-        if is_pg:
-            cur.execute(
-                "SELECT city_name, added_at FROM app_favorite_cities WHERE user_id = %s ORDER BY added_at DESC",
-                (user_id,),
-            )
-            rows = cur.fetchall()
-            result = [{"city": r[0], "added_at": r[1]} for r in rows]
-            print(f"AUTH: Found {len(result)} favorites for user {user_id}: {[f['city'] for f in result]}")
-            return result
-        else:
-            cur.execute(
-                "SELECT city_name, added_at FROM favorite_cities WHERE user_id = ? ORDER BY added_at DESC",
-                (user_id,),
-            )
-            result = [{"city": row[0], "added_at": row[1]} for row in cur.fetchall()]
-            print(f"AUTH: Found {len(result)} favorites for user {user_id}: {[f['city'] for f in result]}")
-            return result
-
 def add_favorite_city(user_id: int, city_name: str):
     print(f"AUTH: add_favorite_city called with user_id={user_id}, city_name={city_name}")
     try:
@@ -441,6 +629,7 @@ def add_favorite_city(user_id: int, city_name: str):
                     (user_id, city_name),
                 )
                 conn.commit()
+                invalidate_user(user_id=user_id)
                 print(f"AUTH: Successfully added favorite {city_name} for user {user_id}")
                 return True
             else:
@@ -449,6 +638,7 @@ def add_favorite_city(user_id: int, city_name: str):
                     (user_id, city_name),
                 )
                 conn.commit()
+                invalidate_user(user_id=user_id)
                 print(f"AUTH: Successfully added favorite {city_name} for user {user_id}")
                 return True
     except Exception as e:
@@ -470,6 +660,7 @@ def remove_favorite_city(user_id: int, city_name: str):
                 (user_id, city_name),
             )
             conn.commit()
+    invalidate_user(user_id=user_id)
 
 # ---------------- Authentication dependencies (Supabase-backed) ----------------
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -482,31 +673,24 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         email = payload.get("sub")
         if email:
             # Token is a valid backend JWT, get user from database
-            user = get_user_by_email(email)
+            user = get_cached_user(email)
             if user:
                 return user
     except HTTPException:
         # Not a valid backend JWT, try Supabase validation below
         pass
     
-    # Fallback: try to validate via Supabase
-    supa_user = supabase_get_user_from_token(token)
-    if not supa_user or not supa_user.get("email"):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
-
-    email = supa_user.get("email")
-    name = None
-    # Supabase may return user_metadata
-    try:
-        name = supa_user.get("user_metadata", {}).get("name") or supa_user.get("aud")
-    except Exception:
-        name = None
-
-    # Ensure a local profile exists (creates one if missing)
-    local_id = ensure_local_user_from_supabase(email, name)
-    user = get_user_by_email(email)
+    # Fallback: validate via Supabase once per token, then reuse until it expires
+    key = _token_key(token)
+    entry, _ = token_cache.peek(key)
+    if entry is not None and entry[0] <= time.time():
+        token_cache.invalidate(key)
+    _, email, name = await token_cache.aget_or_load(key, lambda: _validate_supabase_token(token))
+
+    user = get_cached_user(email)
     if user is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        # Ensure a local profile exists (creates one if missing)
+        user = get_or_create_local_user(email, name)
     return user
 
 
@@ -0,0 +1,253 @@
+"""
+In-process Caching Module
+Thread-safe TTL cache with LRU eviction and single-flight loading (for both
+threads and asyncio tasks), so that concurrent misses for the same key produce
+exactly one upstream call.
+Entries past their TTL are kept for a grace period and served as a stale
+fallback when the loader fails.
+An optional shared store (Backend/shared_cache.py) acts as a second level
+visible to every worker process: local misses consult it before loading, and
+loaded values are written through to it.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+def _retrieve_result(task: "asyncio.Task") -> None:
+    # Every caller may have stopped waiting; consume the load's outcome quietly
+    if not task.cancelled():
+        task.exception()
+
+
+class _Flight:
+    """A load in progress; followers wait on `event` and reuse the leader's result."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class TTLCache:
+    """
+    Bounded TTL cache.
+
+    - `ttl`: seconds an entry is considered fresh.
+    - `stale_ttl`: extra seconds an expired entry is retained as a fallback.
+    - `maxsize`: maximum entries; least recently used entries are evicted first.
+    - `shared`: optional cross-process SharedStore; values must be JSON-serialisable.
+    - `local_ttl`: with a shared store, seconds this process trusts its own copy
+      before re-reading the shared one (default `ttl`; 0 makes invalidations
+      by any worker visible immediately).
+    """
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 256, stale_ttl: float = 0, shared=None,
+                 local_ttl: Optional[float] = None):
+        self.name = name
+        self.shared = shared
+        self.ttl = ttl
+        self.local_ttl = ttl if shared is None or local_ttl is None else min(local_ttl, ttl)
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._ainflight: Dict[Hashable, "asyncio.Task"] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.coalesced = 0
+        self.shared_hits = 0
+
+    # ---------------- basic operations ----------------
+    def _lookup(self, key: Hashable, now: float) -> Tuple[Optional[Any], Optional[float]]:
+        """Return (value, age) for a retained entry, dropping it if past the stale window."""
+        item = self._data.get(key)
+        if item is None:
+            return None, None
+        stored_at, value = item
+        age = now - stored_at
+        if age >= self.ttl + self.stale_ttl:
+            del self._data[key]
+            return None, None
+        return value, age
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh value or None. Does not touch the counters."""
+        with self._lock:
+            value, age = self._lookup(key, time.monotonic())
+            if age is None or age >= self.local_ttl:
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def peek(self, key: Hashable) -> Tuple[Optional[Any], Optional[float]]:
+        """Return (value, age_seconds) including stale entries, or (None, None)."""
+        with self._lock:
+            return self._lookup(key, time.monotonic())
+
+    def set(self, key: Hashable, value: Any, age: float = 0.0) -> None:
+        """Store `value`; `age` backdates an entry that was loaded elsewhere (shared store)."""
+        with self._lock:
+            self._data[key] = (time.monotonic() - age, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(self.name, key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    # ---------------- shared (cross-process) level ----------------
+    def peek_shared(self, key: Hashable) -> Tuple[Optional[Any], Optional[float]]:
+        """(value, age_seconds) from the shared store, including stale entries, or (None, None)."""
+        if self.shared is None:
+            return None, None
+        return self.shared.get(self.name, key, self.ttl + self.stale_ttl)
+
+    def _load_shared(self, key: Hashable) -> Tuple[Optional[Any], Optional[float]]:
+        """A fresh shared entry, copied into this process on a hit."""
+        if self.shared is None:
+            return None, None
+        value, age = self.shared.get(self.name, key, self.ttl)
+        if age is not None:
+            self.set(key, value, age)
+            with self._lock:
+                self.shared_hits += 1
+        return value, age
+
+    def _store_shared(self, key: Hashable, value: Any) -> None:
+        if self.shared is not None:
+            self.shared.set(self.name, key, value, self.ttl + self.stale_ttl)
+
+    def _stale(self, key: Hashable) -> Tuple[Optional[Any], Optional[float]]:
+        """Stale fallback: this process's entry, else another worker's."""
+        value, age = self.peek(key)
+        if age is None:
+            value, age = self.peek_shared(key)
+        return value, age
+
+    # ---------------- single-flight loading ----------------
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for `key`, calling `loader()` on a miss.
+        Concurrent callers missing on the same key share one loader call.
+        If the loader raises and a stale entry exists, the stale value is returned.
+        """
+        with self._lock:
+            value, age = self._lookup(key, time.monotonic())
+            if age is not None and age < self.local_ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value, age = self._load_shared(key)
+            if age is None:
+                value = loader()
+                self.set(key, value)
+                self._store_shared(key, value)
+            flight.value = value
+            return value
+        except BaseException as e:
+            stale_value, stale_age = self._stale(key)
+            if stale_age is not None:
+                with self._lock:
+                    self.stale += 1
+                flight.value = stale_value
+                return stale_value
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    async def aget_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async counterpart of `get_or_load`: concurrent tasks share one `await loader()`.
+        The load runs in a task owned by the cache, so a caller that is cancelled
+        (client disconnect, deadline) stops waiting without cancelling the load
+        the other callers share.
+        """
+        with self._lock:
+            value, age = self._lookup(key, time.monotonic())
+            if age is not None and age < self.local_ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            task = self._ainflight.get(key)
+            if task is not None:
+                self.coalesced += 1
+            else:
+                task = asyncio.get_running_loop().create_task(self._aload(key, loader))
+                task.add_done_callback(_retrieve_result)
+                self._ainflight[key] = task
+                self.misses += 1
+        return await asyncio.shield(task)
+
+    async def _aload(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value, age = (None, None) if self.shared is None else await asyncio.to_thread(self._load_shared, key)
+            if age is None:
+                value = await loader()
+                self.set(key, value)
+                if self.shared is not None:
+                    await asyncio.to_thread(self._store_shared, key, value)
+            return value
+        except Exception:
+            stale_value, stale_age = self.peek(key)
+            if stale_age is None and self.shared is not None:
+                stale_value, stale_age = await asyncio.to_thread(self.peek_shared, key)
+            if stale_age is not None:
+                with self._lock:
+                    self.stale += 1
+                return stale_value
+            raise
+        finally:
+            with self._lock:
+                self._ainflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "stale_ttl_seconds": self.stale_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "coalesced": self.coalesced,
+                "shared_hits": self.shared_hits,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            }
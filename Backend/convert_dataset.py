@@ -0,0 +1,29 @@
+"""
+Dataset Conversion Script
+Converts the historical CSV into the memory-mappable Arrow IPC file that the
+API prefers at startup (see Backend/historical_store.py).
+
+Usage:
+    python -m Backend.convert_dataset [csv_path] [arrow_path]
+"""
+import sys
+import time
+from pathlib import Path
+
+from Backend.historical_store import read_timeseries_csv, write_timeseries_arrow
+
+DEFAULT_CSV = Path(__file__).parent.parent / "Dataset" / "aqi_timeseries.csv"
+
+
+def convert(csv_path: Path, arrow_path: Path) -> int:
+    start = time.perf_counter()
+    frame = read_timeseries_csv(csv_path)
+    write_timeseries_arrow(frame, arrow_path)
+    print(f"✅ Wrote {len(frame)} rows to {arrow_path} in {time.perf_counter() - start:.2f}s")
+    return len(frame)
+
+
+if __name__ == "__main__":
+    csv_path = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CSV
+    arrow_path = Path(sys.argv[2]) if len(sys.argv) > 2 else csv_path.with_suffix(".arrow")
+    convert(csv_path, arrow_path)
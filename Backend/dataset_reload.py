@@ -0,0 +1,164 @@
+"""
+Dataset Hot Reload Module
+Owns the live HistoricalStore and replaces it when the dataset file changes on
+disk (e.g. after `update_aqi_csv.py` appends rows), without a restart.
+
+A daemon thread polls the file's (mtime, size). When the CSV has only grown,
+just the appended bytes are parsed and merged with `HistoricalStore.append`;
+otherwise the file is reloaded in full. Either way the new store is built off
+to the side and published with a single attribute assignment, so a request
+holding the previous store keeps a complete, consistent view.
+"""
+import io
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from Backend.historical_store import HAS_PYARROW, HistoricalStore, read_timeseries_csv
+
+# ---------------- CONFIG ----------------
+DATASET_RELOAD_ENABLED = os.getenv("DATASET_RELOAD_ENABLED", "1") != "0"
+DATASET_POLL_INTERVAL = float(os.getenv("DATASET_POLL_INTERVAL", "30"))  # seconds
+
+
+def _signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class DatasetReloader:
+    """Holds the current store for `csv_path` (or its newer Arrow copy) and swaps it on change."""
+
+    def __init__(self, csv_path: Path, arrow_path: Optional[Path] = None,
+                 poll_interval: float = DATASET_POLL_INTERVAL):
+        self.csv_path = csv_path
+        self.arrow_path = arrow_path
+        self.poll_interval = poll_interval
+        self.store = HistoricalStore.empty_store()
+        # Identifies the loaded file revision (same value in every worker); None until loaded
+        self.version: Optional[str] = None
+        self.path: Optional[Path] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()  # one reload at a time; readers never take it
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reloads = 0
+        self.errors = 0
+        self.last_reload: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+
+    def dataset_path(self) -> Path:
+        """Prefer the Arrow file unless the CSV has been updated since it was converted."""
+        arrow = self.arrow_path
+        if arrow is not None and arrow.exists() and HAS_PYARROW:
+            if not self.csv_path.exists() or arrow.stat().st_mtime >= self.csv_path.stat().st_mtime:
+                return arrow
+        return self.csv_path
+
+    # ---------------- loading ----------------
+    def _read_tail(self, path: Path, offset: int) -> Optional[HistoricalStore]:
+        """Parse only the bytes appended after `offset`; None if that is not safe."""
+        with open(path, "rb") as f:
+            header = f.readline()
+            if offset <= len(header):
+                return None
+            f.seek(offset - 1)
+            if f.read(1) != b"\n":
+                # The old end was mid-line: the file was rewritten, not appended to
+                return None
+            tail = f.read()
+        if not tail.strip():
+            return self.store
+        return self.store.append(read_timeseries_csv(io.BytesIO(header + tail)))
+
+    def reload(self, force: bool = False) -> Dict:
+        """
+        Reload if the dataset changed (or unconditionally with `force`) and swap it in.
+        Returns a report with the mode, row counts and elapsed time.
+        """
+        with self._lock:
+            path = self.dataset_path()
+            sig = _signature(path)
+            if sig is None:
+                return {"status": "missing", "path": str(path)}
+            if not force and path == self.path and sig == self._signature:
+                return {"status": "unchanged", "path": str(path), "rows": len(self.store)}
+
+            start = time.perf_counter()
+            rows_before = len(self.store)
+            new_store, mode = None, "full"
+            try:
+                if (not force and path == self.path and path.suffix.lower() == ".csv"
+                        and self._signature and sig[1] > self._signature[1]):
+                    new_store = self._read_tail(path, self._signature[1])
+                    mode = "tail"
+                if new_store is None:
+                    mode = "full"
+                    new_store = HistoricalStore.from_path(path)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = f"{path.name}: {e}"
+                print(f"❌ DATASET: reload of {path.name} failed, keeping {rows_before} rows: {e}")
+                return {"status": "error", "path": str(path), "error": str(e), "rows": rows_before}
+
+            # Single reference assignment: readers see either the old or the new store
+            self.store = new_store
+            self.path, self._signature = path, sig
+            # Set after the store, so a reader that sees the new version also sees the new rows
+            self.version = f"{path.name}:{sig[0]}:{sig[1]}"
+            self.reloads += 1
+            self.last_reload = {
+                "status": "reloaded",
+                "path": str(path),
+                "mode": mode,
+                "rows_before": rows_before,
+                "rows_after": len(new_store),
+                "rows_added": len(new_store) - rows_before,
+                "cities": len(new_store.cities()),
+                "seconds": round(time.perf_counter() - start, 3),
+                "at": time.time(),
+            }
+            print(
+                f"✅ DATASET: {mode} load of {path.name}: {rows_before} -> {len(new_store)} rows "
+                f"in {self.last_reload['seconds']}s"
+            )
+            return self.last_reload
+
+    # ---------------- watcher ----------------
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"DATASET: watcher error: {e}")
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="dataset-reloader", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> Dict:
+        return {
+            "watching": self._thread is not None and self._thread.is_alive(),
+            "poll_interval_seconds": self.poll_interval,
+            "path": str(self.path) if self.path else None,
+            "rows": len(self.store),
+            "cities": len(self.store.cities()),
+            "version": self.version,
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "last_reload": self.last_reload,
+            "last_error": self.last_error,
+        }
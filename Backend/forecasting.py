@@ -0,0 +1,159 @@
+"""
+AQI Forecasting Module
+Serves the global lag-feature model trained by `utils/train_xgboost.py`
+(features: city_encoded, month, day, weekday, lag_1, lag_7, lag_14).
+
+The model and city encoder are unpickled once. Instead of re-reading the CSV
+per prediction, a feature store keeps, for every city, a window of its last
+LAG_WINDOW daily AQI values (one row per city in an (n_cities, LAG_WINDOW)
+array) plus its last observed date. Recursive multi-day forecasts run for all
+cities at once: each step is one `predict` over every city, after which the
+prediction is pushed into each city's window as the newest lag.
+"""
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from Backend.historical_store import HistoricalStore, AQI_COL, DATE_COL
+
+# ---------------- CONFIG ----------------
+FORECAST_DIR = Path(__file__).parent / "forecasting"
+FORECAST_MODEL_PATH = Path(os.getenv("FORECAST_MODEL_PATH", str(FORECAST_DIR / "global_aqi_model.pkl")))
+FORECAST_ENCODER_PATH = Path(os.getenv("FORECAST_ENCODER_PATH", str(FORECAST_DIR / "city_encoder.pkl")))
+FORECAST_MAX_DAYS = int(os.getenv("FORECAST_MAX_DAYS", "30"))
+
+LAGS = (1, 7, 14)
+LAG_WINDOW = max(LAGS)
+FEATURES = ["city_encoded", "month", "day", "weekday"] + [f"lag_{k}" for k in LAGS]
+
+
+class ForecastUnavailable(Exception):
+    """Raised when the model artifacts are missing or cannot be loaded."""
+
+
+class LagFeatureStore:
+    """Last LAG_WINDOW AQI values and last observed date for every forecastable city."""
+
+    def __init__(self, store: HistoricalStore, city_codes: Dict[str, int]):
+        names, codes, windows, last_dates = [], [], [], []
+        for name in store.cities():
+            code = city_codes.get(name.strip().lower())
+            if code is None:
+                continue
+            sub = store.city_frame(name)
+            if len(sub) <= LAG_WINDOW:
+                continue
+            tail = sub.tail(LAG_WINDOW)
+            names.append(name)
+            codes.append(code)
+            windows.append(pd.to_numeric(tail[AQI_COL], errors="coerce").to_numpy(dtype="float64"))
+            last_dates.append(tail[DATE_COL].iat[-1])
+        self.source = store
+        self.cities: List[str] = names
+        self.positions = {n.lower(): i for i, n in enumerate(names)}
+        self.codes = np.asarray(codes, dtype="float64")
+        # Oldest value in column 0, latest in column LAG_WINDOW - 1
+        self.windows = np.vstack(windows) if windows else np.empty((0, LAG_WINDOW))
+        self.last_dates = pd.DatetimeIndex(last_dates).normalize()
+
+    def __len__(self) -> int:
+        return len(self.cities)
+
+
+class Forecaster:
+    """Resident model + feature store; recomputed lazily when the historical store is swapped."""
+
+    def __init__(self, model, city_encoder):
+        self.model = model
+        self.city_codes = {str(c).strip().lower(): i for i, c in enumerate(city_encoder.classes_)}
+        self._features: Optional[LagFeatureStore] = None
+        self._results: Dict[int, Dict[str, List[Dict]]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, model_path: Path = FORECAST_MODEL_PATH,
+             encoder_path: Path = FORECAST_ENCODER_PATH) -> "Forecaster":
+        for p in (model_path, encoder_path):
+            if not p.exists():
+                raise ForecastUnavailable(f"missing forecast artifact {p}")
+        try:
+            with open(model_path, "rb") as f:
+                model = pickle.load(f)
+            with open(encoder_path, "rb") as f:
+                encoder = pickle.load(f)
+        except Exception as e:
+            raise ForecastUnavailable(f"could not unpickle forecast artifacts: {e}") from e
+        return cls(model, encoder)
+
+    def features_for(self, store: HistoricalStore) -> LagFeatureStore:
+        with self._lock:
+            if self._features is None or self._features.source is not store:
+                self._features = LagFeatureStore(store, self.city_codes)
+                self._results = {}
+            return self._features
+
+    def _forecast(self, fs: LagFeatureStore, days: int) -> Dict[str, List[Dict]]:
+        windows = fs.windows.copy()
+        preds = np.empty((len(fs), days))
+        for step in range(days):
+            dates = fs.last_dates + pd.Timedelta(days=step + 1)
+            X = pd.DataFrame({
+                "city_encoded": fs.codes,
+                "month": dates.month,
+                "day": dates.day,
+                "weekday": dates.weekday,
+                **{f"lag_{k}": windows[:, -k] for k in LAGS},
+            }, columns=FEATURES)
+            preds[:, step] = self.model.predict(X)
+            # Slide every city's window by one day, newest value = this prediction
+            windows[:, :-1] = windows[:, 1:]
+            windows[:, -1] = preds[:, step]
+
+        out: Dict[str, List[Dict]] = {}
+        for i, name in enumerate(fs.cities):
+            dates = pd.date_range(fs.last_dates[i] + pd.Timedelta(days=1), periods=days, freq="D")
+            out[name] = [
+                {"date": d.strftime("%Y-%m-%d"), "aqi": round(float(v), 2)}
+                for d, v in zip(dates, preds[i])
+            ]
+        return out
+
+    def forecast_all(self, store: HistoricalStore, days: int) -> Dict[str, List[Dict]]:
+        """city -> [{date, aqi}] for the `days` after each city's last observation."""
+        fs = self.features_for(store)
+        cached = self._results.get(days)
+        if cached is not None:
+            return cached
+        result = self._forecast(fs, days) if len(fs) else {}
+        with self._lock:
+            if self._features is fs:
+                self._results[days] = result
+        return result
+
+    def forecast_city(self, store: HistoricalStore, city: str, days: int) -> Optional[List[Dict]]:
+        fs = self.features_for(store)
+        if city.strip().lower() not in fs.positions:
+            return None
+        name = fs.cities[fs.positions[city.strip().lower()]]
+        return self.forecast_all(store, days)[name]
+
+    def last_observed(self, store: HistoricalStore, city: str) -> Optional[str]:
+        fs = self.features_for(store)
+        pos = fs.positions.get(city.strip().lower())
+        return None if pos is None else fs.last_dates[pos].strftime("%Y-%m-%d")
+
+
+def load_forecaster() -> Optional[Forecaster]:
+    """Load the forecast model, or return None (with a warning) so /forecast can report 503."""
+    try:
+        forecaster = Forecaster.load()
+    except ForecastUnavailable as e:
+        print(f"⚠ FORECAST: {e}. /forecast is disabled.")
+        return None
+    print(f"✅ FORECAST: loaded {FORECAST_MODEL_PATH.name} ({len(forecaster.city_codes)} cities)")
+    return forecaster
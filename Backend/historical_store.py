@@ -0,0 +1,304 @@
+"""
+Historical AQI Store Module
+Loaded-once, read-only view of the daily AQI time series (`aqi_timeseries.csv`).
+Rows are kept sorted by (city, date) with `city` as a categorical column, and a
+case-insensitive city -> (start, end) offset index turns every per-city lookup
+into an O(1) positional slice instead of a full-column scan.
+
+A materialized city x year x month aggregate (sum, count, min, max of AQI) is
+built at load time and merged incrementally when rows are appended, so yearly,
+monthly and seasonal analytics never re-scan daily rows.
+
+The series can also be stored as an Arrow IPC file (see Backend/convert_dataset.py)
+written already sorted by (city, date), with types pandas can wrap directly
+(int16 AQI, or float64 with NaN when there are gaps; timestamp[ns] dates;
+dictionary city). It is
+memory-mapped on load and its columns are used in place, so worker processes
+share the same pages instead of each holding a private copy.
+"""
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Optional Arrow support for the columnar dataset format
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except Exception:
+    HAS_PYARROW = False
+
+# Standard column names
+CITY_COL = "city"
+AQI_COL = "aqi"
+DATE_COL = "date"
+COLUMNS = [CITY_COL, AQI_COL, DATE_COL]
+AGG_COLUMNS = ["sum", "count", "min", "max"]
+
+ARROW_SUFFIXES = (".arrow", ".feather")
+
+# Month -> season bucket used by the seasonal analytics
+SEASON_BY_MONTH = {
+    12: "Winter", 1: "Winter", 2: "Winter",
+    3: "Spring", 4: "Spring", 5: "Spring",
+    6: "Summer", 7: "Summer", 8: "Summer",
+    9: "Autumn", 10: "Autumn", 11: "Autumn",
+}
+
+
+# ---------------- readers / writers ----------------
+def read_timeseries_csv(path: Path) -> pd.DataFrame:
+    """Read and clean the day-first CSV into (city, aqi, date) columns."""
+    df = pd.read_csv(path, encoding="utf-8-sig")
+
+    # Clean column names
+    df.columns = [c.strip().lower().replace("\ufeff", "") for c in df.columns]
+
+    # Convert date column
+    df[DATE_COL] = pd.to_datetime(df[DATE_COL], dayfirst=True, errors="coerce")
+    df = df.dropna(subset=[DATE_COL, CITY_COL])
+    return df[COLUMNS]
+
+
+def _require_pyarrow():
+    if not HAS_PYARROW:
+        raise RuntimeError("pyarrow is required for the Arrow dataset format. Install pyarrow.")
+
+
+def arrow_schema(city_index=None, aqi_type=None):
+    _require_pyarrow()
+    # Types whose pandas counterparts can wrap the Arrow buffers without conversion;
+    # the city index width follows pandas' categorical codes (int8 up to 127 cities)
+    return pa.schema([
+        (CITY_COL, pa.dictionary(city_index or pa.int8(), pa.string())),
+        (AQI_COL, aqi_type or pa.int16()),
+        (DATE_COL, pa.timestamp("ns")),
+    ])
+
+
+def write_timeseries_arrow(frame: pd.DataFrame, path: Path) -> None:
+    """
+    Write (city, aqi, date) as an uncompressed Arrow IPC file (required for zero-copy mmap),
+    sorted by (city, date) with sorted city categories so loading needs no reorder.
+    """
+    _require_pyarrow()
+    frame = frame.dropna(subset=[CITY_COL, DATE_COL])
+    cat, row_keys, _ = _city_keys(frame[CITY_COL])
+    order = np.lexsort((frame[DATE_COL].to_numpy(), row_keys))
+    aqi = pd.to_numeric(frame[AQI_COL], errors="coerce").round().to_numpy(dtype="float64")[order]
+    # int16 when complete; float64 with NaN for gaps (either way no validity bitmap)
+    aqi_type = pa.float64() if np.isnan(aqi).any() else pa.int16()
+    codes = cat.codes[order]
+    city = pa.DictionaryArray.from_arrays(pa.array(codes), pa.array(cat.categories.astype(str)))
+    table = pa.table({
+        CITY_COL: city,
+        # NaN rather than nulls, so the column needs no validity bitmap
+        AQI_COL: pa.array(aqi if aqi_type == pa.float64() else aqi.astype("int16"), type=aqi_type),
+        DATE_COL: pa.array(frame[DATE_COL].to_numpy(dtype="datetime64[ns]")[order], type=pa.timestamp("ns")),
+    }, schema=arrow_schema(pa.from_numpy_dtype(codes.dtype), aqi_type))
+    tmp = Path(str(path) + ".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    tmp.replace(path)
+
+
+def read_timeseries_arrow(path: Path) -> pd.DataFrame:
+    """
+    Memory-map an Arrow IPC file. Files written by `write_timeseries_arrow` come
+    back as pandas columns over the mapped buffers (no copy); older layouts
+    (int16 AQI, date32) still load, converted.
+    """
+    _require_pyarrow()
+    source = pa.memory_map(str(path), "r")
+    table = pa.ipc.open_file(source).read_all()
+    city_type, aqi_type = table.schema.field(CITY_COL).type, table.schema.field(AQI_COL).type
+    mappable = (pa.types.is_dictionary(city_type) and aqi_type in (pa.int16(), pa.float64())
+                and table.schema.equals(arrow_schema(city_type.index_type, aqi_type)))
+    if mappable and all(c.num_chunks == 1 and c.null_count == 0 for c in table.columns):
+        city = table.column(CITY_COL).chunk(0)
+        return pd.DataFrame({
+            CITY_COL: pd.Categorical.from_codes(
+                city.indices.to_numpy(zero_copy_only=True), categories=city.dictionary.to_pylist()
+            ),
+            AQI_COL: table.column(AQI_COL).chunk(0).to_numpy(zero_copy_only=True),
+            DATE_COL: table.column(DATE_COL).chunk(0).to_numpy(zero_copy_only=True),
+        }, copy=False)
+    return table.to_pandas(date_as_object=False)
+
+
+def read_timeseries(path: Path) -> pd.DataFrame:
+    """Dispatch on suffix: Arrow IPC (.arrow/.feather) or the original CSV."""
+    if Path(path).suffix.lower() in ARROW_SUFFIXES:
+        return read_timeseries_arrow(path)
+    return read_timeseries_csv(path)
+
+
+# ---------------- aggregates ----------------
+def _aqi_values(aqi: pd.Series) -> np.ndarray:
+    """Numeric AQI values; narrow integer columns (int16 from Arrow) are widened so sums cannot overflow."""
+    values = pd.to_numeric(aqi, errors="coerce").to_numpy()
+    return values.astype("int64") if values.dtype.kind in "iu" else values
+
+
+def _monthly_aggregates(row_keys: np.ndarray, key_names: List[str], frame: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Group rows into city key -> DataFrame indexed by (year, month) with AGG_COLUMNS.
+    `row_keys` holds an integer position into `key_names` for every row.
+    """
+    if frame.empty:
+        return {}
+    dates = frame[DATE_COL].dt
+    cube = (
+        pd.DataFrame({
+            "k": row_keys,
+            "year": dates.year.to_numpy(),
+            "month": dates.month.to_numpy(),
+            "aqi": _aqi_values(frame[AQI_COL]),
+        })
+        .groupby(["k", "year", "month"], sort=True)["aqi"]
+        .agg(AGG_COLUMNS)
+    )
+    cube = cube[cube["count"] > 0]
+    return {key_names[k]: sub.droplevel("k") for k, sub in cube.groupby(level="k", sort=False)}
+
+
+def _merge_monthly(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Combine two (year, month) aggregates: sums/counts add, min/max fold."""
+    both = pd.concat([old, new]).groupby(level=["year", "month"], sort=True)
+    return pd.DataFrame({
+        "sum": both["sum"].sum(),
+        "count": both["count"].sum(),
+        "min": both["min"].min(),
+        "max": both["max"].max(),
+    })
+
+
+def _is_sorted(row_keys: np.ndarray, dates: np.ndarray) -> bool:
+    """True if rows are ordered by (key, date)."""
+    if len(row_keys) < 2:
+        return True
+    dk = np.diff(row_keys)
+    return bool((dk >= 0).all() and ((dk > 0) | (dates[1:] >= dates[:-1])).all())
+
+
+def _city_keys(city: pd.Series) -> Tuple[pd.Categorical, np.ndarray, List[str]]:
+    """
+    Categorise `city` and map every row to a case-insensitive key.
+    String work happens on the (small) category list, not per row.
+    Returns (categorical of stripped names, per-row key positions, sorted key names).
+    """
+    if not isinstance(city.dtype, pd.CategoricalDtype):
+        city = city.astype(str).astype("category")
+    raw_names = city.cat.categories.astype(str).str.strip()
+    names = sorted(set(raw_names))
+    if list(raw_names) == names and not city.cat.ordered:
+        # Categories already stripped, unique and sorted (e.g. from the Arrow file): keep the codes
+        cat = city.array
+    else:
+        cat = pd.Categorical.from_codes(
+            pd.Index(names).get_indexer(raw_names)[city.cat.codes.to_numpy()], categories=names
+        )
+    key_of_name = pd.Index(names).str.lower() if names else pd.Index([])
+    key_names = sorted(set(key_of_name))
+    row_keys = pd.Index(key_names).get_indexer(key_of_name)[cat.codes]
+    return cat, row_keys, key_names
+
+
+class HistoricalStore:
+    """Immutable, (city, date)-sorted frame plus a per-city offset index and monthly aggregates."""
+
+    def __init__(self, frame: pd.DataFrame, monthly: Optional[Dict[str, pd.DataFrame]] = None):
+        if frame.empty:
+            frame = pd.DataFrame({
+                CITY_COL: pd.Series([], dtype="object"),
+                AQI_COL: pd.Series([], dtype="float64"),
+                DATE_COL: pd.Series([], dtype="datetime64[ns]"),
+            })
+        valid = frame[CITY_COL].notna().to_numpy() & frame[DATE_COL].notna().to_numpy()
+        if not valid.all():
+            frame = frame[valid]
+        cat, row_keys, key_names = _city_keys(frame[CITY_COL])
+        city, aqi, dates = cat, frame[AQI_COL].to_numpy(), frame[DATE_COL].to_numpy()
+
+        # Input already in (city, date) order (e.g. a converted Arrow file) is used as is,
+        # so memory-mapped columns are wrapped rather than copied
+        if not _is_sorted(row_keys, dates):
+            order = np.lexsort((dates, row_keys))
+            row_keys, city, aqi, dates = row_keys[order], cat[order], aqi[order], dates[order]
+        frame = pd.DataFrame({CITY_COL: city, AQI_COL: aqi, DATE_COL: dates}, copy=False)
+        self.frame = frame
+
+        # Rows for one (lower-cased) city are contiguous after the sort
+        self._index: Dict[str, Tuple[int, int, str]] = {}
+        if len(row_keys):
+            starts = np.flatnonzero(np.r_[True, row_keys[1:] != row_keys[:-1]])
+            ends = np.r_[starts[1:], len(row_keys)]
+            city_col = frame[CITY_COL]
+            for s, e in zip(starts.tolist(), ends.tolist()):
+                self._index[key_names[row_keys[s]]] = (s, e, city_col.iat[s])
+
+        self._monthly = monthly if monthly is not None else _monthly_aggregates(row_keys, key_names, frame)
+
+    @classmethod
+    def from_path(cls, path: Path) -> "HistoricalStore":
+        return cls(read_timeseries(path))
+
+    @classmethod
+    def from_csv(cls, path: Path) -> "HistoricalStore":
+        return cls(read_timeseries_csv(path))
+
+    @classmethod
+    def empty_store(cls) -> "HistoricalStore":
+        return cls(pd.DataFrame(columns=COLUMNS))
+
+    def append(self, rows: pd.DataFrame) -> "HistoricalStore":
+        """
+        Return a new store with `rows` added. Only the monthly aggregates of the
+        cities present in `rows` are touched; the rest are shared with this store.
+        """
+        rows = rows[COLUMNS].dropna(subset=[CITY_COL, DATE_COL])
+        if rows.empty:
+            return self
+        _, row_keys, key_names = _city_keys(rows[CITY_COL])
+        monthly = dict(self._monthly)
+        for key, delta in _monthly_aggregates(row_keys, key_names, rows).items():
+            monthly[key] = _merge_monthly(monthly[key], delta) if key in monthly else delta
+        city = pd.api.types.union_categoricals(
+            [self.frame[CITY_COL].array, pd.Categorical(rows[CITY_COL].astype(str))], ignore_order=True
+        )
+        combined = pd.DataFrame({
+            CITY_COL: city,
+            AQI_COL: pd.concat([self.frame[AQI_COL], rows[AQI_COL]], ignore_index=True),
+            DATE_COL: pd.concat([self.frame[DATE_COL], rows[DATE_COL]], ignore_index=True),
+        })
+        return HistoricalStore(combined, monthly=monthly)
+
+    # ---------------- lookups ----------------
+    @property
+    def empty(self) -> bool:
+        return self.frame.empty
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def cities(self) -> List[str]:
+        """Sorted display names, one per (case-insensitive) city."""
+        return sorted(name for _, _, name in self._index.values())
+
+    def bounds(self, city: str) -> Optional[Tuple[int, int]]:
+        entry = self._index.get(city.strip().lower())
+        return (entry[0], entry[1]) if entry else None
+
+    def city_frame(self, city: str) -> pd.DataFrame:
+        """Date-sorted rows for `city` (case-insensitive); an empty frame if unknown."""
+        b = self.bounds(city)
+        if b is None:
+            return self.frame.iloc[0:0]
+        return self.frame.iloc[b[0]:b[1]]
+
+    # ---------------- aggregates ----------------
+    def monthly(self, city: str) -> Optional[pd.DataFrame]:
+        """(year, month)-indexed sum/count/min/max of AQI for `city`, or None if unknown."""
+        return self._monthly.get(city.strip().lower())
@@ -0,0 +1,247 @@
+"""
+HTTP Response Cache Module
+ASGI middleware that stores rendered response bytes for routes whose output
+only changes with a known version (the dataset revision for historical
+routes, the UTC hour for satellite data) and makes them cacheable downstream.
+
+For a matching GET request the middleware:
+- derives a strong ETag from (version, path, normalized query, encoding), so
+  a client or edge revalidating with If-None-Match gets a 304 without the
+  route running at all;
+- replays stored bytes while the version is unchanged;
+- sets Cache-Control (max-age, s-maxage, stale-while-revalidate) so CDN edges
+  such as Vercel's can serve most traffic.
+
+Entries are keyed on the query parameters the matched route declares, so
+unknown parameters cannot mint new entries, and the store is bounded both in
+entries and in total body bytes.
+
+Requests carrying Authorization are never cached. A route that had to serve
+degraded data (e.g. some upstream chunks failed) sets the DEGRADED_HEADER
+response header: the middleware then strips it, stores nothing and marks the
+response `no-store` without the versioned ETag, so the next request retries.
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi.dependencies.utils import get_flat_dependant
+from fastapi.routing import APIRoute
+from starlette.routing import Match
+
+from Backend.responses import etag_matches, preferred_encoding
+
+# ---------------- CONFIG ----------------
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") != "0"
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "512"))
+HTTP_CACHE_MAX_BODY = int(os.getenv("HTTP_CACHE_MAX_BODY", str(4 * 1024 * 1024)))  # bytes per entry
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # bytes in total
+
+# Headers recomputed by the middleware (lower-case, as in ASGI messages)
+_REPLACED = {b"etag", b"cache-control", b"vary", b"content-length"}
+
+# Set by a route on a response that must not be cached (internal; never sent to clients)
+DEGRADED_HEADER = "X-Degraded-Response"
+_DEGRADED = DEGRADED_HEADER.lower().encode("latin-1")
+
+
+class CacheRule:
+    """
+    A group of routes sharing a version source and Cache-Control policy.
+    `paths` ending in "/" match as prefixes, others exactly; `exclude` prefixes win.
+    `version()` returning None disables caching for the moment (e.g. no data yet).
+    """
+
+    def __init__(self, name: str, paths: Sequence[str], version: Callable[[], Optional[str]],
+                 cache_control: Callable[[], str], exclude: Sequence[str] = ()):
+        self.name = name
+        self.paths = tuple(paths)
+        self.exclude = tuple(exclude)
+        self.version = version
+        self.cache_control = cache_control
+
+    def matches(self, path: str) -> bool:
+        if any(path.startswith(p) for p in self.exclude):
+            return False
+        return any(path == p or (p.endswith("/") and path.startswith(p)) for p in self.paths)
+
+
+def cache_control(max_age: int, s_maxage: int, stale_while_revalidate: int) -> str:
+    return (f"public, max-age={max_age}, s-maxage={s_maxage}, "
+            f"stale-while-revalidate={stale_while_revalidate}")
+
+
+def hour_version() -> str:
+    """Current UTC hour, for data refreshed hourly upstream."""
+    return time.strftime("%Y%m%d%H", time.gmtime())
+
+
+def seconds_to_next_hour() -> int:
+    return max(1, 3600 - int(time.time()) % 3600)
+
+
+def _normalized_query(query_string: bytes, declared: FrozenSet[str]) -> str:
+    """Sorted query string restricted to the parameters the route declares."""
+    pairs = parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+    return urlencode(sorted((k, v) for k, v in pairs if k in declared))
+
+
+def _declared_params(scope, memo: Dict[str, FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    """Query parameter names of the API route `scope` resolves to, or None when no route matches."""
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        if isinstance(route, APIRoute) and route.matches(scope)[0] == Match.FULL:
+            if route.unique_id not in memo:
+                memo[route.unique_id] = frozenset(
+                    p.alias for p in get_flat_dependant(route.dependant).query_params
+                )
+            return memo[route.unique_id]
+    return None
+
+
+class _Entry:
+    __slots__ = ("version", "headers", "body")
+
+    def __init__(self, version: str, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+
+class ResponseCache:
+    """Bounded LRU of rendered 200 responses plus the rules deciding what is cacheable."""
+
+    def __init__(self, rules: Sequence[CacheRule], max_entries: int = HTTP_CACHE_MAX_ENTRIES,
+                 max_body: int = HTTP_CACHE_MAX_BODY, max_bytes: int = HTTP_CACHE_MAX_BYTES,
+                 enabled: bool = HTTP_CACHE_ENABLED):
+        self.rules = list(rules)
+        self.max_entries = max_entries
+        self.max_body = min(max_body, max_bytes)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.stored = 0
+        self.degraded = 0
+
+    def rule_for(self, path: str) -> Optional[CacheRule]:
+        return next((r for r in self.rules if r.matches(path)), None)
+
+    def get(self, key: Tuple, version: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Tuple, entry: _Entry) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= len(old.body)
+        self._entries[key] = entry
+        self.bytes += len(entry.body)
+        self.stored += 1
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted.body)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "stored": self.stored,
+            "degraded": self.degraded,
+            "rules": [r.name for r in self.rules],
+        }
+
+
+class ResponseCacheMiddleware:
+    """Pure ASGI middleware serving and filling a ResponseCache; see the module docstring."""
+
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+        self._params: Dict[str, FrozenSet[str]] = {}  # route unique_id -> declared query names
+
+    async def __call__(self, scope, receive, send):
+        cache = self.cache
+        if not cache.enabled or scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        rule = cache.rule_for(scope["path"])
+        if rule is None:
+            return await self.app(scope, receive, send)
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        version = rule.version()
+        if version is None or "authorization" in headers:
+            return await self.app(scope, receive, send)
+        declared = _declared_params(scope, self._params)
+        if declared is None:
+            return await self.app(scope, receive, send)
+
+        encoding = preferred_encoding(headers.get("accept-encoding")) or "identity"
+        key = (scope["path"], _normalized_query(scope.get("query_string", b""), declared), encoding)
+        digest = hashlib.blake2b(repr((version,) + key).encode(), digest_size=16).hexdigest()
+        extra = [
+            (b"etag", f'"{digest}"'.encode()),
+            (b"cache-control", rule.cache_control().encode()),
+            (b"vary", b"Accept-Encoding"),
+        ]
+
+        if etag_matches(headers.get("if-none-match"), f'"{digest}"'):
+            cache.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": extra})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        entry = cache.get(key, version)
+        if entry is not None:
+            cache.hits += 1
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": entry.headers + [(b"content-length", str(len(entry.body)).encode())]})
+            await send({"type": "http.response.body", "body": entry.body})
+            return
+
+        cache.misses += 1
+        state = {"status": None, "headers": None, "chunks": [], "size": 0}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                original = message.get("headers", [])
+                if any(k.lower() == _DEGRADED for k, _ in original):
+                    cache.degraded += 1
+                    message = {**message, "headers": [(k, v) for k, v in original
+                                                      if k.lower() not in (_DEGRADED, b"cache-control")]
+                               + [(b"cache-control", b"no-store")]}
+                elif message["status"] == 200:
+                    state["headers"] = [(k, v) for k, v in original if k.lower() not in _REPLACED] + extra
+                    message = {**message, "headers": [(k, v) for k, v in original
+                                                      if k.lower() not in _REPLACED - {b"content-length"}] + extra}
+            elif message["type"] == "http.response.body" and state["headers"] is not None:
+                body = message.get("body", b"")
+                state["size"] += len(body)
+                if state["size"] <= cache.max_body:
+                    state["chunks"].append(body)
+                else:
+                    state["headers"] = None  # too large to keep
+                if not message.get("more_body", False) and state["headers"] is not None:
+                    cache.put(key, _Entry(version, state["headers"], b"".join(state["chunks"])))
+            await send(message)
+
+        await self.app(scope, receive, capture)
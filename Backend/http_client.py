@@ -0,0 +1,394 @@
+"""
+Async Upstream HTTP Module
+One pooled keep-alive `httpx.AsyncClient` per upstream host (WAQI, Open-Meteo,
+Supabase, ...), each guarded by a concurrency semaphore and a default timeout.
+All outbound calls from async routes go through here so they never block the
+event loop.
+
+Rate-limited upstreams (one shared WAQI token, the Open-Meteo quota) also get:
+- a token-bucket governor with two priority classes: interactive requests may
+  drain the bucket, background jobs (prefetch, station sweeps) keep a reserve
+  free for them and always yield to waiting interactive requests;
+- a circuit breaker that fails fast with CircuitOpenError after repeated
+  failures, so callers' caches serve their last-known-good entries;
+- latency histograms per host, reported by `pool_stats()`.
+"""
+import asyncio
+import contextvars
+import os
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+# ---------------- CONFIG ----------------
+# Max in-flight requests per upstream host (also the connection pool size)
+HOST_CONCURRENCY = {
+    "api.waqi.info": int(os.getenv("WAQI_MAX_CONCURRENCY", "16")),
+    "air-quality-api.open-meteo.com": int(os.getenv("OPEN_METEO_MAX_CONCURRENCY", "8")),
+    "api.open-meteo.com": int(os.getenv("OPEN_METEO_MAX_CONCURRENCY", "8")),
+}
+DEFAULT_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "10"))
+
+# Default per-request timeout (seconds) when the caller does not pass one
+DEFAULT_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+
+# Token buckets as (requests/second, burst) for the whole instance; each worker
+# process gets its 1/WEB_CONCURRENCY share. Hosts not listed are not governed.
+_WORKERS = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+HOST_RATE = {
+    "api.waqi.info": (float(os.getenv("WAQI_RATE_PER_SEC", "10")), float(os.getenv("WAQI_RATE_BURST", "20"))),
+    "air-quality-api.open-meteo.com": (float(os.getenv("OPEN_METEO_RATE_PER_SEC", "2")),
+                                       float(os.getenv("OPEN_METEO_RATE_BURST", "10"))),
+    "api.open-meteo.com": (float(os.getenv("OPEN_METEO_RATE_PER_SEC", "2")),
+                           float(os.getenv("OPEN_METEO_RATE_BURST", "10"))),
+}
+# Fraction of the burst that background requests leave untouched for interactive ones
+BACKGROUND_RESERVE = float(os.getenv("UPSTREAM_BACKGROUND_RESERVE", "0.5"))
+# Longest an interactive request queues for a token before failing fast (seconds)
+GOVERNOR_MAX_WAIT = float(os.getenv("UPSTREAM_GOVERNOR_MAX_WAIT", "2"))
+# Background jobs queue longer, but never forever (they retry on their own schedule)
+BACKGROUND_MAX_WAIT = float(os.getenv("UPSTREAM_BACKGROUND_MAX_WAIT", "60"))
+
+# Consecutive failures (transport errors, HTTP 429/5xx) that open a host's circuit,
+# and how long it stays open before a single probe request is let through
+BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", "30"))
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+
+
+class UpstreamError(Exception):
+    """Transport failure, timeout or undecodable body from an upstream host."""
+
+
+class RateLimitedError(UpstreamError):
+    """No governor token became available within GOVERNOR_MAX_WAIT."""
+
+
+class CircuitOpenError(UpstreamError):
+    """The host's circuit breaker is open; the request was not sent."""
+
+
+def mark_background() -> None:
+    """
+    Run the rest of the current task (and tasks it creates) at background priority.
+    Call at the top of a background job's loop; contextvars keep it task-local.
+    """
+    _priority.set(BACKGROUND)
+
+
+# ---------------- GOVERNOR ----------------
+class TokenBucket:
+    """Per-host request budget with interactive/background priority classes (single event loop)."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        # A per-worker share can be a small burst: always leave background at least one full token
+        self.reserve = min(self.burst * BACKGROUND_RESERVE, self.burst - 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.waiting_interactive = 0
+        self.granted = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.waited_seconds = {INTERACTIVE: 0.0, BACKGROUND: 0.0}
+        self.rejected = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, priority: str) -> None:
+        """
+        Take one token, waiting as needed. Waits are capped at GOVERNOR_MAX_WAIT (interactive)
+        or BACKGROUND_MAX_WAIT (background), after which RateLimitedError is raised.
+        """
+        start = time.monotonic()
+        interactive = priority == INTERACTIVE
+        max_wait = GOVERNOR_MAX_WAIT if interactive else BACKGROUND_MAX_WAIT
+        if interactive:
+            self.waiting_interactive += 1
+        try:
+            while True:
+                self._refill()
+                floor = 0.0 if interactive else self.reserve
+                if interactive or not self.waiting_interactive:
+                    if self.tokens - 1 >= floor:
+                        self.tokens -= 1
+                        self.granted[priority] += 1
+                        self.waited_seconds[priority] += time.monotonic() - start
+                        return
+                delay = max((floor + 1 - self.tokens) / self.rate, 0.01)
+                if time.monotonic() - start + delay > max_wait:
+                    self.rejected += 1
+                    raise RateLimitedError("rate budget exhausted")
+                await asyncio.sleep(delay)
+        finally:
+            if interactive:
+                self.waiting_interactive -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "rate_per_sec": self.rate,
+            "burst": self.burst,
+            "tokens": round(self.tokens, 2),
+            "waiting_interactive": self.waiting_interactive,
+            "granted": dict(self.granted),
+            "waited_seconds": {k: round(v, 3) for k, v in self.waited_seconds.items()},
+            "rejected": self.rejected,
+        }
+
+
+# ---------------- CIRCUIT BREAKER ----------------
+class CircuitBreaker:
+    """closed -> open after BREAKER_THRESHOLD consecutive failures -> half-open probe after the cooldown."""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.opens = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """True if a request may be sent now; in half-open state only one probe is in flight."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        self.short_circuited += 1
+        return False
+
+    def record(self, ok: bool) -> None:
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+        else:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                self.opens += 1
+        self.probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opens": self.opens,
+            "short_circuited": self.short_circuited,
+        }
+
+
+# ---------------- LATENCY ----------------
+class LatencyHistogram:
+    """Fixed-bucket histogram of upstream response times."""
+
+    def __init__(self, bounds_ms: Tuple[int, ...] = LATENCY_BUCKETS_MS):
+        self.bounds_ms = bounds_ms
+        self.counts: List[int] = [0] * (len(bounds_ms) + 1)
+        self.total_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.counts[bisect_left(self.bounds_ms, ms)] += 1
+        self.total_ms += ms
+
+    def quantile(self, q: float) -> Optional[int]:
+        """Upper bound (ms) of the bucket holding the q-quantile; None if empty or beyond the last bound."""
+        n = sum(self.counts)
+        if not n:
+            return None
+        seen = 0
+        for bound, count in zip(self.bounds_ms, self.counts):
+            seen += count
+            if seen >= q * n:
+                return bound
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        n = sum(self.counts)
+        labels = [f"le_{b}" for b in self.bounds_ms] + ["inf"]
+        return {
+            "count": n,
+            "mean_ms": round(self.total_ms / n, 1) if n else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class _HostGuard:
+    """Governor, breaker and histogram for one host; plain state, so it outlives event loops."""
+
+    def __init__(self, host: str):
+        rate = HOST_RATE.get(host)
+        self.bucket = TokenBucket(rate[0] / _WORKERS, rate[1] / _WORKERS) if rate else None
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyHistogram()
+
+
+_guards: Dict[str, _HostGuard] = {}
+
+
+def _guard_for(host: str) -> _HostGuard:
+    guard = _guards.get(host)
+    if guard is None:
+        guard = _guards[host] = _HostGuard(host)
+    return guard
+
+
+class _HostPool:
+    def __init__(self, host: str, limit: int):
+        self.host = host
+        self.limit = limit
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=limit,
+                max_keepalive_connections=limit,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=DEFAULT_TIMEOUT,
+        )
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+
+# Pools are bound to the event loop that created them
+_pools: Dict[str, _HostPool] = {}
+_pool_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _discard_pools(old_loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """Close the clients of a previous event loop: on that loop if it still runs, else best effort here."""
+    pools = list(_pools.values())
+    _pools.clear()
+
+    async def close(client: httpx.AsyncClient) -> None:
+        try:
+            await client.aclose()
+        except Exception:
+            pass  # connections of a closed loop may already be gone
+
+    for pool in pools:
+        if old_loop is not None and old_loop.is_running() and not old_loop.is_closed():
+            asyncio.run_coroutine_threadsafe(close(pool.client), old_loop)
+        else:
+            asyncio.get_running_loop().create_task(close(pool.client))
+
+
+def _pool_for(url: str) -> _HostPool:
+    global _pool_loop
+    loop = asyncio.get_running_loop()
+    if _pool_loop is not loop:
+        # New loop (e.g. worker restart or test client): old clients are unusable here
+        _discard_pools(_pool_loop)
+        _pool_loop = loop
+    host = urlsplit(url).netloc
+    pool = _pools.get(host)
+    if pool is None:
+        pool = _HostPool(host, HOST_CONCURRENCY.get(host, DEFAULT_CONCURRENCY))
+        _pools[host] = pool
+    return pool
+
+
+# ---------------- REQUEST HELPERS ----------------
+async def request(method: str, url: str, *, timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+    """
+    Send a request through the host's pool. Raises UpstreamError on transport errors,
+    RateLimitedError when no token arrives in time and CircuitOpenError while the host's
+    circuit is open (both subclasses, so callers' stale fallbacks apply unchanged).
+    """
+    pool = _pool_for(url)
+    guard = _guard_for(pool.host)
+    if not guard.breaker.allow():
+        raise CircuitOpenError(f"{pool.host}: circuit open")
+    try:
+        if guard.bucket is not None:
+            await guard.bucket.acquire(_priority.get())
+    except BaseException:
+        guard.breaker.probing = False  # the probe was never sent
+        raise
+    async with pool.semaphore:
+        pool.requests += 1
+        pool.in_flight += 1
+        start = time.monotonic()
+        try:
+            resp = await pool.client.request(
+                method, url, timeout=timeout if timeout is not None else DEFAULT_TIMEOUT, **kwargs
+            )
+        except httpx.HTTPError as e:
+            pool.errors += 1
+            guard.breaker.record(False)
+            raise UpstreamError(f"{pool.host}: {e!r}") from e
+        except BaseException:
+            guard.breaker.probing = False
+            raise
+        finally:
+            pool.in_flight -= 1
+        guard.latency.observe(time.monotonic() - start)
+        guard.breaker.record(resp.status_code != 429 and resp.status_code < 500)
+        return resp
+
+
+async def get_json(url: str, *, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+                   timeout: Optional[float] = None, raise_for_status: bool = False) -> Any:
+    """GET `url` and decode the JSON body."""
+    resp = await request("GET", url, params=params, headers=headers, timeout=timeout)
+    if raise_for_status and resp.status_code >= 400:
+        raise UpstreamError(f"{resp.url.host}: HTTP {resp.status_code}")
+    try:
+        return resp.json()
+    except ValueError as e:
+        raise UpstreamError(f"{resp.url.host}: invalid JSON body") from e
+
+
+async def aclose() -> None:
+    """Close every pooled client (called on app shutdown)."""
+    pools = list(_pools.values())
+    _pools.clear()
+    for pool in pools:
+        await pool.client.aclose()
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    stats: Dict[str, Dict[str, Any]] = {
+        host: {
+            "concurrency_limit": pool.limit,
+            "in_flight": pool.in_flight,
+            "requests": pool.requests,
+            "errors": pool.errors,
+        }
+        for host, pool in _pools.items()
+    }
+    for host, guard in _guards.items():
+        stats.setdefault(host, {}).update({
+            "governor": guard.bucket.stats() if guard.bucket is not None else None,
+            "breaker": guard.breaker.stats(),
+            "latency": guard.latency.stats(),
+        })
+    return stats
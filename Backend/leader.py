@@ -0,0 +1,70 @@
+"""
+Worker Leader Module
+With several gunicorn workers, periodic jobs that talk to upstreams or rewrite
+shared files (station sweeps, city prefetch, readings compaction) should run
+in one process only. The worker holding an exclusive `flock` on
+LEADER_LOCK_PATH is the leader; the others read the leader's results from the
+shared SQLite files. If the leader exits, the kernel releases the lock and
+the next worker to call `acquire()` takes over.
+
+Without fcntl (non-POSIX) every process considers itself the leader.
+"""
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except Exception:
+    HAS_FCNTL = False
+
+# ---------------- CONFIG ----------------
+LEADER_LOCK_PATH = os.getenv("LEADER_LOCK_PATH") or str(Path(__file__).parent / "leader.lock")
+
+
+class LeaderLock:
+    """Non-blocking, process-wide leadership based on an exclusive file lock."""
+
+    def __init__(self, path: str = LEADER_LOCK_PATH):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+
+    def acquire(self) -> bool:
+        """True if this process is (or has just become) the leader. Cheap to call in a loop."""
+        if not HAS_FCNTL:
+            return True
+        if self._fd is not None and self._pid == os.getpid():
+            return True
+        if self._fd is not None:
+            # Inherited across fork: it shares the parent's lock, so drop our copy
+            os.close(self._fd)
+            self._fd, self._pid = None, None
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd, self._pid = fd, os.getpid()
+        print(f"LEADER: worker {os.getpid()} runs the background jobs")
+        return True
+
+    @property
+    def is_leader(self) -> bool:
+        return not HAS_FCNTL or (self._fd is not None and self._pid == os.getpid())
+
+    def release(self) -> None:
+        if self._fd is not None and self._pid == os.getpid():
+            os.close(self._fd)  # closing the descriptor drops the lock
+        self._fd, self._pid = None, None
+
+    def stats(self) -> Dict:
+        return {"pid": os.getpid(), "leader": self.is_leader, "lock_path": self.path}
+
+
+# Shared by every background job in this process
+leader = LeaderLock()
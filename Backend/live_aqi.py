@@ -0,0 +1,137 @@
+"""
+Live AQI Resolver Module
+Resolves the live AQI shown for a city: the WAQI city feed, refined by the
+feed of the city's highest-AQI station (as on the live page).
+
+The city feed and the station lookup run concurrently under one deadline;
+whatever has arrived when it expires is used, and unfinished fetches keep
+running so they warm the caches for the next call. The city -> max-station
+uid mapping is cached, so a warm call needs only the station feed request
+(the city feed is normally already in the prefetcher-fed feed cache).
+"""
+import asyncio
+import os
+from typing import Dict, NamedTuple, Optional
+
+from Backend.cache import TTLCache
+from Backend.shared_cache import shared_store
+from Backend.waqi import get_waqi_feed, search_stations, feed_key, UpstreamError
+
+# ---------------- CONFIG ----------------
+LIVE_AQI_DEADLINE = float(os.getenv("LIVE_AQI_DEADLINE", "6"))        # whole resolution, seconds
+STATION_FEED_TIMEOUT = float(os.getenv("STATION_FEED_TIMEOUT", "3"))
+# The busiest station of a city rarely changes within the hour
+MAX_STATION_TTL = float(os.getenv("MAX_STATION_TTL", "3600"))
+MAX_STATION_STALE_TTL = float(os.getenv("MAX_STATION_STALE_TTL", "86400"))
+
+# city key -> uid of its highest-AQI station (0 = the search found none)
+max_station_cache = TTLCache(
+    "waqi_max_station",
+    ttl=MAX_STATION_TTL,
+    maxsize=512,
+    stale_ttl=MAX_STATION_STALE_TTL,
+    shared=shared_store,
+)
+
+
+class LiveAQI(NamedTuple):
+    result: Dict                        # city, aqi, dominant_pollutant, components, time
+    station_uid: Optional[int]          # station whose feed refined the result, if any
+    station_feed: Optional[Dict]
+    city_feed: Optional[Dict]           # the city's own feed, when it arrived in time
+    complete: bool                      # False when the deadline cut a lookup short
+
+
+# ---------------- HELPERS ----------------
+def max_station_uid(search_data) -> Optional[int]:
+    """uid of the station with the highest numeric AQI in a WAQI `/search/` payload."""
+    stations = search_data.get("data", []) if isinstance(search_data, dict) else []
+    best, best_aqi = None, -1.0
+    for s in stations:
+        aqi_raw = s.get("aqi", "-")
+        try:
+            aqi_val = float(aqi_raw) if aqi_raw != "-" else -1
+        except (ValueError, TypeError):
+            continue
+        if aqi_val < 0:
+            continue
+        if aqi_val > best_aqi and s.get("uid"):
+            best, best_aqi = s["uid"], aqi_val
+    return best
+
+
+async def _station_uid(city: str, timeout: float) -> Optional[int]:
+    async def load() -> int:
+        return max_station_uid(await search_stations(city, timeout=timeout)) or 0
+
+    return await max_station_cache.aget_or_load(feed_key(city), load) or None
+
+
+async def _station_feed(city: str, timeout: float):
+    """(uid, ok feed or None) for the city's max station; (None, None) if it has none."""
+    uid = await _station_uid(city, timeout)
+    if not uid:
+        return None, None
+    feed = await get_waqi_feed(uid, timeout=min(timeout, STATION_FEED_TIMEOUT))
+    if feed.get("status") != "ok" or not feed.get("data"):
+        # Station went away or stopped reporting: search again next time
+        max_station_cache.invalidate(feed_key(city))
+        return uid, None
+    return uid, feed
+
+
+def _consume(task: asyncio.Task) -> None:
+    # Late fetches keep running to warm the caches; consume their outcome quietly
+    if not task.cancelled():
+        task.exception()
+
+
+def _outcome(task: asyncio.Task, done) -> Optional[object]:
+    if task not in done or task.exception() is not None:
+        return None
+    return task.result()
+
+
+# ---------------- RESOLVER ----------------
+async def resolve_live_aqi(city: str, deadline: Optional[float] = None) -> Optional[LiveAQI]:
+    """
+    Best live AQI for `city` available within `deadline` seconds (LIVE_AQI_DEADLINE by default).
+    Returns None when WAQI does not know the city; raises UpstreamError when
+    nothing usable arrived in time.
+    """
+    deadline = LIVE_AQI_DEADLINE if deadline is None else deadline
+    city_task = asyncio.ensure_future(get_waqi_feed(city, timeout=deadline))
+    station_task = asyncio.ensure_future(_station_feed(city, deadline))
+    done, pending = await asyncio.wait({city_task, station_task}, timeout=deadline)
+    for task in (city_task, station_task):
+        task.add_done_callback(_consume)
+
+    data = _outcome(city_task, done)
+    uid, fd_feed = _outcome(station_task, done) or (None, None)
+    if data is not None and data.get("status") != "ok":
+        return None
+    if data is None and fd_feed is None:
+        if city_task in done and city_task.exception() is not None:
+            raise city_task.exception()
+        raise UpstreamError(f"no live AQI for {city!r} within {deadline}s")
+
+    # By default use the city feed values
+    d = data["data"] if data is not None else {}
+    result = {
+        "city": d.get("city", {}).get("name", city),
+        "aqi": d.get("aqi", "-"),
+        "dominant_pollutant": d.get("dominentpol", "N/A"),
+        "components": d.get("iaqi", {}),
+        "time": d.get("time", {}).get("s", "N/A"),
+    }
+    if fd_feed is not None:
+        # Prefer the max station's values (components/time/aqi)
+        fd = fd_feed["data"]
+        if data is None:
+            result["dominant_pollutant"] = fd.get("dominentpol", "N/A")
+        result["aqi"] = fd.get("aqi", result["aqi"])
+        result["components"] = fd.get("iaqi", result["components"])
+        # feed time format may vary, try common keys
+        result["time"] = fd.get("time", {}).get("s") or fd.get("time", {}).get("stime") or result["time"]
+        result["city"] = fd.get("city", {}).get("name", result["city"])
+    return LiveAQI(result, uid if fd_feed is not None else None, fd_feed, data, not pending)
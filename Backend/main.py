@@ -1,20 +1,21 @@
-from fastapi import FastAPI, HTTPException, Body, Depends
+from fastapi import FastAPI, HTTPException, Body, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from starlette.requests import Request
-import requests
+import asyncio
 import pandas as pd
 from pathlib import Path
 from pydantic import BaseModel, EmailStr
-from typing import Optional, Literal, List, Dict
+from typing import Optional, Literal, List, Dict, Tuple
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 import io
 import base64
-from datetime import datetime, timedelta
+import calendar
+from datetime import datetime, timedelta, date as date_type
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
+import time
 import google.generativeai as genai
 
 # Import authentication module
@@ -23,14 +24,69 @@ from Backend.auth import (
     create_access_token, get_current_user, get_current_user_optional,
     verify_password, get_user_by_email, create_user,
     supabase_admin_create_user, supabase_sign_in, ensure_local_user_from_supabase,
-    get_user_favorites, add_favorite_city, remove_favorite_city
+    add_favorite_city, remove_favorite_city, close_pool
 )
 from Backend.auth import SUPABASE_AVAILABLE, SUPABASE_SERVICE_AVAILABLE, SUPABASE_URL
+from Backend.auth import token_cache as auth_token_cache, user_cache as auth_user_cache
+from Backend.waqi import get_waqi_feed, search_stations, map_bounds, feed_cache, UpstreamError
+from Backend import http_client
+from Backend.prefetch import CityPrefetcher, PREFETCH_ENABLED
+from Backend.live_aqi import resolve_live_aqi, max_station_cache
+from Backend.leader import leader
+from Backend.shared_cache import shared_store
+from Backend import open_meteo
+from Backend.historical_store import SEASON_BY_MONTH
+from Backend import series
+from Backend.responses import Records, fast_json
+from Backend.http_cache import (
+    CacheRule, ResponseCache, ResponseCacheMiddleware, DEGRADED_HEADER, cache_control, hour_version,
+    seconds_to_next_hour,
+)
+from Backend.dataset_reload import DatasetReloader, DATASET_RELOAD_ENABLED
+from Backend.readings_store import (
+    ReadingsStore, READINGS_ENABLED, READINGS_HOURLY_DAYS, KIND_CITY, KIND_STATION,
+)
+from Backend.station_registry import StationRegistry, STATION_REGISTRY_ENABLED, as_search_result
+from Backend.spatial import CityDirectory, bounding_box, coords_array, within_radius
+from Backend.forecasting import load_forecaster, FORECAST_MAX_DAYS
+from Backend.model_serving import load_model, formula_aqi, PredictionBatcher
+from Backend.open_meteo import OPEN_METEO_AIR_URL, OPEN_METEO_FORECAST_URL, OPEN_METEO_HOURLY_VARS
 import traceback
 
 # ---------------- APP CONFIGURATION ----------------
 app = FastAPI(title="Air Quality Intelligence API")
 
+# Rendered-response cache for routes that only change with the dataset or the hour.
+# Registered before CORS so CORS stays the outermost layer and decorates cached replies too.
+HISTORICAL_MAX_AGE = int(os.getenv("HISTORICAL_MAX_AGE", "60"))
+HISTORICAL_EDGE_MAX_AGE = int(os.getenv("HISTORICAL_EDGE_MAX_AGE", "600"))
+HISTORICAL_STALE_WHILE_REVALIDATE = int(os.getenv("HISTORICAL_STALE_WHILE_REVALIDATE", "86400"))
+SATELLITE_STALE_WHILE_REVALIDATE = int(os.getenv("SATELLITE_STALE_WHILE_REVALIDATE", "600"))
+
+response_cache = ResponseCache([
+    CacheRule(
+        "historical",
+        paths=["/analytics", "/compare", "/api/historical/"],
+        # Intraday and daily-readings come from live recordings, not the dataset
+        exclude=["/api/historical/intraday/", "/api/historical/daily-readings/"],
+        version=lambda: dataset.version,
+        cache_control=lambda: cache_control(
+            HISTORICAL_MAX_AGE, HISTORICAL_EDGE_MAX_AGE, HISTORICAL_STALE_WHILE_REVALIDATE
+        ),
+    ),
+    CacheRule(
+        "satellite",
+        paths=["/satellite/"],
+        # Open-Meteo batches are cached per UTC hour (see Backend/open_meteo.py)
+        version=hour_version,
+        cache_control=lambda: cache_control(
+            min(HISTORICAL_MAX_AGE, seconds_to_next_hour()), seconds_to_next_hour(),
+            SATELLITE_STALE_WHILE_REVALIDATE,
+        ),
+    ),
+])
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
+
 # Enable CORS for frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -62,51 +118,52 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
     headers = {"Access-Control-Allow-Origin": origin, "Access-Control-Allow-Credentials": "true"}
     return JSONResponse(status_code=500, content={"detail": "Internal server error"}, headers=headers)
 
-# ---------------- CONSTANTS ----------------
-# Note: In production, use environment variables for tokens
-WAQI_TOKEN = os.getenv("WAQI_TOKEN", "9fe0a55684bf08d8c8131b1cba6233542f86f55d")
 
-# Open-Meteo Air Quality API base URL (no key for non-commercial) [web:449][web:538]
-OPEN_METEO_AIR_URL = "https://air-quality-api.open-meteo.com/v1/air-quality"
+@app.on_event("shutdown")
+async def close_upstream_clients():
+    # Release pooled keep-alive connections to WAQI / Open-Meteo / Supabase
+    await http_client.aclose()
 
-# Basic per-request set of hourly variables we want (max useful set) [web:449][web:485]
-OPEN_METEO_HOURLY_VARS = (
-    "pm10,pm2_5,dust,"
-    "carbon_monoxide,nitrogen_dioxide,sulphur_dioxide,ozone,"
-    "us_aqi,european_aqi"
-)
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    # Close pooled Postgres connections (no-op for SQLite)
+    await asyncio.to_thread(close_pool)
+
+# ---------------- CONSTANTS ----------------
+# WAQI_TOKEN and the shared feed cache live in Backend/waqi.py;
+# Open-Meteo URLs and hourly variables live in Backend/open_meteo.py
 
 # Path configuration
 # Use repo-root `Dataset/aqi_timeseries.csv` directly (no Backend subfolder)
 BASE_DIR = Path(__file__).parent
 CSV_PATH = BASE_DIR.parent / "Dataset" / "aqi_timeseries.csv"
+# Columnar copy written by `python -m Backend.convert_dataset`; memory-mapped on load
+ARROW_PATH = CSV_PATH.with_suffix(".arrow")
+
 
 # ---------------- LOAD DATA ----------------
-# Ensure the Dataset folder and csv exist relative to this script
-if not CSV_PATH.exists():
+# Ensure the Dataset folder and csv exist relative to this script.
+# `dataset.store` is swapped in place when the file changes (see Backend/dataset_reload.py);
+# endpoints read it once into a local so one request never mixes two versions.
+dataset = DatasetReloader(CSV_PATH, ARROW_PATH)
+if not dataset.dataset_path().exists():
     print(f"⚠ WARNING: CSV NOT FOUND at {CSV_PATH}. Analytics endpoints will fail.")
-    df = pd.DataFrame(columns=["city", "aqi", "date"])  # Empty fallback
 else:
-    try:
-        df = pd.read_csv(CSV_PATH, encoding="utf-8-sig")
+    # Sorted by (city, date) with a per-city offset index (see Backend/historical_store.py)
+    dataset.reload(force=True)
 
 
-        # Clean column names
-        df.columns = [c.strip().lower().replace("\ufeff", "") for c in df.columns]
+@app.on_event("startup")
+async def start_dataset_watcher():
+    if DATASET_RELOAD_ENABLED:
+        dataset.start()
 
-        # Standard column names
-        CITY_COL = "city"
-        AQI_COL = "aqi"
-        DATE_COL = "date"
 
-        # Convert date column
-        df[DATE_COL] = pd.to_datetime(df[DATE_COL], dayfirst=True, errors="coerce")
-        df = df.dropna(subset=[DATE_COL])
+@app.on_event("shutdown")
+async def stop_dataset_watcher():
+    dataset.stop()
 
-        print("✅ Data loaded successfully.")
-    except Exception as e:
-        print(f"❌ Error loading CSV: {e}")
-        df = pd.DataFrame(columns=["city", "aqi", "date"])
 
 # ---------------- INDIAN CITIES (FOR SATELLITE MAP) ----------------
 # Same list as frontend (lat/lng) so /satellite/map can return all cities
@@ -177,17 +234,71 @@ INDIAN_CITIES = [
     {"name": "Shillong", "lat": 25.5788, "lng": 91.8933},
 ]
 
+# Case-insensitive name lookup over INDIAN_CITIES (see Backend/spatial.py)
+city_directory = CityDirectory(INDIAN_CITIES)
+
+# Hourly log of every live reading we fetch (see Backend/readings_store.py)
+readings = ReadingsStore(leader=leader)
+
+
+def _record_station_rows(stations: List[Dict]) -> None:
+    for st in stations:
+        readings.record(KIND_STATION, st["uid"], st["name"], st["aqi"])
+
+
+@app.on_event("startup")
+async def start_readings_store():
+    if READINGS_ENABLED:
+        readings.start()
+
+
+@app.on_event("shutdown")
+async def stop_readings_store():
+    await readings.stop()
+
+
+# Background refresher keeping every INDIAN_CITIES AQI warm (see Backend/prefetch.py)
+# With several workers only the leader polls; the rest read its results from the shared cache
+prefetcher = CityPrefetcher(
+    INDIAN_CITIES, on_feed=lambda name, feed: readings.record_feed(KIND_CITY, name, feed),
+    leader=leader if shared_store is not None else None,
+)
+
+
+# Local mirror of WAQI stations in India (see Backend/station_registry.py)
+station_registry = StationRegistry(on_sweep=_record_station_rows, leader=leader)
+
+
+@app.on_event("startup")
+async def start_station_registry():
+    if STATION_REGISTRY_ENABLED:
+        station_registry.start()
+
+
+@app.on_event("shutdown")
+async def stop_station_registry():
+    await station_registry.stop()
+
+
+@app.on_event("startup")
+async def start_prefetcher():
+    if PREFETCH_ENABLED:
+        prefetcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_prefetcher():
+    await prefetcher.stop()
+
 # ---------------- HELPER FUNCTIONS ----------------
 
-def fetch_aqi_waqi(city: str) -> dict:
+async def fetch_aqi_waqi(city: str) -> dict:
     """
     Helper function to fetch AQI data from WAQI API.
     Returns dict with 'aqi', 'category', 'city' keys.
     Raises exception if request fails.
     """
-    url = f"https://api.waqi.info/feed/{city}/"
-    res = requests.get(url, params={"token": WAQI_TOKEN}, timeout=10)
-    data = res.json()
+    data = await get_waqi_feed(city, timeout=10)
     
     if data.get("status") != "ok":
         raise HTTPException(status_code=404, detail="City not found")
@@ -228,167 +339,85 @@ def root():
 # -------- CITIES LIST --------
 @app.get("/cities")
 def get_cities():
-    if df.empty:
+    store = dataset.store
+    if store.empty:
         return []
-    return sorted(df["city"].dropna().unique().tolist())
+    return store.cities()
 
 
 @app.get("/cities/all")
 def get_all_cities():
     """Return all unique cities from the CSV (no external calls)."""
-    if df.empty:
+    store = dataset.store
+    if store.empty:
         return {"cities": [], "count": 0}
-    cities = sorted(df["city"].dropna().unique().tolist())
+    cities = store.cities()
 
     # Attempt to map coordinates from INDIAN_CITIES if possible
-    coords_map = {c["name"].lower(): (c["lat"], c["lng"]) for c in INDIAN_CITIES}
     result = []
     for name in cities:
-        coord = coords_map.get(name.lower())
+        coord = city_directory.find(name)
         item = {"name": name}
         if coord:
-            item.update({"lat": coord[0], "lng": coord[1]})
+            item.update({"lat": coord["lat"], "lng": coord["lng"]})
         result.append(item)
     return {"cities": result, "count": len(result)}
 
 
 @app.get("/cities/available")
-def get_available_cities():
+def get_available_cities(request: Request):
     """
-    Return all cities from CSV, attempting a best-effort WAQI lookup for AQI values and coordinates if available.
-    This will include cities even if WAQI or satellite data is unavailable; aqi will be null in that case.
-    Uses concurrent requests to speed up WAQI lookups but does not fail the whole call if external requests fail.
+    Return INDIAN_CITIES with their current AQI, ranked highest first.
+    Served from the background prefetch snapshot (no WAQI calls per request);
+    cities without a reading yet are omitted. `snapshot_age_seconds` is the age
+    of the oldest reading included.
     """
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    import logging
+    if dataset.store.empty:
+        return fast_json(request, {"cities": [], "count": 0, "snapshot_age_seconds": None})
 
-    if df.empty:
-        return {"cities": [], "count": 0}
-
-    # Use only the predefined INDIAN_CITIES for map and ranking (ensures coords are available)
-    csv_cities = [c["name"] for c in INDIAN_CITIES]
-
-    # Map coords from INDIAN_CITIES (ensures coords for those known cities)
-    coords_map = {c["name"].lower(): (c["lat"], c["lng"]) for c in INDIAN_CITIES}
-
-    def fetch_city_info(name: str):
-        info: Dict = {"name": name, "lat": None, "lng": None, "aqi": None}
-        try:
-            coord = coords_map.get(name.lower())
-            if coord:
-                info["lat"], info["lng"] = coord
-
-            # Try to fetch WAQI AQI for the city with a small timeout
-            url = f"https://api.waqi.info/feed/{name}/"
-            try:
-                res = requests.get(url, params={"token": WAQI_TOKEN}, timeout=3)
-                data = res.json()
-                if data.get("status") == "ok":
-                    aqi_value = data.get("data", {}).get("aqi")
-                    if aqi_value not in ["-", None, ""]:
-                        try:
-                            info["aqi"] = float(aqi_value)
-                        except (ValueError, TypeError):
-                            info["aqi"] = None
-            except requests.RequestException:
-                # Non-fatal: leave aqi as None when WAQI lookup fails
-                pass
-        except Exception as e:
-            logging.debug(f"Error preparing city {name}: {e}")
-        return info
-
-    results = []
-    with ThreadPoolExecutor(max_workers=15) as executor:
-        futures = [executor.submit(fetch_city_info, name) for name in csv_cities]
-        for future in as_completed(futures):
-            res = future.result()
-            if res:
-                results.append(res)
-
-    # Keep only cities for which WAQI lookup returned a numeric AQI (exclude None)
-    results = [r for r in results if r.get("aqi") is not None]
+    entries = prefetcher.entries()
+    results = [
+        {"name": e["name"], "lat": e["lat"], "lng": e["lng"], "aqi": e["aqi"]}
+        for e in entries
+    ]
 
     # Sort by AQI descending
     results.sort(key=lambda x: x["aqi"], reverse=True)
 
-    return {"cities": results, "count": len(results)}
+    return fast_json(
+        request, {"cities": results, "count": len(results), "snapshot_age_seconds": prefetcher.age_seconds(entries)}
+    )
 
 
 # -------- LIVE AQI (GROUND) --------
 @app.get("/live/aqi")
-def get_live_aqi(city: str):
+async def get_live_aqi(city: str):
     """
     Fetches real-time AQI from WAQI API (ground data).
     """
     if not city:
         raise HTTPException(status_code=400, detail="City name is required")
 
-    url = f"https://api.waqi.info/feed/{city}/"
+    # City feed and max-station lookup run concurrently under LIVE_AQI_DEADLINE
     try:
-        res = requests.get(url, params={"token": WAQI_TOKEN}, timeout=10)
-        data = res.json()
-    except requests.RequestException:
+        live = await resolve_live_aqi(city)
+    except UpstreamError:
         raise HTTPException(status_code=503, detail="External API unavailable")
 
-    if data.get("status") != "ok":
+    if live is None:
         raise HTTPException(status_code=404, detail="City not found or data unavailable")
 
-    d = data["data"]
-
-    # By default use the city feed values
-    result_city = {
-        "city": d.get("city", {}).get("name", city),
-        "aqi": d.get("aqi", "-"),
-        "dominant_pollutant": d.get("dominentpol", "N/A"),
-        "components": d.get("iaqi", {}),
-        "time": d.get("time", {}).get("s", "N/A"),
-    }
-
-    # Try to fetch the highest-AQI station feed for the city and prefer its timestamp/components
-    try:
-        search_url = "https://api.waqi.info/search/"
-        search_res = requests.get(search_url, params={"token": WAQI_TOKEN, "keyword": city}, timeout=8)
-        search_data = search_res.json()
-        stations = search_data.get("data", []) if isinstance(search_data, dict) else []
-        # pick station with highest numeric aqi
-        max_station = None
-        for s in stations:
-            aqi_raw = s.get("aqi", "-")
-            try:
-                aqi_val = float(aqi_raw) if aqi_raw != "-" else -1
-            except (ValueError, TypeError):
-                continue
-            if aqi_val < 0:
-                continue
-            if not max_station or aqi_val > max_station.get("_aqi_val", -1):
-                s["_aqi_val"] = aqi_val
-                max_station = s
-
-        if max_station and max_station.get("uid"):
-            uid = max_station.get("uid")
-            feed_url = f"https://api.waqi.info/feed/@{uid}/"
-            try:
-                feed_res = requests.get(feed_url, params={"token": WAQI_TOKEN}, timeout=3)
-                feed_data = feed_res.json()
-                if feed_data.get("status") == "ok" and feed_data.get("data"):
-                    fd = feed_data.get("data")
-                    # Prefer station feed values (components/time/aqi)
-                    result_city["aqi"] = fd.get("aqi", result_city["aqi"])
-                    result_city["components"] = fd.get("iaqi", result_city["components"])
-                    # feed time format may vary, try common keys
-                    result_city["time"] = fd.get("time", {}).get("s") or fd.get("time", {}).get("stime") or result_city["time"]
-                    # use station's city name if available
-                    result_city["city"] = fd.get("city", {}).get("name", result_city["city"])
-            except requests.RequestException:
-                pass
-    except requests.RequestException:
-        pass
-
-    return result_city
+    # City history always comes from the city feed (as the prefetcher records it);
+    # the max station's reading is kept under its own uid
+    if live.city_feed is not None:
+        readings.record_feed(KIND_CITY, city, live.city_feed)
+    if live.station_feed is not None:
+        readings.record_feed(KIND_STATION, live.station_uid, live.station_feed)
+    return live.result
 
 
 @app.get("/live/aqi/stations")
-def get_city_stations(city: str):
+async def get_city_stations(city: str):
     """
     Fetches all monitoring stations in a city with their AQI data.
     Searches for all stations containing the city name.
@@ -408,20 +437,22 @@ def get_city_stations(city: str):
     elif city_lower == "bangalore" or city_lower == "bengaluru":
         search_keywords.extend(["Bangalore", "Bengaluru"])
     
-    all_stations_raw = []
-    
-    # Search with each keyword
-    for keyword in search_keywords:
-        search_url = f"https://api.waqi.info/search/"
-        try:
-            search_res = requests.get(search_url, params={"token": WAQI_TOKEN, "keyword": keyword}, timeout=10)
-            search_data = search_res.json()
+    # Answer from the local station registry when it has been populated
+    all_stations_raw = [as_search_result(s) for s in station_registry.search(search_keywords)]
+
+    if not all_stations_raw:
+        # Search with all keywords concurrently
+        search_results = await asyncio.gather(
+            *(search_stations(keyword, timeout=10) for keyword in search_keywords),
+            return_exceptions=True,
+        )
+        for keyword, search_data in zip(search_keywords, search_results):
+            if isinstance(search_data, Exception):
+                continue
             print(f"Search for '{keyword}' returned {len(search_data.get('data', []))} results")
-        except requests.RequestException:
-            continue
 
-        if search_data.get("status") == "ok":
-            all_stations_raw.extend(search_data.get("data", []))
+            if search_data.get("status") == "ok":
+                all_stations_raw.extend(search_data.get("data", []))
     
     print(f"Total raw stations before filtering: {len(all_stations_raw)}")
     
@@ -513,34 +544,14 @@ def get_city_stations(city: str):
     # If we have coordinates for the city, filter stations by proximity
     city_info = _find_city_coords(city)
     if city_info:
-        # Haversine distance (km)
-        from math import radians, sin, cos, atan2, sqrt
-
-        def haversine_km(lat1, lon1, lat2, lon2):
-            R = 6371.0
-            dlat = radians(lat2 - lat1)
-            dlon = radians(lon2 - lon1)
-            a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-            c = 2 * atan2(sqrt(a), sqrt(1 - a))
-            return R * c
-
         # Default radius in km (tunable). Use smaller radius to avoid foreign matches.
         CITY_RADIUS_KM = 80
-        filtered = []
-        for s in city_stations:
-            lat = s.get("coordinates", {}).get("lat")
-            lng = s.get("coordinates", {}).get("lng")
-            # skip stations without coordinates
-            if lat is None or lng is None:
-                continue
-            try:
-                dist = haversine_km(city_info["lat"], city_info["lng"], float(lat), float(lng))
-            except Exception:
-                continue
-            if dist <= CITY_RADIUS_KM:
-                filtered.append(s)
-
-        city_stations = filtered
+        # One vectorized haversine pass; stations without coordinates never match
+        coords, _ = coords_array(
+            (s["coordinates"].get("lat"), s["coordinates"].get("lng")) for s in city_stations
+        )
+        mask, _ = within_radius(city_info["lat"], city_info["lng"], coords, CITY_RADIUS_KM)
+        city_stations = [s for s, keep in zip(city_stations, mask) if keep]
 
     if not city_stations:
         raise HTTPException(status_code=404, detail=f"No stations found for {city}")
@@ -551,40 +562,38 @@ def get_city_stations(city: str):
     # Fetch full details only for top 10 stations concurrently (dramatic speed improvement)
     top_stations = city_stations[:10]
     
-    def fetch_station_components(station):
+    async def fetch_station_components(station):
         uid = station.get("uid")
         if not uid:
             return station
         try:
-            feed_url = f"https://api.waqi.info/feed/@{uid}/"
-            feed_res = requests.get(feed_url, params={"token": WAQI_TOKEN}, timeout=3)
-            if feed_res.status_code == 200:
-                feed_data = feed_res.json()
-                if feed_data.get("status") == "ok" and feed_data.get("data"):
-                    iaqi = feed_data["data"].get("iaqi", {})
-                    components = {}
-                    if "pm25" in iaqi:
-                        components["pm25"] = iaqi["pm25"].get("v") if isinstance(iaqi["pm25"], dict) else iaqi["pm25"]
-                    if "pm10" in iaqi:
-                        components["pm10"] = iaqi["pm10"].get("v") if isinstance(iaqi["pm10"], dict) else iaqi["pm10"]
-                    if "no2" in iaqi:
-                        components["no2"] = iaqi["no2"].get("v") if isinstance(iaqi["no2"], dict) else iaqi["no2"]
-                    if "o3" in iaqi:
-                        components["o3"] = iaqi["o3"].get("v") if isinstance(iaqi["o3"], dict) else iaqi["o3"]
-                    if "so2" in iaqi:
-                        components["so2"] = iaqi["so2"].get("v") if isinstance(iaqi["so2"], dict) else iaqi["so2"]
-                    if "co" in iaqi:
-                        components["co"] = iaqi["co"].get("v") if isinstance(iaqi["co"], dict) else iaqi["co"]
-                    station["components"] = components
-        except requests.RequestException:
+            feed_data = await get_waqi_feed(uid, timeout=3)
+            if feed_data.get("status") == "ok" and feed_data.get("data"):
+                iaqi = feed_data["data"].get("iaqi", {})
+                components = {}
+                if "pm25" in iaqi:
+                    components["pm25"] = iaqi["pm25"].get("v") if isinstance(iaqi["pm25"], dict) else iaqi["pm25"]
+                if "pm10" in iaqi:
+                    components["pm10"] = iaqi["pm10"].get("v") if isinstance(iaqi["pm10"], dict) else iaqi["pm10"]
+                if "no2" in iaqi:
+                    components["no2"] = iaqi["no2"].get("v") if isinstance(iaqi["no2"], dict) else iaqi["no2"]
+                if "o3" in iaqi:
+                    components["o3"] = iaqi["o3"].get("v") if isinstance(iaqi["o3"], dict) else iaqi["o3"]
+                if "so2" in iaqi:
+                    components["so2"] = iaqi["so2"].get("v") if isinstance(iaqi["so2"], dict) else iaqi["so2"]
+                if "co" in iaqi:
+                    components["co"] = iaqi["co"].get("v") if isinstance(iaqi["co"], dict) else iaqi["co"]
+                station["components"] = components
+        except UpstreamError:
             pass
         return station
 
-    # Use ThreadPoolExecutor for concurrent requests (max 5 parallel)
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {executor.submit(fetch_station_components, s): s for s in top_stations}
-        for future in as_completed(futures):
-            pass  # Results are updated in-place
+    # Fetch concurrently; results are updated in-place
+    await asyncio.gather(*(fetch_station_components(s) for s in top_stations))
+
+    for s in city_stations:
+        if s.get("uid"):
+            readings.record(KIND_STATION, s["uid"], s["station_name"], s["aqi"], s["components"])
 
     return {
         "city": city,
@@ -595,93 +604,237 @@ def get_city_stations(city: str):
 
 # -------- ANALYTICS (HISTORICAL, GROUND) --------
 @app.get("/analytics")
-def get_analytics(city: str):
+def get_analytics(
+    request: Request,
+    city: str,
+    start: Optional[date_type] = None,
+    end: Optional[date_type] = None,
+    resolution: Literal["day", "week", "month"] = "day",
+    max_points: Optional[int] = None,
+    downsample: Literal["lttb", "minmax"] = "lttb",
+    format: Literal["json", "ndjson", "arrow"] = "json",
+):
     """
-    Returns all available AQI data for a specific city from the CSV (ground).
-    Shows full historical series available in the CSV for that city.
+    Returns AQI data for a specific city from the CSV (ground).
+    Without parameters this is the full daily series. `start`/`end` narrow the
+    range, `resolution` averages per week or month, `max_points` downsamples
+    (LTTB or per-bucket min/max). `format=ndjson` streams one point per line and
+    `format=arrow` returns an Arrow IPC stream.
     """
-    if df.empty:
+    store = dataset.store
+    if store.empty:
         raise HTTPException(status_code=500, detail="Historical data not loaded")
+    if max_points is not None and max_points < 2:
+        raise HTTPException(status_code=400, detail="max_points must be at least 2")
 
-    sub = df[df["city"] == city].sort_values("date")
+    sub = store.city_frame(city)
 
     if sub.empty:
         raise HTTPException(status_code=404, detail=f"No historical data found for {city}")
 
-    return {
-        "dates": sub["date"].astype(str).tolist(),
-        "aqi": sub["aqi"].tolist(),
-    }
+    dates, values = series.window(sub, start, end)
+    dates, values = series.resample(dates, values, resolution)
+    source_points = len(dates)
+    dates, values = series.downsample(dates, values, max_points, downsample)
+
+    if format == "ndjson":
+        return StreamingResponse(series.iter_ndjson(dates, values), media_type="application/x-ndjson")
+    if format == "arrow":
+        if not series.HAS_PYARROW:
+            raise HTTPException(status_code=400, detail="Arrow format not available on this server")
+        return Response(series.arrow_stream(dates, values), media_type="application/vnd.apache.arrow.stream")
+
+    # The AQI column goes to orjson as a NumPy array (no per-value Python objects)
+    return fast_json(request, {
+        "dates": series.date_strings(dates),
+        "aqi": values,
+        "resolution": resolution,
+        "source_points": source_points,
+    })
 
 
 # -------- COMPARE CITIES (GROUND) --------
 @app.get("/compare")
-def compare_cities(city1: str, city2: str):
+def compare_cities(
+    city1: str,
+    city2: str,
+    start: Optional[date_type] = None,
+    end: Optional[date_type] = None,
+    resolution: Literal["day", "week", "month"] = "day",
+    max_points: Optional[int] = None,
+    downsample: Literal["lttb", "minmax"] = "lttb",
+):
     """
     Returns historical data for two cities for comparison (ground).
+    Defaults to the last 365 days; accepts the same range/resolution/downsampling
+    parameters as /analytics.
     """
-    if df.empty:
+    store = dataset.store
+    if store.empty:
         raise HTTPException(status_code=500, detail="Historical data not loaded")
+    if max_points is not None and max_points < 2:
+        raise HTTPException(status_code=400, detail="max_points must be at least 2")
 
-    d1 = df[df["city"] == city1].sort_values("date").tail(365)
-    d2 = df[df["city"] == city2].sort_values("date").tail(365)
+    d1 = store.city_frame(city1)
+    d2 = store.city_frame(city2)
+    if start is None and end is None:
+        d1, d2 = d1.tail(365), d2.tail(365)
 
     if d1.empty:
         raise HTTPException(status_code=404, detail=f"No data for {city1}")
     if d2.empty:
         raise HTTPException(status_code=404, detail=f"No data for {city2}")
 
+    def prepare(frame):
+        dates, values = series.window(frame, start, end)
+        dates, values = series.resample(dates, values, resolution)
+        return series.downsample(dates, values, max_points, downsample)
+
+    dates1, aqi1 = prepare(d1)
+    dates2, aqi2 = prepare(d2)
     return {
         "city1": {
             "name": city1,
-            "dates": d1["date"].astype(str).tolist(),
-            "aqi": d1["aqi"].tolist(),
+            "dates": series.date_strings(dates1),
+            "aqi": aqi1.tolist(),
         },
         "city2": {
             "name": city2,
-            "dates": d2["date"].astype(str).tolist(),
-            "aqi": d2["aqi"].tolist(),
+            "dates": series.date_strings(dates2),
+            "aqi": aqi2.tolist(),
         },
     }
 
 
-# -------- PREDICT AQI (ML Placeholder) --------
+# -------- PREDICT AQI (XGBoost) --------
+# Loaded once per process; None means the artifacts are absent and the formula is used
+aqi_model = load_model()
+predict_batcher = PredictionBatcher(aqi_model) if aqi_model else None
+PREDICT_BATCH_LIMIT = 10000
+
+
+class PollutantInput(BaseModel):
+    pm25: float
+    pm10: float
+    no2: float
+    so2: float
+    co: float
+    o3: float
+    no: Optional[float] = None
+    nox: Optional[float] = None
+    nh3: Optional[float] = None
+    benzene: Optional[float] = None
+    toluene: Optional[float] = None
+    xylene: Optional[float] = None
+    city: Optional[str] = None
+    date: Optional[date_type] = None   # defaults to today
+
+
+class PredictBatchRequest(BaseModel):
+    items: List[PollutantInput]
+
+
+def _prediction_note() -> str:
+    if aqi_model:
+        return "Prediction from the trained XGBoost model"
+    return "Prediction based on weighted pollutant analysis (model artifacts not found)"
+
+
 @app.get("/predict")
-def predict_aqi(
+async def predict_aqi(
     pm25: float,
     pm10: float,
     no2: float,
     so2: float,
     co: float,
     o3: float,
+    no: Optional[float] = None,
+    nox: Optional[float] = None,
+    nh3: Optional[float] = None,
+    benzene: Optional[float] = None,
+    toluene: Optional[float] = None,
+    xylene: Optional[float] = None,
+    city: Optional[str] = None,
+    date: Optional[date_type] = None,
 ):
     """
     Predicts AQI based on input pollutants.
-    Currently uses a weighted formula as a placeholder for the XGBoost model.
+    Concurrent requests are micro-batched into one model call (see Backend/model_serving.py).
     """
-    predicted_aqi = round(
-        (pm25 * 0.4)
-        + (pm10 * 0.2)
-        + (no2 * 0.15)
-        + (so2 * 0.1)
-        + (co * 0.1)
-        + (o3 * 0.05),
-        2,
-    )
+    item = PollutantInput(
+        pm25=pm25, pm10=pm10, no2=no2, so2=so2, co=co, o3=o3, no=no, nox=nox, nh3=nh3,
+        benzene=benzene, toluene=toluene, xylene=xylene, city=city, date=date,
+    ).model_dump()
+    if predict_batcher:
+        predicted_aqi = await predict_batcher.predict(item)
+    else:
+        predicted_aqi = formula_aqi(item)
 
     return {
         "predicted_aqi": int(predicted_aqi),
-        "note": "Prediction based on weighted pollutant analysis (XGBoost integration pending)",
+        "note": _prediction_note(),
+    }
+
+
+@app.post("/predict/batch")
+async def predict_aqi_batch(req: PredictBatchRequest):
+    """Score many pollutant vectors with a single vectorized model call."""
+    if len(req.items) > PREDICT_BATCH_LIMIT:
+        raise HTTPException(status_code=413, detail=f"At most {PREDICT_BATCH_LIMIT} items per batch")
+    items = [it.model_dump() for it in req.items]
+    if aqi_model:
+        preds = (await asyncio.to_thread(aqi_model.predict, items)).tolist()
+    else:
+        preds = [formula_aqi(it) for it in items]
+
+    return {
+        "predictions": [int(p) for p in preds],
+        "count": len(preds),
+        "note": _prediction_note(),
+    }
+
+
+# -------- FORECAST AQI (lag-feature model) --------
+# Model + per-city lag windows stay resident (see Backend/forecasting.py)
+forecaster = load_forecaster()
+
+
+@app.get("/forecast")
+async def forecast_aqi(city: Optional[str] = None, days: int = 7):
+    """
+    Recursive daily AQI forecast for one city, or for every city when `city` is omitted.
+    All cities are forecast together in one vectorized pass per day.
+    """
+    if forecaster is None:
+        raise HTTPException(status_code=503, detail="Forecast model not available")
+    if not 1 <= days <= FORECAST_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"days must be between 1 and {FORECAST_MAX_DAYS}")
+    store = dataset.store
+    if store.empty:
+        raise HTTPException(status_code=503, detail="Historical data not available")
+
+    if city is None:
+        forecasts = await asyncio.to_thread(forecaster.forecast_all, store, days)
+        return {"days": days, "forecasts": forecasts, "count": len(forecasts)}
+
+    forecast = await asyncio.to_thread(forecaster.forecast_city, store, city, days)
+    if forecast is None:
+        raise HTTPException(status_code=404, detail=f"Not enough historical data to forecast {city}")
+    return {
+        "city": city,
+        "days": days,
+        "last_observed": forecaster.last_observed(store, city),
+        "forecast": forecast,
     }
 
 
 # ---------------- SATELLITE / MODEL (OPEN-METEO) HELPERS ----------------
 
 
-def _fetch_open_meteo_for_coords(lat: float, lng: float) -> Dict:
+async def _fetch_open_meteo_for_coords(lat: float, lng: float) -> Tuple[Dict, bool]:
     """
     Call Open-Meteo Air Quality API for given coordinates and return the latest hour
-    of all requested variables as a dict.
+    of all requested variables as a dict, plus whether the weather fetch succeeded.
     [web:449][web:485][web:538]
     """
     params = {
@@ -693,10 +846,8 @@ def _fetch_open_meteo_for_coords(lat: float, lng: float) -> Dict:
     }
 
     try:
-        resp = requests.get(OPEN_METEO_AIR_URL, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-    except requests.RequestException as e:
+        data = await http_client.get_json(OPEN_METEO_AIR_URL, params=params, timeout=10, raise_for_status=True)
+    except UpstreamError as e:
         raise HTTPException(status_code=503, detail=f"Satellite API unavailable: {e}")
 
     hourly = data.get("hourly") or {}
@@ -723,27 +874,28 @@ def _fetch_open_meteo_for_coords(lat: float, lng: float) -> Dict:
 
     # Attempt to fetch current weather (temperature and wind) from Open-Meteo forecast
     weather = {}
+    weather_ok = True
     try:
-        weather_resp = requests.get(
-            "https://api.open-meteo.com/v1/forecast",
+        weather_data = await http_client.get_json(
+            OPEN_METEO_FORECAST_URL,
             params={
                 "latitude": lat,
                 "longitude": lng,
-                "current_weather": True,
+                "current_weather": "true",
             },
             timeout=5,
+            raise_for_status=True,
         )
-        weather_resp.raise_for_status()
-        weather_data = weather_resp.json()
         cw = weather_data.get("current_weather", {})
         weather = {
             "temperature": cw.get("temperature"),
             "wind_speed": cw.get("windspeed"),
             "wind_dir": cw.get("winddirection"),
         }
-    except requests.RequestException:
+    except UpstreamError:
         # Non-fatal: if weather fetch fails, continue without weather
         weather = {}
+        weather_ok = False
 
     return {
         "time": latest_time,
@@ -757,26 +909,22 @@ def _fetch_open_meteo_for_coords(lat: float, lng: float) -> Dict:
         "us_aqi": get_series_value("us_aqi"),
         "european_aqi": get_series_value("european_aqi"),
         **weather,
-    }
+    }, weather_ok
 
 
 def _find_city_coords(city: str) -> Optional[Dict]:
     """
     Find coordinates for a city name from INDIAN_CITIES list.
-    Simple case-insensitive match.
+    Case-insensitive dict lookup (see city_directory).
     """
-    name_lower = city.strip().lower()
-    for c in INDIAN_CITIES:
-        if c["name"].lower() == name_lower:
-            return c
-    return None
+    return city_directory.find(city)
 
 
 # ---------------- SATELLITE / MODEL ENDPOINTS ----------------
 
 
 @app.get("/satellite/live")
-def satellite_live(city: str):
+async def satellite_live(city: str, response: Response):
     """
     Satellite/model-based aerosol & pollutant data for a specific city,
     using Open-Meteo (dust, PM, gases, US/EU AQI). [web:449][web:485]
@@ -788,7 +936,10 @@ def satellite_live(city: str):
     if not city_info:
         raise HTTPException(status_code=404, detail=f"City '{city}' not in satellite city list")
 
-    result = _fetch_open_meteo_for_coords(city_info["lat"], city_info["lng"])
+    result, complete = await _fetch_open_meteo_for_coords(city_info["lat"], city_info["lng"])
+    if not complete:
+        # Served without weather, but never cached (see Backend/http_cache.py)
+        response.headers[DEGRADED_HEADER] = "1"
 
     return {
         "city": city_info["name"],
@@ -799,30 +950,33 @@ def satellite_live(city: str):
 
 
 @app.get("/satellite/map")
-def satellite_map():
+async def satellite_map(request: Request):
     """
     Satellite/model-based data for all configured Indian cities,
     for use on the satellite/AOD map. [web:449][web:485]
+    Uses chunked multi-coordinate Open-Meteo requests, cached for the hour.
     """
+    points = [(c["lat"], c["lng"]) for c in INDIAN_CITIES]
+    values, complete = await open_meteo.fetch_points(points)
+
     output = []
-    for c in INDIAN_CITIES:
-        try:
-            r = _fetch_open_meteo_for_coords(c["lat"], c["lng"])
-            item = {
-                "city": c["name"],
-                "lat": c["lat"],
-                "lng": c["lng"],
-                **r,
-            }
-            output.append(item)
-        except HTTPException:
+    for c, r in zip(INDIAN_CITIES, values):
+        if r is None:
             # Skip city if satellite data unavailable; do not crash entire map
             continue
+        item = {
+            "city": c["name"],
+            "lat": c["lat"],
+            "lng": c["lng"],
+            **r,
+        }
+        output.append(item)
 
     if not output:
         raise HTTPException(status_code=404, detail="No satellite data for any city")
 
-    return output
+    # Partial maps are served but never cached (see Backend/http_cache.py)
+    return fast_json(request, output, headers=None if complete else {DEGRADED_HEADER: "1"})
 
 
 # ---------------- NEW MODELS & STORAGE ----------------
@@ -999,7 +1153,7 @@ def share_report(req: ShareRequest = Body(...)):
 @app.get("/api/debug/db-status")
 async def get_db_status():
     """Check database connection status - useful for debugging"""
-    from Backend.auth import DATABASE_URL, USERS_DB_PATH, get_conn
+    from Backend.auth import DATABASE_URL, USERS_DB_PATH, get_conn, db_pool_stats
     
     db_type = "PostgreSQL" if DATABASE_URL else "SQLite"
     db_location = "Supabase (persistent)" if DATABASE_URL else f"{USERS_DB_PATH} (EPHEMERAL!)"
@@ -1025,6 +1179,7 @@ async def get_db_status():
             "database_location": db_location,
             "user_count": user_count,
             "favorites_count": fav_count,
+            "pool": db_pool_stats(),
             "warning": None if DATABASE_URL else "SQLite is ephemeral on Render! Set DATABASE_URL to Supabase PostgreSQL."
         }
     except Exception as e:
@@ -1036,13 +1191,52 @@ async def get_db_status():
         }
 
 
+@app.get("/api/debug/cache-stats")
+def get_cache_stats():
+    """Hit/miss/stale counters for the shared upstream caches"""
+    return {
+        "waqi_feed": feed_cache.stats(),
+        "waqi_max_station": max_station_cache.stats(),
+        "open_meteo_batch": open_meteo.batch_cache.stats(),
+        "upstream_pools": http_client.pool_stats(),
+        "prefetch": prefetcher.stats(),
+        "station_registry": station_registry.stats(),
+        "readings": readings.stats(),
+        "predict_batcher": predict_batcher.stats() if predict_batcher else None,
+        "auth_tokens": auth_token_cache.stats(),
+        "auth_users": auth_user_cache.stats(),
+        "shared_cache": shared_store.stats() if shared_store else None,
+        "worker": leader.stats(),
+        "http_responses": response_cache.stats(),
+    }
+
+
+@app.get("/api/debug/dataset-status")
+def get_dataset_status():
+    """Rows, source file and last reload report for the historical dataset"""
+    return dataset.stats()
+
+
+# Optional shared secret for admin endpoints (unset = open, like the debug endpoints)
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+
+@app.post("/api/admin/reload-dataset")
+async def reload_dataset(force: bool = False, x_admin_key: Optional[str] = Header(None)):
+    """Re-read the dataset now (only the appended tail when possible) and swap it in."""
+    if ADMIN_API_KEY and x_admin_key != ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Invalid admin key")
+    # Loading runs in a worker thread; requests keep being served from the current store
+    return await asyncio.to_thread(dataset.reload, force)
+
+
 # ==================== USER AUTHENTICATION ENDPOINTS ====================
 @app.post("/api/auth/register", response_model=Token)
 async def register(user_data: UserRegister):
     """Register a new user via Supabase Auth (server-side)."""
     try:
         # create in Supabase (admin or signup depending on config)
-        result = supabase_admin_create_user(user_data.email, user_data.password, user_data.name)
+        result = await supabase_admin_create_user(user_data.email, user_data.password, user_data.name)
 
         # Ensure local profile exists
         try:
@@ -1051,7 +1245,7 @@ async def register(user_data: UserRegister):
             local_id = None
 
         # Attempt to sign in to obtain an access token to return to client
-        token_resp = supabase_sign_in(user_data.email, user_data.password)
+        token_resp = await supabase_sign_in(user_data.email, user_data.password)
 
         return {
             "access_token": token_resp.get("access_token"),
@@ -1085,7 +1279,7 @@ def debug_env():
 async def login(credentials: UserLogin):
     """Login via Supabase Auth and return the Supabase access token."""
     try:
-        token_resp = supabase_sign_in(credentials.email, credentials.password)
+        token_resp = await supabase_sign_in(credentials.email, credentials.password)
 
         # Ensure local profile exists (create if missing)
         try:
@@ -1126,7 +1320,7 @@ async def supabase_callback(data: SupabaseCallbackData):
         # Validate the Supabase token by fetching user info
         from Backend.auth import supabase_get_user_from_token
         
-        user_info = supabase_get_user_from_token(data.access_token)
+        user_info = await supabase_get_user_from_token(data.access_token)
         if not user_info:
             raise HTTPException(status_code=401, detail="Invalid Supabase token")
         
@@ -1170,7 +1364,8 @@ async def supabase_callback(data: SupabaseCallbackData):
 @app.get("/api/auth/me", response_model=UserProfile)
 async def get_profile(current_user: dict = Depends(get_current_user)):
     """Get current user profile"""
-    favorites = get_user_favorites(current_user["id"])
+    # Favorites come back with the user row (see auth.get_user_by_email)
+    favorites = current_user["favorites"]
     
     return {
         "id": current_user["id"],
@@ -1199,74 +1394,141 @@ async def remove_favorite(city_name: str, current_user: dict = Depends(get_curre
     return {"status": "success", "message": f"{city_name} removed from favorites"}
 
 
+# Favorites enrichment: snapshot readings younger than this are used as-is,
+# and live lookups for the rest share one overall deadline
+FAVORITES_SNAPSHOT_MAX_AGE = float(os.getenv("FAVORITES_SNAPSHOT_MAX_AGE", "900"))
+FAVORITES_DEADLINE = float(os.getenv("FAVORITES_DEADLINE", "4"))
+
+
+def _retrieve_result(task: asyncio.Task) -> None:
+    # Late lookups keep running to warm the feed cache; consume their outcome quietly
+    if not task.cancelled():
+        task.exception()
+
+
+async def live_aqi_batch(cities: List[str], deadline: Optional[float] = None) -> Tuple[Dict[str, Optional[float]], List[str]]:
+    """
+    (AQI per city name, cities whose lookup timed out): fresh prefetch snapshot
+    entries first, the remaining cities fetched concurrently. Cities not resolved
+    within `deadline` seconds (FAVORITES_DEADLINE by default) are reported as
+    timed out; unknown cities and failed lookups are simply left out.
+    """
+    result, missing = {}, []
+    now = time.time()
+    for name in dict.fromkeys(cities):
+        known = city_directory.find(name)
+        entry = prefetcher.get(known["name"]) if known else None
+        if entry is not None and now - entry["fetched_at"] <= FAVORITES_SNAPSHOT_MAX_AGE:
+            aqi = entry["aqi"]
+            result[name] = int(aqi) if float(aqi).is_integer() else aqi
+        else:
+            missing.append(name)
+    if not missing:
+        return result, []
+
+    # Pending lookups are not cancelled: they may be shared with other requests
+    # through the feed cache, and finishing them warms it for the next call
+    tasks = {name: asyncio.create_task(fetch_aqi_waqi(name)) for name in missing}
+    done, pending = await asyncio.wait(tasks.values(), timeout=FAVORITES_DEADLINE if deadline is None else deadline)
+    for task in pending:
+        task.add_done_callback(_retrieve_result)
+    for name, task in tasks.items():
+        if task in done and task.exception() is None:
+            result[name] = task.result().get("aqi")
+    return result, [name for name, task in tasks.items() if task in pending]
+
+
 @app.get("/api/favorites")
 async def get_favorites(current_user: dict = Depends(get_current_user)):
-    """Get user's favorite cities with current AQI"""
-    favorites = get_user_favorites(current_user["id"])
-    
-    # Fetch current AQI for each favorite city
-    result = []
-    for fav in favorites:
-        try:
-            city_data = fetch_aqi_waqi(fav["city"])
-            result.append({
-                "city": fav["city"],
-                "aqi": city_data.get("aqi"),
-                "added_at": fav["added_at"]
-            })
-        except:
-            result.append({
-                "city": fav["city"],
-                "aqi": None,
-                "added_at": fav["added_at"]
-            })
-    
-    return {"favorites": result}
+    """Get user's favorite cities with current AQI (partial when some lookups miss the deadline)"""
+    favorites = current_user["favorites"]
+    aqi_by_city, timed_out = await live_aqi_batch([fav["city"] for fav in favorites])
+
+    result = [
+        {
+            "city": fav["city"],
+            "aqi": aqi_by_city.get(fav["city"]),
+            "added_at": fav["added_at"]
+        }
+        for fav in favorites
+    ]
+    return {"favorites": result, "partial": bool(timed_out)}
 
 
 # ==================== HISTORICAL ANALYSIS ENDPOINTS ====================
-@app.get("/api/historical/yearly-comparison/{city}")
-async def get_yearly_comparison(city: str):
-    """Get year-over-year AQI comparison for a city"""
-    if df.empty:
+# All three read the store's precomputed city x year x month aggregates.
+MONTH_NAMES = {m: calendar.month_name[m] for m in range(1, 13)}
+
+
+def _city_monthly(city: str) -> pd.DataFrame:
+    store = dataset.store
+    if store.empty:
         raise HTTPException(status_code=503, detail="Historical data not available")
     
-    city_data = df[df['city'].str.lower() == city.lower()].copy()
-    if city_data.empty:
+    monthly = store.monthly(city)
+    if monthly is None or monthly.empty:
         raise HTTPException(status_code=404, detail=f"No historical data for {city}")
+    return monthly
+
+
+@app.get("/api/historical/intraday/station/{uid}")
+async def get_station_intraday(uid: int, hours: int = 48):
+    """Hourly AQI + components recorded for one station (no WAQI calls)."""
+    if not 1 <= hours <= READINGS_HOURLY_DAYS * 24:
+        raise HTTPException(status_code=400, detail=f"hours must be between 1 and {READINGS_HOURLY_DAYS * 24}")
+    rows = await asyncio.to_thread(readings.hourly, KIND_STATION, uid, hours)
+    return {"uid": uid, "hours": hours, "readings": rows, "count": len(rows)}
+
+
+@app.get("/api/historical/intraday/{city}")
+async def get_city_intraday(city: str, hours: int = 48):
+    """Hourly AQI + components recorded for a city by live fetches and the prefetcher (no WAQI calls)."""
+    if not 1 <= hours <= READINGS_HOURLY_DAYS * 24:
+        raise HTTPException(status_code=400, detail=f"hours must be between 1 and {READINGS_HOURLY_DAYS * 24}")
+    rows = await asyncio.to_thread(readings.hourly, KIND_CITY, city, hours)
+    return {"city": city, "hours": hours, "readings": rows, "count": len(rows)}
+
+
+@app.get("/api/historical/daily-readings/{city}")
+async def get_city_daily_readings(city: str, days: int = 365):
+    """Daily avg/min/max rollups of the recorded live readings for a city (kept forever)."""
+    if days < 1:
+        raise HTTPException(status_code=400, detail="days must be positive")
+    rows = await asyncio.to_thread(readings.daily, KIND_CITY, city, days)
+    return {"city": city, "days": days, "readings": rows, "count": len(rows)}
+
+
+@app.get("/api/historical/yearly-comparison/{city}")
+async def get_yearly_comparison(city: str, request: Request):
+    """Get year-over-year AQI comparison for a city"""
+    monthly = _city_monthly(city)
     
-    city_data['year'] = city_data['date'].dt.year
-    city_data['month'] = city_data['date'].dt.month
-    
-    yearly_avg = city_data.groupby('year')['aqi'].mean().round(2).to_dict()
-    monthly_comparison = city_data.groupby(['year', 'month'])['aqi'].mean().round(2).reset_index()
+    yearly = monthly.groupby(level="year")[["sum", "count"]].sum()
+    yearly_avg = (yearly["sum"] / yearly["count"]).round(2).to_dict()
+    monthly_avg = (monthly["sum"] / monthly["count"]).round(2).astype("float64")
     
-    return {
+    return fast_json(request, {
         "city": city,
         "yearly_averages": yearly_avg,
-        "monthly_data": monthly_comparison.to_dict('records')
-    }
+        "monthly_data": Records(monthly_avg.rename("aqi").reset_index()),
+    })
 
 
 @app.get("/api/historical/seasonal-trends/{city}")
 async def get_seasonal_trends(city: str):
     """Get seasonal AQI trends for a city"""
-    if df.empty:
-        raise HTTPException(status_code=503, detail="Historical data not available")
-    
-    city_data = df[df['city'].str.lower() == city.lower()].copy()
-    if city_data.empty:
-        raise HTTPException(status_code=404, detail=f"No historical data for {city}")
-    
-    # Define seasons
-    def get_season(month):
-        if month in [12, 1, 2]: return "Winter"
-        elif month in [3, 4, 5]: return "Spring"
-        elif month in [6, 7, 8]: return "Summer"
-        else: return "Autumn"
+    monthly = _city_monthly(city)
     
-    city_data['season'] = city_data['date'].dt.month.apply(get_season)
-    seasonal_avg = city_data.groupby('season')['aqi'].agg(['mean', 'min', 'max']).round(2).to_dict('index')
+    # Seasons derive from month buckets; no per-row work
+    seasons = monthly.index.get_level_values("month").map(SEASON_BY_MONTH)
+    grouped = monthly.groupby(seasons.to_numpy(), sort=True).agg(
+        {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+    )
+    seasonal_avg = pd.DataFrame({
+        "mean": grouped["sum"] / grouped["count"],
+        "min": grouped["min"],
+        "max": grouped["max"],
+    }).round(2).to_dict("index")
     
     return {
         "city": city,
@@ -1277,27 +1539,23 @@ async def get_seasonal_trends(city: str):
 @app.get("/api/historical/best-worst-times/{city}")
 async def get_best_worst_times(city: str):
     """Get best and worst times of year for air quality"""
-    if df.empty:
-        raise HTTPException(status_code=503, detail="Historical data not available")
-    
-    city_data = df[df['city'].str.lower() == city.lower()].copy()
-    if city_data.empty:
-        raise HTTPException(status_code=404, detail=f"No historical data for {city}")
+    monthly = _city_monthly(city)
     
-    city_data['month'] = city_data['date'].dt.month
-    city_data['month_name'] = city_data['date'].dt.strftime('%B')
-    
-    monthly_avg = city_data.groupby(['month', 'month_name'])['aqi'].mean().reset_index()
+    by_month = monthly.groupby(level="month")[["sum", "count"]].sum()
+    monthly_avg = pd.DataFrame({
+        "month_name": by_month.index.map(MONTH_NAMES),
+        "aqi": by_month["sum"] / by_month["count"],
+    })
     monthly_avg = monthly_avg.sort_values('aqi')
     
-    best_months = monthly_avg.head(3)[['month_name', 'aqi']].to_dict('records')
-    worst_months = monthly_avg.tail(3)[['month_name', 'aqi']].to_dict('records')
+    best_months = monthly_avg.head(3).to_dict('records')
+    worst_months = monthly_avg.tail(3).to_dict('records')
     
     return {
         "city": city,
         "best_months": best_months,
         "worst_months": worst_months,
-        "monthly_averages": monthly_avg[['month_name', 'aqi']].to_dict('records')
+        "monthly_averages": monthly_avg.to_dict('records')
     }
 
 
@@ -1306,61 +1564,50 @@ async def get_best_worst_times(city: str):
 async def get_nearby_stations(lat: float, lng: float, radius_km: int = 20):
     """Find nearby air quality monitoring stations using WAQI's geo-location search"""
     try:
+        if station_registry.ready:
+            nearby = [
+                {
+                    "station_name": st["name"],
+                    "distance_km": round(distance, 2),
+                    "lat": st["lat"],
+                    "lng": st["lng"],
+                    "aqi": st["aqi"],
+                    "uid": st["uid"],
+                }
+                for st, distance in station_registry.within(lat, lng, radius_km)
+                if st["aqi"] is not None
+            ]
+            return {"nearby_stations": nearby}
+
         # Use WAQI's map bounds API to find stations within radius
-        # Calculate bounding box
-        lat_offset = radius_km / 111.0  # 1 degree ≈ 111 km
-        lng_offset = radius_km / (111.0 * abs(float(lat)) / 90.0) if lat != 0 else radius_km / 111.0
-        
-        latlng = f"{lat-lat_offset},{lng-lng_offset},{lat+lat_offset},{lng+lng_offset}"
-        url = f"https://api.waqi.info/map/bounds/?latlng={latlng}&token={WAQI_TOKEN}"
-        
-        response = requests.get(url, timeout=10)
-        data = response.json()
+        lat1, lng1, lat2, lng2 = bounding_box(lat, lng, radius_km)
+        latlng = f"{lat1},{lng1},{lat2},{lng2}"
+        data = await map_bounds(latlng, timeout=10)
         
         if data.get("status") != "ok":
             return {"nearby_stations": []}
         
         stations = data.get("data", [])
+        coords, _ = coords_array((st.get("lat"), st.get("lon")) for st in stations)
+        mask, distances = within_radius(lat, lng, coords, radius_km)
         nearby = []
         
-        for station in stations:
-            try:
-                s_lat = station.get("lat")
-                s_lng = station.get("lon")
-                
-                if s_lat is None or s_lng is None:
+        for i in np.flatnonzero(mask):
+            station, distance = stations[i], distances[i]
+            aqi_val = station.get("aqi")
+            if aqi_val and aqi_val != "-":
+                try:
+                    aqi_num = float(aqi_val)
+                except (ValueError, TypeError):
                     continue
-                    
-                # Calculate distance using Haversine formula
-                from math import radians, sin, cos, sqrt, atan2
-                
-                lat1, lon1 = radians(lat), radians(lng)
-                lat2, lon2 = radians(s_lat), radians(s_lng)
-                
-                dlat = lat2 - lat1
-                dlon = lon2 - lon1
-                
-                a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-                c = 2 * atan2(sqrt(a), sqrt(1-a))
-                distance = 6371 * c  # Earth radius in km
-                
-                if distance <= radius_km:
-                    aqi_val = station.get("aqi")
-                    if aqi_val and aqi_val != "-":
-                        try:
-                            aqi_num = float(aqi_val)
-                            nearby.append({
-                                "station_name": station.get("station", {}).get("name", "Unknown Station"),
-                                "distance_km": round(distance, 2),
-                                "lat": s_lat,
-                                "lng": s_lng,
-                                "aqi": aqi_num,
-                                "uid": station.get("uid")
-                            })
-                        except (ValueError, TypeError):
-                            pass
-            except Exception as e:
-                continue
+                nearby.append({
+                    "station_name": station.get("station", {}).get("name", "Unknown Station"),
+                    "distance_km": round(float(distance), 2),
+                    "lat": station.get("lat"),
+                    "lng": station.get("lon"),
+                    "aqi": aqi_num,
+                    "uid": station.get("uid")
+                })
         
         # Sort by distance
         nearby.sort(key=lambda x: x['distance_km'])
@@ -1373,26 +1620,27 @@ async def get_nearby_stations(lat: float, lng: float, radius_km: int = 20):
 
 @app.get("/api/location/safe-zones")
 async def get_safe_zones(threshold: int = 100):
-    """Get list of cities with AQI below threshold (safe zones)"""
+    """Get list of cities with AQI below threshold (safe zones), from the prefetch snapshot"""
     safe_cities = []
+    used = []
     
     for city in INDIAN_CITIES[:20]:  # Check top 20 cities
-        try:
-            aqi_data = fetch_aqi_waqi(city['name'])
-            aqi_value = aqi_data.get('aqi')
-            
-            if aqi_value and aqi_value < threshold:
-                safe_cities.append({
-                    "city": city['name'],
-                    "aqi": aqi_value,
-                    "lat": city['lat'],
-                    "lng": city['lng']
-                })
-        except:
-            pass
+        entry = prefetcher.get(city['name'])
+        if entry is None:
+            continue
+        used.append(entry)
+        aqi_value = entry['aqi']
+        
+        if aqi_value and aqi_value < threshold:
+            safe_cities.append({
+                "city": city['name'],
+                "aqi": aqi_value,
+                "lat": city['lat'],
+                "lng": city['lng']
+            })
     
     safe_cities.sort(key=lambda x: x['aqi'])
-    return {"safe_zones": safe_cities}
+    return {"safe_zones": safe_cities, "snapshot_age_seconds": prefetcher.age_seconds(used)}
 
 
 # ==================== MULTI-CITY COMPARISON ====================
@@ -1402,23 +1650,24 @@ async def compare_multi_cities(cities: List[str]):
     if len(cities) > 5:
         raise HTTPException(status_code=400, detail="Maximum 5 cities allowed")
     
+    # Fetch every city concurrently; a failing city only reports its own error
+    results = await asyncio.gather(*(fetch_aqi_waqi(city) for city in cities), return_exceptions=True)
     comparison_data = []
-    for city in cities:
-        try:
-            aqi_data = fetch_aqi_waqi(city)
-            comparison_data.append({
-                "city": city,
-                "aqi": aqi_data.get('aqi'),
-                "pm25": aqi_data.get('pm25'),
-                "pm10": aqi_data.get('pm10'),
-                "category": aqi_data.get('category'),
-                "pollutants": aqi_data.get('pollutants', {})
-            })
-        except Exception as e:
+    for city, aqi_data in zip(cities, results):
+        if isinstance(aqi_data, Exception):
             comparison_data.append({
                 "city": city,
-                "error": str(e)
+                "error": str(aqi_data)
             })
+            continue
+        comparison_data.append({
+            "city": city,
+            "aqi": aqi_data.get('aqi'),
+            "pm25": aqi_data.get('pm25'),
+            "pm10": aqi_data.get('pm10'),
+            "category": aqi_data.get('category'),
+            "pollutants": aqi_data.get('pollutants', {})
+        })
     
     return {"comparison": comparison_data}
 
@@ -1426,38 +1675,41 @@ async def compare_multi_cities(cities: List[str]):
 @app.get("/api/compare/migration-advisor")
 async def migration_advisor(current_city: str, max_results: int = 10):
     """Suggest best cities to migrate to based on air quality"""
-    # Get current city AQI
-    try:
-        current_aqi = fetch_aqi_waqi(current_city).get('aqi')
-    except:
-        current_aqi = 999
+    entries = prefetcher.entries()
+
+    # Get current city AQI (snapshot first; only unknown cities need a live lookup)
+    current = next((e for e in entries if e['name'].lower() == current_city.lower()), None)
+    if current is not None:
+        current_aqi = current['aqi']
+    else:
+        try:
+            current_aqi = (await fetch_aqi_waqi(current_city)).get('aqi')
+            current_aqi = float(current_aqi)
+        except:
+            current_aqi = 999
     
     # Analyze all cities
     recommendations = []
-    for city in INDIAN_CITIES:
-        if city['name'].lower() == current_city.lower():
+    for entry in entries:
+        if entry['name'].lower() == current_city.lower():
             continue
         
-        try:
-            city_data = fetch_aqi_waqi(city['name'])
-            aqi_value = city_data.get('aqi')
-            
-            if aqi_value and aqi_value < current_aqi:
-                improvement = current_aqi - aqi_value
-                recommendations.append({
-                    "city": city['name'],
-                    "aqi": aqi_value,
-                    "improvement": round(improvement, 1),
-                    "improvement_percent": round((improvement / current_aqi) * 100, 1)
-                })
-        except:
-            pass
+        aqi_value = entry['aqi']
+        if aqi_value and aqi_value < current_aqi:
+            improvement = current_aqi - aqi_value
+            recommendations.append({
+                "city": entry['name'],
+                "aqi": aqi_value,
+                "improvement": round(improvement, 1),
+                "improvement_percent": round((improvement / current_aqi) * 100, 1)
+            })
     
     recommendations.sort(key=lambda x: x['aqi'])
     return {
         "current_city": current_city,
         "current_aqi": current_aqi,
-        "recommendations": recommendations[:max_results]
+        "recommendations": recommendations[:max_results],
+        "snapshot_age_seconds": prefetcher.age_seconds(entries)
     }
 
 
@@ -1471,59 +1723,14 @@ if GEMINI_API_KEY:
 else:
     gemini_model = None
 
-def get_detailed_aqi_info(city: str) -> dict:
+async def get_detailed_aqi_info(city: str) -> dict:
     """Fetch comprehensive AQI data - uses same method as /live/aqi endpoint"""
     try:
-        # First get city feed
-        url = f"https://api.waqi.info/feed/{city}/"
-        res = requests.get(url, params={"token": WAQI_TOKEN}, timeout=10)
-        data = res.json()
-        
-        if data.get("status") != "ok":
+        # Same resolution as the /live/aqi endpoint
+        live = await resolve_live_aqi(city)
+        if live is None:
             return None
-        
-        d = data["data"]
-        result = {
-            "city": d.get("city", {}).get("name", city),
-            "aqi": d.get("aqi", "-"),
-            "dominant_pollutant": d.get("dominentpol", "N/A"),
-            "components": d.get("iaqi", {}),
-            "time": d.get("time", {}).get("s", "N/A")
-        }
-        
-        # Try to get highest AQI station (same as live page logic)
-        try:
-            search_url = "https://api.waqi.info/search/"
-            search_res = requests.get(search_url, params={"token": WAQI_TOKEN, "keyword": city}, timeout=8)
-            search_data = search_res.json()
-            stations = search_data.get("data", []) if isinstance(search_data, dict) else []
-            
-            max_station = None
-            for s in stations:
-                aqi_raw = s.get("aqi", "-")
-                try:
-                    aqi_val = float(aqi_raw) if aqi_raw != "-" else -1
-                except (ValueError, TypeError):
-                    continue
-                if aqi_val < 0:
-                    continue
-                if not max_station or aqi_val > max_station.get("_aqi_val", -1):
-                    s["_aqi_val"] = aqi_val
-                    max_station = s
-            
-            if max_station and max_station.get("uid"):
-                uid = max_station.get("uid")
-                feed_url = f"https://api.waqi.info/feed/@{uid}/"
-                feed_res = requests.get(feed_url, params={"token": WAQI_TOKEN}, timeout=3)
-                feed_data = feed_res.json()
-                if feed_data.get("status") == "ok" and feed_data.get("data"):
-                    fd = feed_data.get("data")
-                    result["aqi"] = fd.get("aqi", result["aqi"])
-                    result["components"] = fd.get("iaqi", result["components"])
-                    result["time"] = fd.get("time", {}).get("s") or fd.get("time", {}).get("stime") or result["time"]
-                    result["city"] = fd.get("city", {}).get("name", result["city"])
-        except:
-            pass  # Use city feed if station search fails
+        result = live.result
         
         # Get category
         aqi_value = result["aqi"]
@@ -1577,8 +1784,8 @@ async def chatbot_query(query: str = Body(..., embed=True), user: dict = Depends
     aqi_context = ""
     aqi_data_dict = {}
     
-    for city in mentioned_cities[:3]:  # Limit to 3 cities
-        info = get_detailed_aqi_info(city)
+    detailed = await asyncio.gather(*(get_detailed_aqi_info(city) for city in mentioned_cities[:3]))  # Limit to 3 cities
+    for city, info in zip(mentioned_cities[:3], detailed):
         if info:
             aqi_context += f"""
 - {info['city']}: 
@@ -1591,11 +1798,11 @@ async def chatbot_query(query: str = Body(..., embed=True), user: dict = Depends
     
     # If no cities mentioned and user is logged in, try their favorite cities
     if not mentioned_cities and user:
-        favorites = get_user_favorites(user["id"])
+        favorites = user["favorites"]
         if favorites:
             for fav in favorites[:2]:
                 city = fav["city"]
-                info = get_detailed_aqi_info(city)
+                info = await get_detailed_aqi_info(city)
                 if info:
                     aqi_context += f"""
 - {info['city']} (your favorite): 
@@ -1659,7 +1866,7 @@ Instructions:
 
 Respond naturally and conversationally."""
         
-        response = gemini_model.generate_content(system_prompt)
+        response = await gemini_model.generate_content_async(system_prompt)
         ai_response = response.text
         
         return {
@@ -0,0 +1,213 @@
+"""
+Model Serving Module
+Loads the pollutant -> AQI regressor written by `utils/train_model.py`
+(`xgb_aqi_model.pkl`, `city_encoder.pkl`, `feature_columns.pkl`) once per
+process and scores inputs in feature-column order.
+
+Inputs are assembled into one float32 matrix per call, so a batch of N
+pollutant vectors costs a single `predict`. Concurrent single predictions are
+coalesced by `PredictionBatcher` into the same kind of batched call.
+Pollutants the caller does not supply are passed as NaN, which XGBoost treats
+as missing values.
+"""
+import asyncio
+import os
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Optional ML dependencies; /predict falls back to the weighted formula without them
+try:
+    import joblib
+    HAS_JOBLIB = True
+except Exception:
+    HAS_JOBLIB = False
+
+# ---------------- CONFIG ----------------
+MODEL_DIR = Path(os.getenv("MODEL_DIR", str(Path(__file__).parent / "models")))
+MODEL_FILE = "xgb_aqi_model.pkl"
+ENCODER_FILE = "city_encoder.pkl"
+FEATURES_FILE = "feature_columns.pkl"
+
+PREDICT_MAX_BATCH = int(os.getenv("PREDICT_MAX_BATCH", "256"))
+PREDICT_BATCH_WAIT_MS = float(os.getenv("PREDICT_BATCH_WAIT_MS", "5"))
+
+# Request field -> training column (see FEATURES in utils/train_model.py)
+POLLUTANT_COLUMNS = {
+    "pm25": "PM2.5",
+    "pm10": "PM10",
+    "no": "NO",
+    "no2": "NO2",
+    "nox": "NOx",
+    "nh3": "NH3",
+    "co": "CO",
+    "so2": "SO2",
+    "o3": "O3",
+    "benzene": "Benzene",
+    "toluene": "Toluene",
+    "xylene": "Xylene",
+}
+CITY_COLUMN = "city_encoded"
+DATE_COLUMNS = ("year", "month", "day")
+KNOWN_COLUMNS = set(POLLUTANT_COLUMNS.values()) | {CITY_COLUMN, *DATE_COLUMNS}
+
+# Placeholder weights used when no model is available
+FORMULA_WEIGHTS = {"pm25": 0.4, "pm10": 0.2, "no2": 0.15, "so2": 0.1, "co": 0.1, "o3": 0.05}
+
+
+class ModelLoadError(Exception):
+    """Raised when the artifacts are missing or inconsistent with each other."""
+
+
+def formula_aqi(item: Dict) -> float:
+    """The original weighted-sum estimate; missing pollutants count as 0."""
+    return round(sum((item.get(k) or 0.0) * w for k, w in FORMULA_WEIGHTS.items()), 2)
+
+
+class AQIModel:
+    """A loaded regressor plus the city encoder and the feature order it was trained with."""
+
+    def __init__(self, model, city_encoder, feature_columns: Sequence[str]):
+        self.model = model
+        self.feature_columns = list(feature_columns)
+        self._validate()
+        self.city_codes: Dict[str, int] = {}
+        if city_encoder is not None:
+            classes = [str(c) for c in city_encoder.classes_]
+            self.city_codes = {c.strip().lower(): i for i, c in enumerate(classes)}
+        self._positions = {col: i for i, col in enumerate(self.feature_columns)}
+
+    @classmethod
+    def load(cls, model_dir: Path = MODEL_DIR) -> "AQIModel":
+        if not HAS_JOBLIB:
+            raise ModelLoadError("joblib is not installed")
+        paths = [model_dir / MODEL_FILE, model_dir / ENCODER_FILE, model_dir / FEATURES_FILE]
+        missing = [p.name for p in paths if not p.exists()]
+        if missing:
+            raise ModelLoadError(f"missing artifacts in {model_dir}: {', '.join(missing)}")
+        try:
+            model, encoder, features = (joblib.load(p) for p in paths)
+        except Exception as e:
+            raise ModelLoadError(f"could not unpickle artifacts: {e}") from e
+        return cls(model, encoder, features)
+
+    def _validate(self) -> None:
+        unknown = [c for c in self.feature_columns if c not in KNOWN_COLUMNS]
+        if unknown:
+            raise ModelLoadError(f"feature_columns.pkl has columns the API cannot supply: {unknown}")
+        n_features = getattr(self.model, "n_features_in_", None)
+        if n_features is not None and n_features != len(self.feature_columns):
+            raise ModelLoadError(
+                f"model expects {n_features} features, feature_columns.pkl lists {len(self.feature_columns)}"
+            )
+        # If the booster kept its training column names, the order must match exactly
+        booster_names = None
+        try:
+            booster_names = self.model.get_booster().feature_names
+        except Exception:
+            pass
+        if booster_names and list(booster_names) != self.feature_columns:
+            raise ModelLoadError(
+                f"feature order mismatch: model {list(booster_names)} vs feature_columns.pkl {self.feature_columns}"
+            )
+
+    # ---------------- inference ----------------
+    def encode_city(self, city: Optional[str]) -> float:
+        if not city:
+            return np.nan
+        code = self.city_codes.get(city.strip().lower())
+        return np.nan if code is None else float(code)
+
+    def matrix(self, items: Sequence[Dict]) -> np.ndarray:
+        """Build an (n, n_features) float32 matrix in training column order."""
+        X = np.full((len(items), len(self.feature_columns)), np.nan, dtype=np.float32)
+        today = date.today()
+        for field, col in POLLUTANT_COLUMNS.items():
+            pos = self._positions.get(col)
+            if pos is not None:
+                X[:, pos] = [np.nan if it.get(field) is None else it[field] for it in items]
+        if CITY_COLUMN in self._positions:
+            X[:, self._positions[CITY_COLUMN]] = [self.encode_city(it.get("city")) for it in items]
+        dates = [it.get("date") or today for it in items]
+        for attr in DATE_COLUMNS:
+            pos = self._positions.get(attr)
+            if pos is not None:
+                X[:, pos] = [getattr(d, attr) for d in dates]
+        return X
+
+    def predict(self, items: Sequence[Dict]) -> np.ndarray:
+        if not items:
+            return np.empty(0, dtype=np.float32)
+        return np.asarray(self.model.predict(self.matrix(items)), dtype=np.float32)
+
+
+def load_model(model_dir: Path = MODEL_DIR) -> Optional[AQIModel]:
+    """Load the model, or return None (with a warning) so callers can use the formula."""
+    try:
+        model = AQIModel.load(model_dir)
+    except ModelLoadError as e:
+        print(f"⚠ MODEL: {e}. /predict will use the weighted formula.")
+        return None
+    print(f"✅ MODEL: loaded {MODEL_FILE} ({len(model.feature_columns)} features, {len(model.city_codes)} cities)")
+    return model
+
+
+class PredictionBatcher:
+    """
+    Coalesces concurrent single predictions into one batched `predict` call.
+    The first waiting request opens a window of `wait_ms`; everything queued by
+    then (up to `max_batch`) is scored together in a worker thread.
+    """
+
+    def __init__(self, model: AQIModel, max_batch: int = PREDICT_MAX_BATCH,
+                 wait_ms: float = PREDICT_BATCH_WAIT_MS):
+        self.model = model
+        self.max_batch = max_batch
+        self.wait = wait_ms / 1000.0
+        self._pending: List[Tuple[Dict, "asyncio.Future"]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.items = 0
+
+    async def predict(self, item: Dict) -> float:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((item, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.wait, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[Dict, "asyncio.Future"]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            preds = await asyncio.to_thread(self.model.predict, [item for item, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), value in zip(batch, preds.tolist()):
+            if not fut.done():
+                fut.set_result(value)
+
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "max_batch": self.max_batch,
+            "wait_ms": self.wait * 1000.0,
+        }
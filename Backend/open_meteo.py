@@ -0,0 +1,138 @@
+"""
+Open-Meteo Batch Module
+Fetches air-quality and current weather for many coordinates at once using
+Open-Meteo's comma-separated latitude/longitude lists. Points are split into
+chunks, all chunk requests run in parallel, and each chunk's result is cached
+for the current hour (the `hourly` series only changes hourly). A failed chunk,
+or one whose weather request failed, is not cached, so it is retried on the
+next request.
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from Backend import http_client
+from Backend.cache import TTLCache
+from Backend.shared_cache import shared_store
+from Backend.http_client import UpstreamError
+
+# ---------------- CONFIG ----------------
+# Open-Meteo Air Quality API base URL (no key for non-commercial) [web:449][web:538]
+OPEN_METEO_AIR_URL = "https://air-quality-api.open-meteo.com/v1/air-quality"
+OPEN_METEO_FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+
+# Basic per-request set of hourly variables we want (max useful set) [web:449][web:485]
+OPEN_METEO_HOURLY_VARS = (
+    "pm10,pm2_5,dust,"
+    "carbon_monoxide,nitrogen_dioxide,sulphur_dioxide,ozone,"
+    "us_aqi,european_aqi"
+)
+HOURLY_KEYS = OPEN_METEO_HOURLY_VARS.split(",")
+
+OPEN_METEO_BATCH_SIZE = int(os.getenv("OPEN_METEO_BATCH_SIZE", "25"))
+
+# Keyed by (UTC hour, chunk coordinates); an hour of TTL is enough since the key rolls over
+batch_cache = TTLCache("open_meteo_batch", ttl=3600, maxsize=64, shared=shared_store)
+
+
+# ---------------- HELPERS ----------------
+def _as_list(data) -> List[Dict]:
+    """Open-Meteo returns an object for one location and a list for several."""
+    if isinstance(data, list):
+        return data
+    return [data] if isinstance(data, dict) else []
+
+
+def latest_hourly_values(hourly: Dict) -> Optional[Dict]:
+    """Pick the last time index of every requested hourly series."""
+    times = hourly.get("time") or []
+    if not times:
+        return None
+    idx = len(times) - 1
+    values = {"time": times[idx]}
+    for key in HOURLY_KEYS:
+        arr = hourly.get(key)
+        values[key] = arr[idx] if arr and len(arr) > idx else None
+    return values
+
+
+def _weather_values(item: Dict) -> Dict:
+    cw = item.get("current_weather") or {}
+    if not cw:
+        return {}
+    return {
+        "temperature": cw.get("temperature"),
+        "wind_speed": cw.get("windspeed"),
+        "wind_dir": cw.get("winddirection"),
+    }
+
+
+class PartialChunkError(UpstreamError):
+    """The weather half of a chunk failed; carries the air-only results, which are not cached."""
+
+    def __init__(self, message: str, results: List[Optional[Dict]]):
+        super().__init__(message)
+        self.results = results
+
+
+async def _fetch_chunk(points: Sequence[Tuple[float, float]]) -> List[Optional[Dict]]:
+    lats = ",".join(str(p[0]) for p in points)
+    lngs = ",".join(str(p[1]) for p in points)
+    air, weather = await asyncio.gather(
+        http_client.get_json(
+            OPEN_METEO_AIR_URL,
+            params={"latitude": lats, "longitude": lngs, "hourly": OPEN_METEO_HOURLY_VARS, "timezone": "auto"},
+            timeout=15,
+            raise_for_status=True,
+        ),
+        http_client.get_json(
+            OPEN_METEO_FORECAST_URL,
+            params={"latitude": lats, "longitude": lngs, "current_weather": "true"},
+            timeout=10,
+            raise_for_status=True,
+        ),
+        return_exceptions=True,
+    )
+    if isinstance(air, BaseException):
+        # Without air-quality data the whole chunk is unusable
+        raise UpstreamError(f"air-quality batch of {len(points)} failed: {air}")
+    air_items = _as_list(air)
+    weather_items = [] if isinstance(weather, BaseException) else _as_list(weather)
+
+    results: List[Optional[Dict]] = []
+    for i in range(len(points)):
+        values = latest_hourly_values(air_items[i].get("hourly") or {}) if i < len(air_items) else None
+        if values is not None and i < len(weather_items):
+            values.update(_weather_values(weather_items[i]))
+        results.append(values)
+    if isinstance(weather, BaseException):
+        # Raising keeps the degraded chunk out of the cache, so the next call retries it
+        raise PartialChunkError(f"weather batch of {len(points)} failed: {weather}", results)
+    return results
+
+
+async def fetch_points(points: Sequence[Tuple[float, float]]) -> Tuple[List[Optional[Dict]], bool]:
+    """
+    (values, complete): latest air-quality + weather values for each (lat, lng), in
+    input order, and whether every chunk was fully fetched. Entries are None where
+    Open-Meteo had no data or the chunk request failed; weather fields are missing
+    where only the weather request failed. Only complete chunks are cached.
+    """
+    points = tuple((float(lat), float(lng)) for lat, lng in points)
+    hour = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H")
+    chunks = [points[i:i + OPEN_METEO_BATCH_SIZE] for i in range(0, len(points), OPEN_METEO_BATCH_SIZE)]
+
+    async def load_chunk(chunk) -> Tuple[List[Optional[Dict]], bool]:
+        try:
+            return await batch_cache.aget_or_load((hour, chunk), lambda: _fetch_chunk(chunk)), True
+        except PartialChunkError as e:
+            print(f"OPEN-METEO: {e}")
+            return e.results, False
+        except UpstreamError as e:
+            print(f"OPEN-METEO: {e}")
+            return [None] * len(chunk), False
+
+    chunk_results = await asyncio.gather(*(load_chunk(c) for c in chunks))
+    values = [item for chunk, _ in chunk_results for item in chunk]
+    return values, all(complete for _, complete in chunk_results)
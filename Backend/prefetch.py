@@ -0,0 +1,184 @@
+"""
+Background AQI Prefetch Module
+Keeps a live-AQI snapshot for every city in INDIAN_CITIES warm so that ranking
+endpoints (/cities/available, safe zones, migration advisor) can answer from
+memory with no network I/O.
+
+Cities are polled on a staggered schedule (one city every interval/N seconds,
+with jitter) and a failing city backs off exponentially without slowing the
+others down.
+
+With several workers only the leader (Backend/leader.py) polls WAQI; the
+others fill their snapshot from the shared feed cache the leader writes to.
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+from Backend import http_client
+from Backend.waqi import get_waqi_feed, feed_cache, feed_key, UpstreamError
+
+# ---------------- CONFIG ----------------
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") != "0"
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "600"))      # full sweep, seconds
+PREFETCH_JITTER = float(os.getenv("PREFETCH_JITTER", "0.2"))          # +/- fraction of the slot
+PREFETCH_MAX_BACKOFF = float(os.getenv("PREFETCH_MAX_BACKOFF", "3600"))
+PREFETCH_TIMEOUT = float(os.getenv("PREFETCH_TIMEOUT", "10"))
+PREFETCH_FOLLOW_INTERVAL = float(os.getenv("PREFETCH_FOLLOW_INTERVAL", "30"))  # non-leader sync, seconds
+
+
+def _numeric_aqi(value) -> Optional[float]:
+    if value in ("-", None, ""):
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+class CityPrefetcher:
+    """Polls WAQI for a fixed list of cities into an in-process snapshot."""
+
+    def __init__(self, cities: List[Dict], interval: float = PREFETCH_INTERVAL,
+                 jitter: float = PREFETCH_JITTER, max_backoff: float = PREFETCH_MAX_BACKOFF,
+                 on_feed: Optional[Callable[[str, Dict], None]] = None, leader=None):
+        self.cities = cities
+        self.on_feed = on_feed  # called with (city name, ok feed payload) after each refresh
+        self.leader = leader    # LeaderLock; None = this process always polls
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        # name -> {"name", "lat", "lng", "aqi", "fetched_at"}; entries are replaced, never mutated
+        self._entries: Dict[str, Dict] = {}
+        self._failures: Dict[str, int] = {}
+        self._next_due: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.errors = 0
+        self.synced = 0
+
+    # ---------------- polling ----------------
+    async def refresh_city(self, city: Dict) -> None:
+        name = city["name"]
+        now = time.time()
+        try:
+            data = await get_waqi_feed(name, timeout=PREFETCH_TIMEOUT)
+        except UpstreamError:
+            data = None
+        aqi = _numeric_aqi(data.get("data", {}).get("aqi")) if data and data.get("status") == "ok" else None
+        # The feed cache may have answered with a stale entry (upstream down or
+        # breaker open): date the reading by the cache entry, not by this poll
+        age = await self._feed_age(name) if aqi is not None else None
+        stale = age is not None and age >= feed_cache.ttl
+
+        if aqi is None or stale:
+            # Keep the last good reading; back off this city only
+            self.errors += 1
+            failures = self._failures.get(name, 0) + 1
+            self._failures[name] = failures
+            self._next_due[name] = now + min(self.interval * (2 ** (failures - 1)), self.max_backoff)
+            current = self._entries.get(name)
+            if stale and (current is None or current["fetched_at"] < now - age):
+                self._put(city, aqi, now - age)
+            return
+
+        if self.on_feed is not None:
+            self.on_feed(name, data)
+        self.refreshes += 1
+        self._failures.pop(name, None)
+        self._next_due[name] = now + self.interval
+        self._put(city, aqi, now - (age or 0.0))
+
+    @staticmethod
+    async def _feed_age(name: str) -> Optional[float]:
+        """Age in seconds of the feed cache entry just served for `name`, if any."""
+        _, age = feed_cache.peek(feed_key(name))
+        if age is None:
+            _, age = await asyncio.to_thread(feed_cache.peek_shared, feed_key(name))
+        return age
+
+    def _put(self, city: Dict, aqi: float, fetched_at: float) -> None:
+        self._entries[city["name"]] = {
+            "name": city["name"],
+            "lat": city["lat"],
+            "lng": city["lng"],
+            "aqi": aqi,
+            "fetched_at": fetched_at,
+        }
+
+    def sync_from_shared(self) -> int:
+        """Non-leader refresh: copy the leader's readings out of the shared feed cache (no network)."""
+        now = time.time()
+        updated = 0
+        for city in self.cities:
+            data, age = feed_cache.peek_shared(feed_key(city["name"]))
+            aqi = _numeric_aqi(data.get("data", {}).get("aqi")) if data and data.get("status") == "ok" else None
+            if aqi is None:
+                continue
+            current = self._entries.get(city["name"])
+            if current is None or current["fetched_at"] < now - age - 1:
+                self._put(city, aqi, now - age)
+                updated += 1
+        self.synced += updated
+        return updated
+
+    async def warm_up(self) -> None:
+        """Fetch every city once, concurrently (bounded by the WAQI connection pool)."""
+        await asyncio.gather(*(self.refresh_city(c) for c in self.cities))
+
+    async def _run(self) -> None:
+        http_client.mark_background()  # yield WAQI budget to user requests
+        while self.leader is not None and not self.leader.acquire():
+            await asyncio.to_thread(self.sync_from_shared)
+            await asyncio.sleep(PREFETCH_FOLLOW_INTERVAL)
+        await self.warm_up()
+        slot = self.interval / max(len(self.cities), 1)
+        while True:
+            for city in self.cities:
+                await asyncio.sleep(max(0.0, slot * (1 + random.uniform(-self.jitter, self.jitter))))
+                if time.time() >= self._next_due.get(city["name"], 0):
+                    try:
+                        await self.refresh_city(city)
+                    except Exception as e:
+                        print(f"PREFETCH: error refreshing {city['name']}: {e}")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------------- snapshot reads (no I/O) ----------------
+    def get(self, name: str) -> Optional[Dict]:
+        return self._entries.get(name)
+
+    def entries(self) -> List[Dict]:
+        return list(self._entries.values())
+
+    def age_seconds(self, entries: Optional[List[Dict]] = None) -> Optional[float]:
+        """Age of the oldest reading in `entries` (defaults to the whole snapshot)."""
+        entries = self.entries() if entries is None else entries
+        if not entries:
+            return None
+        return round(time.time() - min(e["fetched_at"] for e in entries), 1)
+
+    def stats(self) -> Dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "cities_total": len(self.cities),
+            "cities_cached": len(self._entries),
+            "backing_off": sorted(self._failures),
+            "refreshes": self.refreshes,
+            "synced": self.synced,
+            "errors": self.errors,
+            "snapshot_age_seconds": self.age_seconds(),
+        }
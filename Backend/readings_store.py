@@ -0,0 +1,296 @@
+"""
+Live Readings Store Module
+Append-only SQLite log of the live readings the API already fetches (city
+feeds, station feeds, registry sweeps), kept at hourly resolution with the
+per-pollutant `iaqi` components, so intraday charts never need WAQI again.
+
+Retention tiers:
+- `readings_hourly`: one row per (kind, key, hour), kept READINGS_HOURLY_DAYS.
+- `readings_daily`: avg/min/max AQI and average components per day, kept forever.
+
+Request handlers only append to an in-memory buffer; a background task
+flushes it in batches and periodically compacts (rolls hourly rows up into
+daily rows and drops hourly rows past retention). Every worker flushes its own
+buffer (WAL lets them share the file); only the leader compacts.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# ---------------- CONFIG ----------------
+READINGS_DB_PATH = os.getenv("READINGS_DB_PATH") or str(Path(__file__).parent / "readings.db")
+READINGS_ENABLED = os.getenv("READINGS_ENABLED", "1") != "0"
+READINGS_FLUSH_INTERVAL = float(os.getenv("READINGS_FLUSH_INTERVAL", "30"))      # seconds
+READINGS_COMPACT_INTERVAL = float(os.getenv("READINGS_COMPACT_INTERVAL", "3600"))
+READINGS_HOURLY_DAYS = int(os.getenv("READINGS_HOURLY_DAYS", "90"))
+
+COMPONENT_KEYS = ("pm25", "pm10", "no2", "so2", "co", "o3", "nh3")
+KIND_CITY = "city"
+KIND_STATION = "station"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings_hourly (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    name TEXT,
+    hour INTEGER NOT NULL,          -- unix seconds, start of the UTC hour
+    aqi REAL,
+    components TEXT,                -- JSON {pollutant: value}
+    PRIMARY KEY (kind, key, hour)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS readings_daily (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    name TEXT,
+    day TEXT NOT NULL,              -- YYYY-MM-DD (UTC)
+    aqi_avg REAL,
+    aqi_min REAL,
+    aqi_max REAL,
+    samples INTEGER NOT NULL,
+    components TEXT,
+    PRIMARY KEY (kind, key, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS readings_meta (
+    name TEXT PRIMARY KEY,
+    value REAL
+);
+"""
+
+# Average each known component when rolling up
+_DAILY_COMPONENTS_SQL = "json_object(" + ", ".join(
+    f"'{k}', avg(json_extract(components, '$.{k}'))" for k in COMPONENT_KEYS
+) + ")"
+
+
+def _numeric(value) -> Optional[float]:
+    if isinstance(value, dict):
+        value = value.get("v")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def flatten_iaqi(iaqi: Optional[Dict]) -> Dict[str, float]:
+    """WAQI `iaqi` ({"pm25": {"v": 50}, ...}) -> {"pm25": 50.0, ...}, numeric values only."""
+    out = {}
+    for k, v in (iaqi or {}).items():
+        num = _numeric(v)
+        if num is not None:
+            out[k] = num
+    return out
+
+
+def observed_at(data: Optional[Dict]) -> Optional[float]:
+    """Unix time a WAQI feed `data` block was measured (its `time` field), or None."""
+    t = data.get("time") if isinstance(data, dict) else None
+    if not isinstance(t, dict):
+        return None
+    # `iso` carries the station's UTC offset explicitly; `v` is the epoch fallback
+    if t.get("iso"):
+        try:
+            return datetime.fromisoformat(t["iso"]).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return _numeric(t.get("v"))
+
+
+def _hour_start(ts: float) -> int:
+    return int(ts // 3600 * 3600)
+
+
+class ReadingsStore:
+    """Buffered writer + compactor + query helpers over the readings database."""
+
+    def __init__(self, db_path: str = READINGS_DB_PATH, enabled: bool = READINGS_ENABLED, leader=None):
+        self.db_path = db_path
+        self.enabled = enabled
+        self.leader = leader  # LeaderLock; None = this process always compacts
+        self._buffer: Dict[Tuple[str, str, int], Tuple] = {}
+        self._buffer_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.flushed = 0
+        self.last_compaction: Optional[Dict] = None
+        with self._db() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def _db(self) -> Iterator[sqlite3.Connection]:
+        """A connection committed on success, rolled back on error, and always closed."""
+        conn = self._connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ---------------- recording (no I/O) ----------------
+    def record(self, kind: str, key, name: Optional[str], aqi, components: Optional[Dict] = None,
+               ts: Optional[float] = None) -> None:
+        """Buffer one reading; the latest reading within an hour wins."""
+        aqi = _numeric(aqi)
+        if aqi is None or not self.enabled:
+            return
+        key = str(key).strip().lower()
+        hour = _hour_start(ts if ts is not None else time.time())
+        row = (kind, key, name, hour, aqi, json.dumps(components or {}, separators=(",", ":")))
+        with self._buffer_lock:
+            self._buffer[(kind, key, hour)] = row
+            self.recorded += 1
+
+    def record_feed(self, kind: str, key, feed: Dict) -> None:
+        """
+        Record a WAQI `/feed/` payload (status ok) for a city name or station uid,
+        in the hour it was measured: a cached or stale feed re-recorded later
+        overwrites its own hour instead of posing as a new reading.
+        """
+        data = feed.get("data") if isinstance(feed, dict) and feed.get("status") == "ok" else None
+        if not isinstance(data, dict):
+            return
+        name = (data.get("city") or {}).get("name")
+        ts = observed_at(data)
+        ts = None if ts is None else min(ts, time.time())  # never ahead of our clock
+        self.record(kind, key, name, data.get("aqi"), flatten_iaqi(data.get("iaqi")), ts=ts)
+
+    # ---------------- background work ----------------
+    def flush(self) -> int:
+        with self._buffer_lock:
+            rows, self._buffer = list(self._buffer.values()), {}
+        if not rows:
+            return 0
+        with self._db() as conn:
+            conn.executemany(
+                "INSERT INTO readings_hourly (kind, key, name, hour, aqi, components) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(kind, key, hour) DO UPDATE SET name=COALESCE(excluded.name, name), "
+                "aqi=excluded.aqi, components=excluded.components",
+                rows,
+            )
+        self.flushed += len(rows)
+        return len(rows)
+
+    def compact(self) -> Dict:
+        """Roll hourly rows up into daily rows (from the last watermark) and apply retention."""
+        start = time.time()
+        with self._db() as conn:
+            row = conn.execute("SELECT value FROM readings_meta WHERE name = 'rolled_up_to'").fetchone()
+            # Re-roll the watermark day too: it may have been partial last time
+            since = _hour_start(row["value"]) - 86400 if row else 0
+            since -= since % 86400
+            rolled = conn.execute(
+                f"""
+                INSERT INTO readings_daily (kind, key, name, day, aqi_avg, aqi_min, aqi_max, samples, components)
+                SELECT kind, key, max(name), date(hour, 'unixepoch'), avg(aqi), min(aqi), max(aqi), count(*),
+                       {_DAILY_COMPONENTS_SQL}
+                FROM readings_hourly WHERE hour >= ?
+                GROUP BY kind, key, date(hour, 'unixepoch')
+                ON CONFLICT(kind, key, day) DO UPDATE SET
+                    name=excluded.name, aqi_avg=excluded.aqi_avg, aqi_min=excluded.aqi_min,
+                    aqi_max=excluded.aqi_max, samples=excluded.samples, components=excluded.components
+                """,
+                (since,),
+            ).rowcount
+            cutoff = _hour_start(start) - READINGS_HOURLY_DAYS * 86400
+            dropped = conn.execute("DELETE FROM readings_hourly WHERE hour < ?", (cutoff,)).rowcount
+            conn.execute(
+                "INSERT INTO readings_meta (name, value) VALUES ('rolled_up_to', ?) "
+                "ON CONFLICT(name) DO UPDATE SET value=excluded.value",
+                (start,),
+            )
+        self.last_compaction = {
+            "daily_rows_written": rolled,
+            "hourly_rows_dropped": dropped,
+            "seconds": round(time.time() - start, 3),
+            "at": start,
+        }
+        return self.last_compaction
+
+    async def _run(self) -> None:
+        next_compaction = time.time()
+        while True:
+            await asyncio.sleep(READINGS_FLUSH_INTERVAL)
+            try:
+                await asyncio.to_thread(self.flush)
+                if time.time() >= next_compaction and (self.leader is None or self.leader.acquire()):
+                    await asyncio.to_thread(self.compact)
+                    next_compaction = time.time() + READINGS_COMPACT_INTERVAL
+            except Exception as e:
+                print(f"READINGS: background error: {e}")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    # ---------------- queries ----------------
+    def hourly(self, kind: str, key, hours: int = 48) -> List[Dict]:
+        """Hourly readings for the last `hours`, oldest first (includes unflushed readings)."""
+        self.flush()
+        since = _hour_start(time.time()) - hours * 3600
+        with self._db() as conn:
+            rows = conn.execute(
+                "SELECT hour, aqi, components FROM readings_hourly "
+                "WHERE kind = ? AND key = ? AND hour >= ? ORDER BY hour",
+                (kind, str(key).strip().lower(), since),
+            ).fetchall()
+        return [
+            {
+                "time": datetime.fromtimestamp(r["hour"], tz=timezone.utc).strftime("%Y-%m-%dT%H:00:00Z"),
+                "aqi": r["aqi"],
+                "components": json.loads(r["components"] or "{}"),
+            }
+            for r in rows
+        ]
+
+    def daily(self, kind: str, key, days: int = 365) -> List[Dict]:
+        """Daily rollups for the last `days`, oldest first."""
+        with self._db() as conn:
+            rows = conn.execute(
+                "SELECT day, aqi_avg, aqi_min, aqi_max, samples, components FROM readings_daily "
+                "WHERE kind = ? AND key = ? AND day >= date('now', ?) ORDER BY day",
+                (kind, str(key).strip().lower(), f"-{int(days)} days"),
+            ).fetchall()
+        return [
+            {
+                "date": r["day"],
+                "avg_aqi": round(r["aqi_avg"], 1) if r["aqi_avg"] is not None else None,
+                "min_aqi": r["aqi_min"],
+                "max_aqi": r["aqi_max"],
+                "samples": r["samples"],
+                "components": {k: round(v, 1) for k, v in json.loads(r["components"] or "{}").items() if v is not None},
+            }
+            for r in rows
+        ]
+
+    def stats(self) -> Dict:
+        with self._buffer_lock:
+            buffered = len(self._buffer)
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "buffered": buffered,
+            "last_compaction": self.last_compaction,
+        }
@@ -0,0 +1,133 @@
+"""
+Fast JSON Responses Module
+Serialization path for bulk API responses: NumPy arrays and scalars are
+encoded natively by orjson, tabular blocks are written straight from pandas
+columns (no per-row dicts), and the ETag and compression (gzip, or brotli
+when installed and accepted) are computed on the same bytes.
+
+`fast_json(request, content)` returns a ready Response; without orjson the
+standard library encoder is used with the same NumPy/pandas handling.
+"""
+import gzip
+import hashlib
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import Response
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except Exception:
+    HAS_BROTLI = False
+
+# ---------------- CONFIG ----------------
+COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+
+_ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if HAS_ORJSON else 0
+
+
+class Records:
+    """A DataFrame rendered as a JSON array of row objects, encoded column-wise by pandas (10 decimals)."""
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+
+    def to_json(self) -> bytes:
+        return self.frame.to_json(orient="records", double_precision=10).encode("utf-8")
+
+
+# ---------------- ENCODING ----------------
+def _plain(obj: Any) -> Any:
+    """Fallback conversions for types neither encoder handles natively."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (pd.Timestamp, datetime, date)):
+        return obj.isoformat()
+    if obj is pd.NaT:
+        return None
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode `content` to JSON bytes; `Records` values are spliced in pre-encoded."""
+    fragments: Dict[str, bytes] = {}
+
+    def default(obj: Any) -> Any:
+        if isinstance(obj, Records):
+            token = f"__records_{len(fragments)}_{id(obj)}__"
+            fragments[token] = obj.to_json()
+            return token
+        return _plain(obj)
+
+    if HAS_ORJSON:
+        body = orjson.dumps(content, default=default, option=_ORJSON_OPTIONS)
+    else:
+        body = json.dumps(content, default=default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    for token, raw in fragments.items():
+        body = body.replace(f'"{token}"'.encode(), raw, 1)
+    return body
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def preferred_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """"br", "gzip" or None: the encoding used for a client sending this Accept-Encoding."""
+    if not accept_encoding:
+        return None
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if HAS_BROTLI and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, accept_encoding: Optional[str]):
+    """(content-encoding or None, body) for the best encoding the client accepts."""
+    encoding = preferred_encoding(accept_encoding) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding == "br":
+        return "br", brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return "gzip", gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return None, body
+
+
+# ---------------- RESPONSES ----------------
+def fast_json(request, content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    JSON response with an ETag over the uncompressed body (304 when the client
+    already has it) and the body compressed for the client's Accept-Encoding.
+    """
+    body = dumps(content)
+    etag = etag_for(body)
+    out = {"ETag": etag, "Vary": "Accept-Encoding", **(headers or {})}
+    if request is not None and status_code == 200 and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=out)
+    encoding, body = compress(body, request.headers.get("accept-encoding") if request is not None else None)
+    if encoding:
+        out["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, media_type="application/json", headers=out)
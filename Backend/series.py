@@ -0,0 +1,130 @@
+"""
+Series Downsampling Module
+Helpers for serving long daily AQI series to charts: date windowing,
+calendar resampling (day/week/month), point-count reduction and compact
+encodings (NDJSON lines, Arrow IPC stream).
+
+Downsampling keeps original points, so peaks stay exact:
+- "lttb": Largest-Triangle-Three-Buckets, the visually faithful default.
+- "minmax": the minimum and maximum of each bucket (best for spike hunting).
+"""
+import json
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except Exception:
+    HAS_PYARROW = False
+
+RESOLUTIONS = {"day": None, "week": "W-MON", "month": "MS"}
+NDJSON_CHUNK_ROWS = 2000
+
+
+# ---------------- WINDOW / RESAMPLE ----------------
+def window(frame: pd.DataFrame, start=None, end=None) -> Tuple[np.ndarray, np.ndarray]:
+    """(dates as datetime64[D], aqi) for the rows of a date-sorted city frame within [start, end]."""
+    dates = frame["date"].to_numpy(dtype="datetime64[D]")
+    lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start, "D"), side="left"))
+    hi = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(end, "D"), side="right"))
+    return dates[lo:hi], frame["aqi"].to_numpy()[lo:hi]
+
+
+def resample(dates: np.ndarray, values: np.ndarray, resolution: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean AQI per calendar week (Monday start) or month, labelled by the period start."""
+    rule = RESOLUTIONS[resolution]
+    if rule is None or not len(dates):
+        return dates, values
+    s = pd.Series(values, index=pd.DatetimeIndex(dates), dtype="float64")
+    means = s.resample(rule, label="left", closed="left").mean().dropna().round(1)
+    return means.index.to_numpy(dtype="datetime64[D]"), means.to_numpy()
+
+
+# ---------------- DOWNSAMPLING ----------------
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the `n_out` points kept by Largest-Triangle-Three-Buckets (first and last always kept)."""
+    n = len(x)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    # n - 2 middle points split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, dtype=int)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt = slice(edges[i + 1], edges[i + 2])
+            avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of each bucket's min and max plus the end points: at most `n_out` points."""
+    n = len(y)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    if n_out < 4:
+        return np.array([0, n - 1])
+    buckets = max((n_out - 2) // 2, 1)
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((y, bucket))
+    starts = np.searchsorted(bucket, np.arange(buckets))
+    ends = np.append(starts[1:], n)
+    return np.unique(np.concatenate([order[starts], order[ends - 1], [0, n - 1]]))
+
+
+def downsample(dates: np.ndarray, values: np.ndarray, max_points: Optional[int],
+               method: str = "lttb") -> Tuple[np.ndarray, np.ndarray]:
+    if not max_points or len(dates) <= max_points:
+        return dates, values
+    if method == "minmax":
+        idx = minmax(values, max_points)
+    else:
+        idx = lttb(dates.astype("int64"), values, max_points)
+    return dates[idx], values[idx]
+
+
+# ---------------- ENCODINGS ----------------
+def date_strings(dates: np.ndarray) -> list:
+    """YYYY-MM-DD strings in one vectorized pass."""
+    return np.datetime_as_string(dates, unit="D").tolist()
+
+
+def iter_ndjson(dates: np.ndarray, values: np.ndarray, chunk_rows: int = NDJSON_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    One `{"date": ..., "aqi": ...}` line per point, yielded in chunks of `chunk_rows` lines.
+    Gaps (NaN AQI) are written as `null`: bare NaN is not valid JSON.
+    """
+    for i in range(0, len(dates), chunk_rows):
+        ds = date_strings(dates[i:i + chunk_rows])
+        chunk = values[i:i + chunk_rows]
+        vs = chunk.tolist()
+        if chunk.dtype.kind == "f":
+            vs = [None if v != v else v for v in vs]
+        yield "".join(
+            json.dumps({"date": d, "aqi": v}, allow_nan=False) + "\n" for d, v in zip(ds, vs)
+        ).encode("utf-8")
+
+
+def arrow_stream(dates: np.ndarray, values: np.ndarray) -> bytes:
+    """Arrow IPC stream with a date32 `date` column and a numeric `aqi` column."""
+    if not HAS_PYARROW:
+        raise RuntimeError("pyarrow is required for the arrow format")
+    table = pa.table({"date": pa.array(dates, type=pa.date32()), "aqi": pa.array(values)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,129 @@
+"""
+Shared Cache Module
+Cross-process second level for TTLCache: a local SQLite file in WAL mode that
+every gunicorn worker on the host reads and writes, so an upstream response
+fetched by one worker is reused by the others.
+
+Values are stored as JSON with their wall-clock store time; each process keeps
+its own connection (re-opened after fork). Any SQLite error is treated as a
+miss so the shared layer can never fail a request.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# ---------------- CONFIG ----------------
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE_ENABLED", "1") != "0"
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH") or str(Path(__file__).parent / "shared_cache.db")
+SHARED_CACHE_BUSY_MS = int(os.getenv("SHARED_CACHE_BUSY_MS", "1000"))
+SHARED_CACHE_PRUNE_EVERY = 500  # writes between sweeps of expired rows
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    stored_at REAL NOT NULL,        -- unix seconds
+    expires_at REAL NOT NULL,       -- stored_at + ttl + stale_ttl
+    value TEXT NOT NULL,            -- JSON
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+"""
+
+
+def _key_text(key: Hashable) -> str:
+    # Keys are strings or tuples of numbers/strings (e.g. Open-Meteo (hour, coords) chunks)
+    return key if isinstance(key, str) else repr(key)
+
+
+class SharedStore:
+    """Namespaced JSON entries in a SQLite file shared by all worker processes."""
+
+    def __init__(self, path: str = SHARED_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per (process, thread); connections must not cross a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=SHARED_CACHE_BUSY_MS / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, namespace: str, key: Hashable, max_age: float) -> Tuple[Optional[Any], Optional[float]]:
+        """(value, age_seconds) if an entry younger than `max_age` exists, else (None, None)."""
+        try:
+            row = self._connect().execute(
+                "SELECT stored_at, value FROM cache_entries WHERE namespace = ? AND key = ?",
+                (namespace, _key_text(key)),
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._error(e)
+            return None, None
+        age = time.time() - row[0] if row else None
+        if age is None or age >= max_age:
+            self.misses += 1
+            return None, None
+        self.hits += 1
+        return json.loads(row[1]), max(age, 0.0)
+
+    def set(self, namespace: str, key: Hashable, value: Any, retain: float) -> None:
+        """Store `value` (JSON-serialisable) for `retain` seconds."""
+        now = time.time()
+        try:
+            payload = json.dumps(value, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO cache_entries (namespace, key, stored_at, expires_at, value) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(namespace, key) DO UPDATE SET stored_at=excluded.stored_at, "
+                "expires_at=excluded.expires_at, value=excluded.value",
+                (namespace, _key_text(key), now, now + retain, payload),
+            )
+            self.writes += 1
+            self._writes += 1
+            if self._writes % SHARED_CACHE_PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (now,))
+        except sqlite3.Error as e:
+            self._error(e)
+
+    def delete(self, namespace: str, key: Hashable) -> None:
+        try:
+            self._connect().execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, _key_text(key))
+            )
+        except sqlite3.Error as e:
+            self._error(e)
+
+    def _error(self, e: Exception) -> None:
+        self.errors += 1
+        if self.errors in (1, 10, 100) or self.errors % 1000 == 0:
+            print(f"SHARED CACHE: {e} (errors={self.errors})")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "pid": os.getpid(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+        }
+
+
+# Process-wide instance used by the upstream caches (None when disabled)
+shared_store: Optional[SharedStore] = SharedStore() if SHARED_CACHE_ENABLED else None
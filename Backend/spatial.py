@@ -0,0 +1,100 @@
+"""
+Spatial Index Module
+Vectorized great-circle distances and a reusable index for radius queries
+over (lat, lng) points such as the cached WAQI stations.
+
+Points are indexed on the unit sphere (radians) with scikit-learn's BallTree
+and the haversine metric, so radius queries are logarithmic in the
+number of points. Without scikit-learn the index falls back to a single NumPy
+haversine pass over all points, which is still loop-free.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Optional tree index; the brute-force NumPy path gives the same answers
+try:
+    from sklearn.neighbors import BallTree
+    HAS_SKLEARN = True
+except Exception:
+    HAS_SKLEARN = False
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.0
+
+
+# ---------------- HELPERS ----------------
+def haversine_km(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Great-circle distance in km; arguments broadcast like NumPy arrays."""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype="float64")) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def coords_array(points: Iterable[Tuple[Optional[float], Optional[float]]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert (lat, lng) pairs to a float (n, 2) array plus a validity mask.
+    Missing or non-numeric coordinates become NaN and are masked out.
+    """
+    rows = []
+    for lat, lng in points:
+        try:
+            rows.append((float(lat), float(lng)))
+        except (TypeError, ValueError):
+            rows.append((np.nan, np.nan))
+    arr = np.asarray(rows, dtype="float64").reshape(-1, 2)
+    return arr, ~np.isnan(arr).any(axis=1)
+
+
+def within_radius(lat: float, lng: float, coords: np.ndarray, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Boolean mask of `coords` rows within `radius_km` of (lat, lng), plus all distances (NaN-safe)."""
+    dist = haversine_km(lat, lng, coords[:, 0], coords[:, 1]) if len(coords) else np.empty(0)
+    with np.errstate(invalid="ignore"):
+        mask = dist <= radius_km
+    return mask, dist
+
+
+def bounding_box(lat: float, lng: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(lat1, lng1, lat2, lng2) box enclosing the circle, e.g. for WAQI /map/bounds/."""
+    lat_offset = radius_km / KM_PER_DEGREE
+    cos_lat = max(np.cos(np.radians(lat)), 1e-6)
+    lng_offset = min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+    return lat - lat_offset, lng - lng_offset, lat + lat_offset, lng + lng_offset
+
+
+class SpatialIndex:
+    """Immutable radius index over a fixed set of (lat, lng) points."""
+
+    def __init__(self, coords: Sequence[Tuple[float, float]]):
+        self.coords = np.asarray(coords, dtype="float64").reshape(-1, 2)
+        self._tree = None
+        if HAS_SKLEARN and len(self.coords):
+            self._tree = BallTree(np.radians(self.coords), metric="haversine")
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    def query_radius(self, lat: float, lng: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices and distances (km) of points within `radius_km`, nearest first."""
+        if not len(self.coords):
+            return np.empty(0, dtype=int), np.empty(0)
+        if self._tree is not None:
+            ind, dist = self._tree.query_radius(
+                np.radians([[lat, lng]]), r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True
+            )
+            return ind[0], dist[0] * EARTH_RADIUS_KM
+        mask, dist = within_radius(lat, lng, self.coords, radius_km)
+        ind = np.flatnonzero(mask)
+        order = np.argsort(dist[ind], kind="stable")
+        return ind[order], dist[ind][order]
+
+
+class CityDirectory:
+    """Case-insensitive name lookup over a list of {name, lat, lng} cities."""
+
+    def __init__(self, cities: List[Dict]):
+        self.cities = list(cities)
+        self._by_name = {c["name"].strip().lower(): c for c in self.cities}
+
+    def find(self, name: str) -> Optional[Dict]:
+        return self._by_name.get(name.strip().lower())
@@ -0,0 +1,267 @@
+"""
+Station Registry Module
+Local mirror of every WAQI monitoring station in India (uid, name, coordinates,
+last AQI), refreshed by sweeping the country in tiles through `/map/bounds/`
+and persisted in SQLite so a restart starts warm.
+
+Station listing and nearby-station queries are answered from an in-memory
+snapshot of the registry (name scan + spatial index) instead of several
+`/search/` calls per request. The snapshot is rebuilt after each sweep and
+swapped in with a single assignment.
+
+With several workers only the leader (Backend/leader.py) sweeps; the others
+reload their snapshot from the shared database when it changes.
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Backend import http_client
+from Backend.spatial import SpatialIndex
+from Backend.waqi import map_bounds
+
+# ---------------- CONFIG ----------------
+STATION_DB_PATH = os.getenv("STATION_DB_PATH") or str(Path(__file__).parent / "stations.db")
+STATION_REGISTRY_ENABLED = os.getenv("STATION_REGISTRY_ENABLED", "1") != "0"
+STATION_REFRESH_INTERVAL = float(os.getenv("STATION_REFRESH_INTERVAL", "900"))   # seconds between sweeps
+STATION_TILE_DEGREES = float(os.getenv("STATION_TILE_DEGREES", "5"))
+STATION_RETENTION = float(os.getenv("STATION_RETENTION", str(7 * 86400)))       # drop stations unseen this long
+STATION_FOLLOW_INTERVAL = float(os.getenv("STATION_FOLLOW_INTERVAL", "60"))       # non-leader reload check
+
+# (lat1, lng1, lat2, lng2) covering India
+INDIA_BOUNDS = (6.0, 68.0, 37.5, 97.5)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stations (
+    uid INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lng REAL NOT NULL,
+    aqi REAL,
+    station_time TEXT,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def tiles(bounds: Tuple[float, float, float, float] = INDIA_BOUNDS,
+          step: float = STATION_TILE_DEGREES) -> List[str]:
+    """Split a bounding box into "lat1,lng1,lat2,lng2" tiles of at most `step` degrees."""
+    lat1, lng1, lat2, lng2 = bounds
+    out = []
+    for la in np.arange(lat1, lat2, step):
+        for lo in np.arange(lng1, lng2, step):
+            out.append(f"{la:.4f},{lo:.4f},{min(la + step, lat2):.4f},{min(lo + step, lng2):.4f}")
+    return out
+
+
+def _parse_bounds_station(item: Dict, now: float) -> Optional[Tuple]:
+    try:
+        uid, lat, lng = int(item["uid"]), float(item["lat"]), float(item["lon"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    try:
+        aqi = float(item.get("aqi"))
+    except (TypeError, ValueError):
+        aqi = None  # "-" while a station is offline
+    station = item.get("station") or {}
+    return uid, station.get("name") or f"Station {uid}", lat, lng, aqi, station.get("time"), now
+
+
+class _Snapshot:
+    """Immutable in-memory view of the registry."""
+
+    def __init__(self, rows: Sequence[sqlite3.Row]):
+        self.stations = [dict(r) for r in rows]
+        self.names = [s["name"].lower() for s in self.stations]
+        self.index = SpatialIndex([(s["lat"], s["lng"]) for s in self.stations])
+        self.built_at = time.time()
+
+
+class StationRegistry:
+    """SQLite-backed station table plus a periodically refreshed in-memory snapshot."""
+
+    def __init__(self, db_path: str = STATION_DB_PATH, interval: float = STATION_REFRESH_INTERVAL,
+                 on_sweep: Optional[Callable[[List[Dict]], None]] = None, leader=None):
+        self.db_path = db_path
+        self.interval = interval
+        self.on_sweep = on_sweep  # called with the stations seen by each sweep
+        self.leader = leader      # LeaderLock; None = this process always sweeps
+        self._task: Optional[asyncio.Task] = None
+        self.sweeps = 0
+        self.failed_tiles = 0
+        self.last_sweep: Optional[Dict] = None
+        self._init_db()
+        self._snapshot = _Snapshot(self._load_rows())
+        self.reloads = 0
+
+    # ---------------- storage ----------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _db(self) -> Iterator[sqlite3.Connection]:
+        """A connection committed on success, rolled back on error, and always closed."""
+        conn = self._connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self) -> None:
+        with self._db() as conn:
+            conn.execute(SCHEMA)
+
+    def _load_rows(self) -> List[sqlite3.Row]:
+        with self._db() as conn:
+            return conn.execute(
+                "SELECT uid, name, lat, lng, aqi, station_time, updated_at FROM stations ORDER BY uid"
+            ).fetchall()
+
+    def _store(self, rows: List[Tuple], now: float) -> List[sqlite3.Row]:
+        with self._db() as conn:
+            conn.executemany(
+                "INSERT INTO stations (uid, name, lat, lng, aqi, station_time, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(uid) DO UPDATE SET name=excluded.name, lat=excluded.lat, lng=excluded.lng, "
+                "aqi=excluded.aqi, station_time=excluded.station_time, updated_at=excluded.updated_at",
+                rows,
+            )
+            conn.execute("DELETE FROM stations WHERE updated_at < ?", (now - STATION_RETENTION,))
+        return self._load_rows()
+
+    def _db_version(self) -> Tuple:
+        with self._db() as conn:
+            return tuple(conn.execute("SELECT count(*), max(updated_at) FROM stations").fetchone())
+
+    def reload(self) -> bool:
+        """Rebuild the snapshot from the database if another process has changed it."""
+        snap = self._snapshot
+        current = (len(snap.stations), max((st["updated_at"] for st in snap.stations), default=None))
+        if self._db_version() == current:
+            return False
+        self._snapshot = _Snapshot(self._load_rows())
+        self.reloads += 1
+        return True
+
+    # ---------------- refresh ----------------
+    async def sweep(self) -> Dict:
+        """Fetch every tile concurrently, upsert the stations and swap in a new snapshot."""
+        start = time.time()
+        boxes = tiles()
+        results = await asyncio.gather(*(map_bounds(b, timeout=15) for b in boxes), return_exceptions=True)
+        rows, failed = {}, 0
+        for res in results:
+            if isinstance(res, Exception) or res.get("status") != "ok":
+                failed += 1
+                continue
+            for item in res.get("data") or []:
+                row = _parse_bounds_station(item, start)
+                if row is not None:
+                    rows[row[0]] = row
+        self.failed_tiles += failed
+        if rows:
+            # Tiles that failed keep their previous rows until retention expires
+            stored = await asyncio.to_thread(self._store, list(rows.values()), start)
+            self._snapshot = _Snapshot(stored)
+            if self.on_sweep is not None:
+                seen = set(rows)
+                self.on_sweep([st for st in self._snapshot.stations if st["uid"] in seen])
+        self.sweeps += 1
+        self.last_sweep = {
+            "tiles": len(boxes),
+            "failed_tiles": failed,
+            "stations_seen": len(rows),
+            "stations_total": len(self._snapshot.stations),
+            "seconds": round(time.time() - start, 2),
+            "at": start,
+        }
+        print(f"STATIONS: sweep saw {len(rows)} stations ({failed}/{len(boxes)} tiles failed)")
+        return self.last_sweep
+
+    async def _run(self) -> None:
+        http_client.mark_background()  # yield WAQI budget to user requests
+        while True:
+            # Pick up rows written by another worker (or a previous leader)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                print(f"STATIONS: reload error: {e}")
+            if self.leader is not None and not self.leader.acquire():
+                await asyncio.sleep(min(self.interval, STATION_FOLLOW_INTERVAL))
+                continue
+            # A warm database only needs the regular schedule
+            age = self.age_seconds()
+            if age is not None and age < self.interval:
+                await asyncio.sleep(self.interval - age)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"STATIONS: sweep error: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------------- queries (no I/O) ----------------
+    @property
+    def ready(self) -> bool:
+        return bool(self._snapshot.stations)
+
+    def age_seconds(self) -> Optional[float]:
+        stations = self._snapshot.stations
+        if not stations:
+            return None
+        return round(time.time() - max(s["updated_at"] for s in stations), 1)
+
+    def search(self, keywords: Sequence[str]) -> List[Dict]:
+        """Stations whose name contains any keyword (case-insensitive)."""
+        snap = self._snapshot
+        keys = [k.lower() for k in keywords if k]
+        return [s for s, name in zip(snap.stations, snap.names) if any(k in name for k in keys)]
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[Tuple[Dict, float]]:
+        """(station, distance_km) pairs within `radius_km`, nearest first."""
+        snap = self._snapshot
+        ind, dist = snap.index.query_radius(lat, lng, radius_km)
+        return [(snap.stations[i], float(d)) for i, d in zip(ind, dist)]
+
+    def stats(self) -> Dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "stations": len(self._snapshot.stations),
+            "snapshot_age_seconds": self.age_seconds(),
+            "sweeps": self.sweeps,
+            "reloads": self.reloads,
+            "failed_tiles": self.failed_tiles,
+            "last_sweep": self.last_sweep,
+        }
+
+
+def as_search_result(station: Dict) -> Dict:
+    """Render a registry row in WAQI `/search/` item shape for the existing station filters."""
+    return {
+        "uid": station["uid"],
+        "aqi": "-" if station["aqi"] is None else station["aqi"],
+        "station": {"name": station["name"], "geo": [station["lat"], station["lng"]]},
+        "time": {"stime": station["station_time"] or "N/A"},
+    }
@@ -0,0 +1,46 @@
+"""
+Checks for the vectorized CPCB AQI calculator (Backend/utils/aqi_calculation.py).
+Run with: python -m pytest Backend/test_aqi_calculation.py
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from Backend.utils.aqi_calculation import BREAKPOINTS, POLLUTANTS, calculate_aqi, compute_individual_aqi, sub_index
+
+
+@pytest.mark.parametrize("pollutant", POLLUTANTS)
+def test_sub_index_never_decreases(pollutant):
+    top = BREAKPOINTS[pollutant][-1][1]
+    step = 0.001 if pollutant == "CO" else 0.01
+    grid = np.arange(0, top * 1.2, step)
+    assert np.all(np.diff(sub_index(grid, pollutant)) >= 0)
+
+
+@pytest.mark.parametrize("pollutant", POLLUTANTS)
+def test_breakpoints_give_table_values(pollutant):
+    for bp_low, bp_high, aqi_low, aqi_high in BREAKPOINTS[pollutant]:
+        assert sub_index(bp_low, pollutant) == pytest.approx(aqi_low)
+        assert sub_index(bp_high, pollutant) == pytest.approx(aqi_high)
+
+
+def test_gaps_between_bands():
+    assert sub_index([30.0, 30.01, 30.4, 30.6, 31.0], "PM2.5").tolist() == [50, 50, 50, 51, 51]
+    assert sub_index([1.0, 1.05, 1.1], "CO").tolist() == [50, 50, 51]
+
+
+def test_edge_values():
+    assert sub_index(10_000, "PM10") == 500
+    assert np.isnan(sub_index(-1, "NO2"))
+    assert compute_individual_aqi(float("nan"), "O3") is None
+    assert compute_individual_aqi(12, "Pb") is None
+    with pytest.raises(KeyError):
+        sub_index(1, "Pb")
+
+
+def test_calculate_aqi_takes_the_worst_pollutant():
+    df = pd.DataFrame({"PM2.5": [45, None, "bad"], "NO2": [100, None, 20], "Other": [1, 2, 3]})
+    aqi = calculate_aqi(df)["AQI_corrected"]
+    assert aqi[0] == pytest.approx(sub_index(100, "NO2"))
+    assert np.isnan(aqi[1])
+    assert aqi[2] == pytest.approx(25)
@@ -0,0 +1,109 @@
+"""
+Checks for TTLCache with the shared SQLite level (Backend/cache.py, Backend/shared_cache.py).
+Run with: python -m pytest Backend/test_cache.py
+"""
+import asyncio
+
+from Backend.cache import TTLCache
+from Backend.shared_cache import SharedStore
+
+
+def _pair(tmp_path, **kwargs):
+    """Two caches over one shared file, standing in for two worker processes."""
+    store = SharedStore(str(tmp_path / "shared.db"))
+    return TTLCache("t", ttl=60, shared=store, **kwargs), TTLCache("t", ttl=60, shared=store, **kwargs)
+
+
+def test_second_worker_reuses_shared_entry(tmp_path):
+    a, b = _pair(tmp_path)
+    calls = []
+    assert a.get_or_load("k", lambda: calls.append(1) or {"v": 1}) == {"v": 1}
+    assert b.get_or_load("k", lambda: calls.append(1) or {"v": 2}) == {"v": 1}
+    assert len(calls) == 1 and b.shared_hits == 1
+
+
+def test_invalidate_removes_shared_entry(tmp_path):
+    a, b = _pair(tmp_path)
+    a.get_or_load("k", lambda: 1)
+    a.invalidate("k")
+    assert a.peek_shared("k") == (None, None)
+    assert b.get_or_load("k", lambda: 2) == 2
+
+
+def test_local_ttl_zero_sees_other_workers_invalidation(tmp_path):
+    a, b = _pair(tmp_path, local_ttl=0)
+    a.get_or_load("k", lambda: "old")
+    assert b.get_or_load("k", lambda: "unused") == "old"
+    a.invalidate("k")
+    # b still holds a local copy, but with local_ttl=0 it re-reads the shared level
+    assert b.get_or_load("k", lambda: "new") == "new"
+
+
+def test_default_local_ttl_keeps_local_copy(tmp_path):
+    a, b = _pair(tmp_path)
+    b.get_or_load("k", lambda: "old")
+    a.invalidate("k")
+    assert b.get_or_load("k", lambda: "new") == "old"
+
+
+def test_async_loader_failure_serves_shared_stale(tmp_path):
+    store = SharedStore(str(tmp_path / "shared.db"))
+    writer = TTLCache("t", ttl=0.01, stale_ttl=60, shared=store)
+    reader = TTLCache("t", ttl=0.01, stale_ttl=60, shared=store)
+
+    async def run():
+        async def ok():
+            return "good"
+
+        async def fail():
+            raise RuntimeError("upstream down")
+
+        await writer.aget_or_load("k", ok)
+        await asyncio.sleep(0.02)
+        return await reader.aget_or_load("k", fail)
+
+    assert asyncio.run(run()) == "good"
+    assert reader.stale == 1
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    cache = TTLCache("t", ttl=60)
+    calls = []
+
+    async def run():
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "v"
+
+        leader = asyncio.create_task(cache.aget_or_load("k", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.aget_or_load("k", slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        value = await follower
+        return leader, value
+
+    leader, value = asyncio.run(run())
+    assert leader.cancelled()
+    assert value == "v" and len(calls) == 1 and cache.coalesced == 1
+    assert cache.get("k") == "v"
+
+
+def test_load_finishes_after_every_caller_gave_up():
+    cache = TTLCache("t", ttl=60)
+
+    async def run():
+        async def slow():
+            await asyncio.sleep(0.02)
+            return "warm"
+
+        try:
+            await asyncio.wait_for(cache.aget_or_load("k", slow), timeout=0.005)
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.sleep(0.05)
+        return await cache.aget_or_load("k", slow)
+
+    assert asyncio.run(run()) == "warm"
+    assert cache.hits == 1
@@ -0,0 +1,98 @@
+"""
+Checks for the response cache middleware (Backend/http_cache.py).
+Run with: python -m pytest Backend/test_http_cache.py
+"""
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from Backend.http_cache import DEGRADED_HEADER, CacheRule, ResponseCache, ResponseCacheMiddleware
+
+
+def _client(**cache_kwargs):
+    state = {"version": "v1", "calls": 0, "degraded": False}
+    app = FastAPI()
+
+    @app.get("/data/{name}")
+    def data(name: str, response: Response, n: int = 0):
+        state["calls"] += 1
+        if state["degraded"]:
+            response.headers[DEGRADED_HEADER] = "1"
+        return {"name": name, "n": n, "pad": "x" * 100}
+
+    cache = ResponseCache([CacheRule(
+        "test", paths=["/data/"], exclude=["/data/live"],
+        version=lambda: state["version"], cache_control=lambda: "public, max-age=60",
+    )], **cache_kwargs)
+    app.add_middleware(ResponseCacheMiddleware, cache=cache)
+    return TestClient(app), cache, state
+
+
+def test_replay_and_query_normalisation():
+    client, cache, state = _client()
+    first = client.get("/data/a?n=1&x=2")
+    again = client.get("/data/a?x=3&n=1")
+    assert first.status_code == again.status_code == 200
+    assert first.content == again.content
+    assert first.headers["etag"] == again.headers["etag"]
+    assert first.headers["cache-control"] == "public, max-age=60"
+    assert state["calls"] == 1 and cache.hits == 1
+
+
+def test_undeclared_query_parameters_share_one_entry():
+    client, cache, state = _client()
+    for i in range(5):
+        client.get(f"/data/a?n=1&x={i}")
+    client.get("/data/a?n=2")
+    client.get("/nowhere?x=1")
+    assert state["calls"] == 2 and cache.stats()["entries"] == 2
+
+
+def test_total_bytes_budget_evicts_oldest():
+    client, cache, state = _client(max_bytes=400)
+    for name in "abcd":
+        client.get(f"/data/{name}")
+    assert cache.bytes <= 400
+    assert cache.stats()["entries"] < 4
+    client.get("/data/d")
+    client.get("/data/a")
+    assert state["calls"] == 5
+
+
+def test_if_none_match_returns_304_without_running_route():
+    client, cache, state = _client()
+    etag = client.get("/data/a").headers["etag"]
+    resp = client.get("/data/a", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+    assert state["calls"] == 1 and cache.not_modified == 1
+
+
+def test_version_change_invalidates_etag_and_entry():
+    client, _, state = _client()
+    etag = client.get("/data/a").headers["etag"]
+    state["version"] = "v2"
+    resp = client.get("/data/a", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
+    assert state["calls"] == 2
+
+
+def test_bypass_rules():
+    client, cache, state = _client()
+    client.get("/data/a", headers={"Authorization": "Bearer t"})
+    client.get("/data/a", headers={"Authorization": "Bearer t"})
+    client.get("/data/live")
+    client.get("/data/live")
+    assert state["calls"] == 4 and cache.stats()["entries"] == 0
+
+
+def test_degraded_response_is_not_stored():
+    client, cache, state = _client()
+    state["degraded"] = True
+    resp = client.get("/data/a")
+    assert resp.headers["cache-control"] == "no-store"
+    assert DEGRADED_HEADER.lower() not in resp.headers
+    state["degraded"] = False
+    client.get("/data/a")
+    client.get("/data/a")
+    assert state["calls"] == 2 and cache.degraded == 1
@@ -0,0 +1,75 @@
+"""
+Checks for the upstream governor (Backend/http_client.py).
+Run with: python -m pytest Backend/test_http_client.py
+"""
+import asyncio
+import time
+
+import pytest
+
+from Backend import http_client
+from Backend.http_client import BACKGROUND, INTERACTIVE, RateLimitedError, TokenBucket
+
+
+def test_small_burst_keeps_background_reachable():
+    # e.g. a 10-token burst split across 12 workers
+    for burst in (1.0, 10 / 12, 1.5, 1.99):
+        bucket = TokenBucket(rate=50, burst=burst)
+        assert 0 <= bucket.reserve <= bucket.burst - 1
+
+    async def run():
+        bucket = TokenBucket(rate=20, burst=10 / 12)
+        start = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire(BACKGROUND)
+        return time.monotonic() - start, bucket
+
+    elapsed, bucket = asyncio.run(run())
+    assert bucket.granted[BACKGROUND] == 3
+    assert elapsed < 1
+
+
+def test_background_leaves_reserve_for_interactive():
+    async def run():
+        bucket = TokenBucket(rate=1, burst=4)      # reserve = 2 tokens
+        await bucket.acquire(BACKGROUND)
+        await bucket.acquire(BACKGROUND)
+        assert bucket.tokens < 3
+        # The reserve is still there for interactive requests, without waiting
+        start = time.monotonic()
+        await bucket.acquire(INTERACTIVE)
+        await bucket.acquire(INTERACTIVE)
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) < 0.1
+
+
+def test_background_yields_to_waiting_interactive():
+    async def run():
+        bucket = TokenBucket(rate=20, burst=1)
+        bucket.tokens = 0
+        order = []
+
+        async def take(priority, label, delay=0.0):
+            await asyncio.sleep(delay)
+            await bucket.acquire(priority)
+            order.append(label)
+
+        await asyncio.gather(take(BACKGROUND, "bg"), take(INTERACTIVE, "fg", delay=0.01))
+        return order
+
+    assert asyncio.run(run()) == ["fg", "bg"]
+
+
+def test_waits_are_bounded(monkeypatch):
+    monkeypatch.setattr(http_client, "GOVERNOR_MAX_WAIT", 0.05)
+    monkeypatch.setattr(http_client, "BACKGROUND_MAX_WAIT", 0.05)
+
+    async def run(priority):
+        bucket = TokenBucket(rate=0.1, burst=1)
+        bucket.tokens = 0
+        await bucket.acquire(priority)
+
+    for priority in (INTERACTIVE, BACKGROUND):
+        with pytest.raises(RateLimitedError):
+            asyncio.run(run(priority))
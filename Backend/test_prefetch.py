@@ -0,0 +1,42 @@
+"""
+Checks for the background AQI prefetcher (Backend/prefetch.py).
+Run with: python -m pytest Backend/test_prefetch.py
+"""
+import asyncio
+import time
+
+from Backend import prefetch
+from Backend.cache import TTLCache
+from Backend.prefetch import CityPrefetcher
+
+CITY = {"name": "Delhi", "lat": 28.6, "lng": 77.2}
+
+
+def _setup(monkeypatch, age):
+    """A prefetcher whose feed lookups are answered by a cache entry `age` seconds old."""
+    cache = TTLCache("waqi_feed", ttl=300, stale_ttl=3600)
+    cache.set("delhi", {"status": "ok", "data": {"aqi": 180}}, age=age)
+
+    async def fake_feed(name, timeout=10):
+        return cache.peek(name.lower())[0]
+
+    monkeypatch.setattr(prefetch, "feed_cache", cache)
+    monkeypatch.setattr(prefetch, "get_waqi_feed", fake_feed)
+    fed = []
+    return CityPrefetcher([CITY], on_feed=lambda name, data: fed.append(name)), fed
+
+
+def test_fresh_feed_is_dated_by_its_cache_entry(monkeypatch):
+    prefetcher, fed = _setup(monkeypatch, age=120)
+    asyncio.run(prefetcher.refresh_city(CITY))
+    assert fed == ["Delhi"] and prefetcher.refreshes == 1
+    assert 119 <= time.time() - prefetcher.get("Delhi")["fetched_at"] <= 125
+
+
+def test_stale_fallback_is_not_reported_as_fresh(monkeypatch):
+    prefetcher, fed = _setup(monkeypatch, age=1800)
+    asyncio.run(prefetcher.refresh_city(CITY))
+    assert fed == [] and prefetcher.refreshes == 0 and prefetcher.errors == 1
+    assert prefetcher.get("Delhi")["aqi"] == 180
+    assert prefetcher.stats()["snapshot_age_seconds"] >= 1800
+    assert prefetcher.stats()["backing_off"] == ["Delhi"]
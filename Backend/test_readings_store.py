@@ -0,0 +1,79 @@
+"""
+Checks for the live readings store (Backend/readings_store.py).
+Run with: python -m pytest Backend/test_readings_store.py
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+from Backend import readings_store
+from Backend.readings_store import KIND_CITY, KIND_STATION, ReadingsStore, flatten_iaqi, observed_at
+
+
+def _store(tmp_path):
+    return ReadingsStore(db_path=str(tmp_path / "readings.db"), enabled=True)
+
+
+def test_latest_reading_per_hour_wins(tmp_path):
+    store = _store(tmp_path)
+    now = time.time()
+    store.record(KIND_CITY, " Delhi ", "Delhi", 100, {"pm25": 80}, ts=now)
+    store.record(KIND_CITY, "delhi", "Delhi", {"v": 120}, {"pm25": 90}, ts=now)
+    store.record(KIND_CITY, "delhi", "Delhi", "-", ts=now)  # non-numeric AQI is ignored
+    rows = store.hourly(KIND_CITY, "DELHI", hours=2)
+    assert [r["aqi"] for r in rows] == [120.0]
+    assert rows[0]["components"] == {"pm25": 90}
+
+
+def test_daily_rollup(tmp_path):
+    store = _store(tmp_path)
+    day_start = (time.time() // 86400 - 1) * 86400      # yesterday 00:00 UTC
+    for hour, aqi in enumerate([50, 100, 150]):
+        store.record(KIND_STATION, 42, "Station", aqi, {"pm25": aqi / 2}, ts=day_start + hour * 3600)
+    store.flush()
+    report = store.compact()
+    assert report["daily_rows_written"] == 1
+    (day,) = store.daily(KIND_STATION, 42, days=3)
+    assert (day["avg_aqi"], day["min_aqi"], day["max_aqi"], day["samples"]) == (100.0, 50.0, 150.0, 3)
+    assert day["components"]["pm25"] == 50.0
+
+    # Re-compacting the same day is idempotent
+    store.compact()
+    assert len(store.daily(KIND_STATION, 42, days=3)) == 1
+
+
+def test_retention_drops_old_hourly_rows_but_keeps_daily(tmp_path, monkeypatch):
+    monkeypatch.setattr(readings_store, "READINGS_HOURLY_DAYS", 2)
+    store = _store(tmp_path)
+    now = time.time()
+    store.record(KIND_CITY, "pune", "Pune", 70, ts=now - 5 * 86400)
+    store.record(KIND_CITY, "pune", "Pune", 80, ts=now)
+    store.flush()
+    report = store.compact()
+    assert report["hourly_rows_dropped"] == 1
+    assert [r["aqi"] for r in store.hourly(KIND_CITY, "pune", hours=24 * 10)] == [80.0]
+    assert [d["avg_aqi"] for d in store.daily(KIND_CITY, "pune", days=10)] == [70.0, 80.0]
+
+
+def test_flatten_iaqi_keeps_numeric_values():
+    assert flatten_iaqi({"pm25": {"v": 12}, "t": {"v": "x"}, "co": 3}) == {"pm25": 12.0, "co": 3.0}
+
+
+def test_record_feed_uses_observation_time(tmp_path):
+    store = _store(tmp_path)
+    measured = (time.time() // 3600 - 5) * 3600 + 120       # five hours ago
+    iso = datetime.fromtimestamp(measured, timezone(timedelta(hours=5, minutes=30))).isoformat()
+    feed = {"status": "ok", "data": {"aqi": 150, "city": {"name": "Delhi"}, "iaqi": {"pm25": {"v": 150}},
+                                     "time": {"iso": iso, "v": 0}}}
+    store.record_feed(KIND_CITY, "Delhi", feed)
+    store.record_feed(KIND_CITY, "Delhi", feed)                # the same cached feed again
+    store.record_feed(KIND_CITY, "Delhi", {"status": "ok", "data": {"aqi": 90, "time": {"v": measured + 3600}}})
+    rows = store.hourly(KIND_CITY, "delhi", hours=24)
+    assert [r["aqi"] for r in rows] == [150.0, 90.0]
+    assert observed_at(feed["data"]) == measured
+
+
+def test_record_feed_without_time_uses_now(tmp_path):
+    store = _store(tmp_path)
+    store.record_feed(KIND_CITY, "Pune", {"status": "ok", "data": {"aqi": 60}})
+    store.record_feed(KIND_CITY, "Pune", {"status": "ok", "data": {"aqi": 70, "time": {"v": time.time() + 7200}}})
+    assert [r["aqi"] for r in store.hourly(KIND_CITY, "pune", hours=2)] == [70.0]
@@ -0,0 +1,87 @@
+"""
+Checks for the chart downsampling helpers (Backend/series.py) against plain-loop baselines.
+Run with: python -m pytest Backend/test_series.py
+"""
+import json
+
+import numpy as np
+import pytest
+
+from Backend import series
+
+
+def _baseline_lttb(x, y, n_out):
+    """Textbook Largest-Triangle-Three-Buckets, one point at a time."""
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    kept = [0]
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        nlo, nhi = hi, min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x[nlo:nhi]) / (nhi - nlo)
+        avg_y = sum(y[nlo:nhi]) / (nhi - nlo)
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
+
+
+def _baseline_minmax(y, n_out):
+    """Min and max of each bucket plus both ends, one bucket at a time."""
+    n = len(y)
+    buckets = (n_out - 2) // 2
+    kept = {0, n - 1}
+    for b in range(buckets):
+        idx = [i for i in range(n) if i * buckets // n == b]
+        kept.add(min(idx, key=lambda i: y[i]))
+        kept.add(max(idx, key=lambda i: y[i]))
+    return sorted(kept)
+
+
+@pytest.mark.parametrize("n, n_out", [(10, 5), (365, 50), (1000, 97), (5000, 300)])
+def test_lttb_matches_baseline(n, n_out):
+    rng = np.random.default_rng(n)
+    x = np.arange(n, dtype="float64")
+    y = rng.normal(100, 30, n)
+    assert series.lttb(x, y, n_out).tolist() == _baseline_lttb(x.tolist(), y.tolist(), n_out)
+
+
+@pytest.mark.parametrize("n, n_out", [(10, 6), (365, 50), (1000, 97), (5000, 300)])
+def test_minmax_matches_baseline(n, n_out):
+    y = np.random.default_rng(n).normal(100, 30, n)
+    assert series.minmax(y, n_out).tolist() == _baseline_minmax(y.tolist(), n_out)
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_downsample_keeps_ends_and_point_budget(method):
+    dates = np.arange("2015-01-01", "2024-01-01", dtype="datetime64[D]")
+    values = np.random.default_rng(7).integers(20, 400, len(dates))
+    out_dates, out_values = series.downsample(dates, values, 200, method)
+    assert len(out_dates) <= 200
+    assert out_dates[0] == dates[0] and out_dates[-1] == dates[-1]
+    assert np.all(np.diff(out_dates.astype("int64")) > 0)
+    if method == "minmax":
+        assert out_values.max() == values.max() and out_values.min() == values.min()
+
+
+def test_short_series_is_returned_unchanged():
+    dates = np.arange("2024-01-01", "2024-01-11", dtype="datetime64[D]")
+    values = np.arange(10)
+    out_dates, out_values = series.downsample(dates, values, 50)
+    assert out_dates is dates and out_values is values
+
+
+def test_ndjson_writes_gaps_as_null():
+    dates = np.arange("2024-01-01", "2024-01-06", dtype="datetime64[D]")
+    values = np.array([10.0, np.nan, 12.5, np.nan, 14.0])
+    lines = b"".join(series.iter_ndjson(dates, values, chunk_rows=2)).decode().splitlines()
+    parsed = [json.loads(line) for line in lines]
+    assert [p["aqi"] for p in parsed] == [10.0, None, 12.5, None, 14.0]
+    assert [p["date"] for p in parsed] == ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"]
+    assert all("NaN" not in line for line in lines)
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Standard breakpoints for AQI calculation (India CPCB National AQI)
+# (concentration low, concentration high, AQI low, AQI high); CO in mg/m3, the rest in ug/m3.
+# CPCB leaves the "Severe" band open-ended; its upper concentration here only sets the slope.
+BREAKPOINTS = {
+    "PM2.5": [(0, 30, 0, 50), (31, 60, 51, 100), (61, 90, 101, 200),
+              (91, 120, 201, 300), (121, 250, 301, 400), (251, 500, 401, 500)],
+
+    "PM10": [(0, 50, 0, 50), (51, 100, 51, 100), (101, 250, 101, 200),
+             (251, 350, 201, 300), (351, 430, 301, 400), (431, 1000, 401, 500)],
+
+    "NO2": [(0, 40, 0, 50), (41, 80, 51, 100), (81, 180, 101, 200),
+            (181, 280, 201, 300), (281, 400, 301, 400), (401, 800, 401, 500)],
+
+    "SO2": [(0, 40, 0, 50), (41, 80, 51, 100), (81, 380, 101, 200),
+            (381, 800, 201, 300), (801, 1600, 301, 400), (1601, 2400, 401, 500)],
+
+    "CO": [(0, 1.0, 0, 50), (1.1, 2.0, 51, 100), (2.1, 10, 101, 200),
+           (10.1, 17, 201, 300), (17.1, 34, 301, 400), (34.1, 51, 401, 500)],
+
+    "O3": [(0, 50, 0, 50), (51, 100, 51, 100), (101, 168, 101, 200),
+           (169, 208, 201, 300), (209, 748, 301, 400), (749, 1000, 401, 500)],
+
+    "NH3": [(0, 200, 0, 50), (201, 400, 51, 100), (401, 800, 101, 200),
+            (801, 1200, 201, 300), (1201, 1800, 301, 400), (1801, 3600, 401, 500)],
+}
+
+POLLUTANTS = list(BREAKPOINTS)
+AQI_MAX = 500
+
+# Column arrays per pollutant, so lookups are a single searchsorted
+_TABLES = {
+    pollutant: tuple(np.asarray(col, dtype="float64") for col in zip(*bands))
+    for pollutant, bands in BREAKPOINTS.items()
+}
+
+# CPCB bands are published at the table's precision (integers, 0.1 for CO), leaving
+# gaps such as 30..31 for PM2.5. A value in a gap belongs to the band it rounds to,
+# so each band boundary sits halfway across its gap.
+_EDGES = {
+    pollutant: (bp_high[:-1] + bp_low[1:]) / 2
+    for pollutant, (bp_low, bp_high, _, _) in _TABLES.items()
+}
+
+
+def sub_index(concentration, pollutant):
+    """
+    Vectorized CPCB sub-index for an array (or scalar) of concentrations.
+    A value between two bands (e.g. PM2.5 = 30.4) counts as the nearest band's
+    edge, so the sub-index never decreases as the concentration rises; values
+    beyond the last breakpoint are capped at AQI_MAX, and negative or missing
+    values give NaN.
+    """
+    if pollutant not in _TABLES:
+        raise KeyError(f"No CPCB breakpoints for {pollutant}")
+    bp_low, bp_high, aqi_low, aqi_high = _TABLES[pollutant]
+
+    x = np.asarray(concentration, dtype="float64")
+    band = np.searchsorted(_EDGES[pollutant], x, side="left")
+    lo, hi = bp_low[band], bp_high[band]
+    aqi = (aqi_high[band] - aqi_low[band]) / (hi - lo) * (np.clip(x, lo, hi) - lo) + aqi_low[band]
+    return np.where(x >= 0, aqi, np.nan)
+
+
+def compute_individual_aqi(concentration, pollutant):
+    """Computes AQI contribution for one pollutant."""
+    if pollutant not in BREAKPOINTS:
+        return None
+    value = float(sub_index(concentration, pollutant))
+    return None if np.isnan(value) else value
+
+
+def sub_indices(df, pollutants=None):
+    """DataFrame of per-pollutant sub-indices ("<pollutant>_SubIndex") for every row of `df`."""
+    pollutants = [p for p in (pollutants or POLLUTANTS) if p in df.columns]
+    return pd.DataFrame(
+        {f"{p}_SubIndex": sub_index(pd.to_numeric(df[p], errors="coerce").to_numpy(), p) for p in pollutants},
+        index=df.index,
+    )
+
+
+def calculate_aqi(df, pollutants=None):
+    """
+    Adds an improved corrected AQI column: the max sub-index over every CPCB
+    pollutant present in `df` (NaN when none of them is available).
+    """
+    subs = sub_indices(df, pollutants).to_numpy()
+    if subs.shape[1] == 0:
+        df["AQI_corrected"] = np.nan
+        return df
+
+    # nanmax without the all-NaN warning
+    filled = np.where(np.isnan(subs), -np.inf, subs).max(axis=1)
+    df["AQI_corrected"] = np.where(np.isfinite(filled), filled, np.nan)
+    return df
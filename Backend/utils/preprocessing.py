@@ -1,6 +1,17 @@
 import pandas as pd
 import numpy as np
 import os
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Optional: Parquet output for the streaming pipeline
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except Exception:
+    HAS_PYARROW = False
 
 # ---------------------------------------------------
 # Resolve absolute dataset path (works anywhere)
@@ -115,11 +126,176 @@ def preprocess_all():
     }
 
 
+# ---------------------------------------------------
+# Streaming pipeline (bounded memory, for station_hour.csv)
+# ---------------------------------------------------
+# Chunks are read with explicit dtypes, cleaned in a process pool and written
+# straight to Parquet partitions (<out>/<name>/year=YYYY/part-NNNNN.parquet),
+# so peak memory is ~ workers x chunk size regardless of the input size.
+
+INVALID_VALUES = ["#", "##", "NA", "NAN", "NaN", "", " "]
+POLLUTANT_COLUMNS = [
+    "PM2.5", "PM10", "NO", "NO2", "NOx", "NH3", "CO", "SO2", "O3",
+    "Benzene", "Toluene", "Xylene", "AQI",
+]
+CATEGORY_COLUMNS = ["City", "StationId", "AQI_Bucket"]
+DATE_COLUMNS = ["Date", "Datetime"]
+STATION_KEY = "StationId"
+
+CHUNK_SIZE = int(os.getenv("PREPROCESS_CHUNK_SIZE", "200000"))
+STREAM_WORKERS = int(os.getenv("PREPROCESS_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+# Station metadata indexed by StationId, set once per worker process
+_STATIONS_META = None
+
+
+def _init_worker(stations_meta):
+    global _STATIONS_META
+    _STATIONS_META = stations_meta
+
+
+def _read_dtypes(path):
+    """Explicit dtypes for the columns present in the file header (no type inference)."""
+    header = pd.read_csv(path, nrows=0).columns.str.strip()
+    dtypes = {}
+    for col in header:
+        if col in POLLUTANT_COLUMNS:
+            dtypes[col] = "float32"
+        elif col not in DATE_COLUMNS:
+            dtypes[col] = "str"
+    return dtypes
+
+
+def iter_csv_chunks(path, chunksize=CHUNK_SIZE):
+    """Yield DataFrame chunks; falls back to string columns if a numeric column has stray tokens."""
+    dtypes = _read_dtypes(path)
+    yielded = 0
+    try:
+        for chunk in pd.read_csv(path, dtype=dtypes, na_values=INVALID_VALUES, chunksize=chunksize):
+            yielded += len(chunk)
+            yield chunk
+    except ValueError as e:
+        print(f"⚠ {os.path.basename(path)}: non-numeric values in pollutant columns ({e}); reading the rest as text")
+        safe = {col: "str" for col in dtypes}
+        yield from pd.read_csv(path, dtype=safe, na_values=INVALID_VALUES, chunksize=chunksize,
+                               skiprows=range(1, yielded + 1))
+
+
+def clean_chunk(df):
+    """Chunk-level equivalent of clean_pollution_data with fixed output dtypes."""
+    df.columns = df.columns.str.strip()
+
+    for col in df.columns:
+        if col in DATE_COLUMNS:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        elif col in POLLUTANT_COLUMNS and df[col].dtype != "float32":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].str.strip().astype("category")
+
+    if "AQI" in df.columns:
+        df = df.dropna(subset=["AQI"])
+    return df.reset_index(drop=True)
+
+
+def merge_station_metadata_keyed(chunk, stations_meta):
+    """Left-join station metadata with an index lookup (no per-chunk merge/sort)."""
+    if stations_meta is None or STATION_KEY not in chunk.columns:
+        return chunk
+    extra = stations_meta.reindex(chunk[STATION_KEY].astype(str).to_numpy())
+    for col in extra.columns:
+        if col not in chunk.columns:
+            chunk[col] = extra[col].to_numpy()
+    return chunk
+
+
+def _write_partitions(df, out_dir, part):
+    """Write one cleaned chunk as Parquet, partitioned by year of its date column."""
+    date_col = next((c for c in DATE_COLUMNS if c in df.columns), None)
+    years = df[date_col].dt.year if date_col else pd.Series(0, index=df.index)
+    written = 0
+    for year, group in df.groupby(years.fillna(0).astype(int), sort=False):
+        part_dir = os.path.join(out_dir, f"year={year}")
+        os.makedirs(part_dir, exist_ok=True)
+        table = pa.Table.from_pandas(group, preserve_index=False)
+        pq.write_table(table, os.path.join(part_dir, f"part-{part:05d}.parquet"))
+        written += len(group)
+    return written
+
+
+def _process_chunk(chunk, out_dir, part):
+    rows_in = len(chunk)
+    chunk = clean_chunk(chunk)
+    chunk = merge_station_metadata_keyed(chunk, _STATIONS_META)
+    return rows_in, _write_partitions(chunk, out_dir, part)
+
+
+def preprocess_streaming(name, out_root, chunksize=CHUNK_SIZE, workers=STREAM_WORKERS):
+    """
+    Stream DATASET_DIR/<name>.csv through the chunked pipeline into out_root/<name>/.
+    At most 2 x workers chunks are in flight at any time.
+    """
+    if not HAS_PYARROW:
+        raise RuntimeError("pyarrow is required for the streaming pipeline. Install pyarrow.")
+
+    path = os.path.join(DATASET_DIR, f"{name}.csv")
+    out_dir = os.path.join(out_root, name)
+    # Part files are numbered per run, so stale parts from an earlier (larger) run
+    # would otherwise be read back as part of the dataset
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    stations_meta = None
+    stations_path = os.path.join(DATASET_DIR, "stations.csv")
+    if os.path.exists(stations_path):
+        stations_meta = pd.read_csv(stations_path, dtype=str)
+        stations_meta.columns = stations_meta.columns.str.strip()
+        if STATION_KEY in stations_meta.columns:
+            stations_meta = stations_meta.drop_duplicates(STATION_KEY).set_index(STATION_KEY)
+        else:
+            stations_meta = None
+
+    print(f"\nStreaming {name}.csv -> {out_dir} (chunks of {chunksize}, {workers} workers)")
+    rows_in = rows_out = 0
+    pending = set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(stations_meta,)) as pool:
+        for part, chunk in enumerate(iter_csv_chunks(path, chunksize)):
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    r_in, r_out = fut.result()
+                    rows_in += r_in
+                    rows_out += r_out
+            pending.add(pool.submit(_process_chunk, chunk, out_dir, part))
+        for fut in pending:
+            r_in, r_out = fut.result()
+            rows_in += r_in
+            rows_out += r_out
+
+    print(f"{name}: {rows_in} rows read, {rows_out} rows written")
+    return rows_in, rows_out
+
+
 # ---------------------------------------------------
 # Run the file directly for testing
 # ---------------------------------------------------
 if __name__ == "__main__":
-    data = preprocess_all()
-
-    print("\nPreview of cleaned city_day:")
-    print(data["city_day"].head())
+    parser = argparse.ArgumentParser(description="Preprocess the pollution datasets")
+    parser.add_argument("--stream", nargs="*", metavar="NAME",
+                        help="stream the named datasets (default: station_hour) to Parquet partitions")
+    parser.add_argument("--out", default=os.path.join(DATASET_DIR, "processed"))
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=STREAM_WORKERS)
+    args = parser.parse_args()
+
+    if args.stream is not None:
+        for name in args.stream or ["station_hour"]:
+            preprocess_streaming(name, args.out, args.chunksize, args.workers)
+    else:
+        data = preprocess_all()
+
+        print("\nPreview of cleaned city_day:")
+        print(data["city_day"].head())
@@ -0,0 +1,85 @@
+"""
+WAQI Upstream Module
+Shared access to the WAQI (aqicn.org) feed, search and map APIs, with a
+process-wide TTL cache in front of `/feed/`.
+Feeds are keyed by city name or station uid ("@<uid>") so that repeated lookups
+for the same city within the TTL never leave the process.
+"""
+import os
+
+from Backend.cache import TTLCache
+from Backend.shared_cache import shared_store
+from Backend import http_client
+from Backend.http_client import UpstreamError
+
+# ---------------- CONFIG ----------------
+# Note: In production, use environment variables for tokens
+WAQI_TOKEN = os.getenv("WAQI_TOKEN", "9fe0a55684bf08d8c8131b1cba6233542f86f55d")
+WAQI_BASE_URL = "https://api.waqi.info"
+
+# WAQI stations report hourly; a few minutes of reuse is invisible to users
+WAQI_CACHE_TTL = float(os.getenv("WAQI_CACHE_TTL", "300"))
+WAQI_CACHE_STALE_TTL = float(os.getenv("WAQI_CACHE_STALE_TTL", "3600"))
+WAQI_CACHE_MAXSIZE = int(os.getenv("WAQI_CACHE_MAXSIZE", "512"))
+
+feed_cache = TTLCache(
+    "waqi_feed",
+    ttl=WAQI_CACHE_TTL,
+    maxsize=WAQI_CACHE_MAXSIZE,
+    stale_ttl=WAQI_CACHE_STALE_TTL,
+    shared=shared_store,  # reused by every worker process
+)
+
+
+class WAQIFeedError(Exception):
+    """Raised by the loader for non-ok feed responses so they are never cached."""
+
+    def __init__(self, payload: dict):
+        super().__init__(str(payload.get("data")))
+        self.payload = payload
+
+
+# ---------------- HELPERS ----------------
+def feed_key(city_or_uid) -> str:
+    """Normalise a city name or station uid into a cache key."""
+    if isinstance(city_or_uid, int):
+        return f"@{city_or_uid}"
+    return str(city_or_uid).strip().lower()
+
+
+async def get_waqi_feed(city_or_uid, timeout: float = 10) -> dict:
+    """
+    Return the raw WAQI `/feed/` JSON for a city name or station uid.
+    Only `status == "ok"` responses are cached; error payloads are returned as-is.
+    Raises UpstreamError if the upstream is unreachable and nothing
+    (not even a stale entry) is cached.
+    """
+    key = feed_key(city_or_uid)
+    path = key if key.startswith("@") else city_or_uid
+
+    async def load() -> dict:
+        data = await http_client.get_json(
+            f"{WAQI_BASE_URL}/feed/{path}/", params={"token": WAQI_TOKEN}, timeout=timeout
+        )
+        if data.get("status") != "ok":
+            raise WAQIFeedError(data)
+        return data
+
+    try:
+        return await feed_cache.aget_or_load(key, load)
+    except WAQIFeedError as e:
+        return e.payload
+
+
+async def search_stations(keyword: str, timeout: float = 8) -> dict:
+    """Raw WAQI `/search/` JSON for a keyword. Raises UpstreamError on transport failure."""
+    return await http_client.get_json(
+        f"{WAQI_BASE_URL}/search/", params={"token": WAQI_TOKEN, "keyword": keyword}, timeout=timeout
+    )
+
+
+async def map_bounds(latlng: str, timeout: float = 10) -> dict:
+    """Raw WAQI `/map/bounds/` JSON for "lat1,lng1,lat2,lng2". Raises UpstreamError on transport failure."""
+    return await http_client.get_json(
+        f"{WAQI_BASE_URL}/map/bounds/", params={"token": WAQI_TOKEN, "latlng": latlng}, timeout=timeout
+    )
@@ -5,7 +5,17 @@ set -euo pipefail
 mkdir -p /data
 export USERS_DB_PATH=/data/users.db
 
+# Files shared by all workers on this instance (SQLite in WAL mode + leader lock)
+export SHARED_CACHE_PATH=${SHARED_CACHE_PATH:-/tmp/aqi_shared_cache.db}
+export LEADER_LOCK_PATH=${LEADER_LOCK_PATH:-/tmp/aqi_leader.lock}
+
 # Ensure virtualenv / deps are available (Render runs Build Command before Start)
 
-# Start the app (single worker to avoid SQLite concurrency issues)
-exec gunicorn -k uvicorn.workers.UvicornWorker Backend.main:app --bind 0.0.0.0:$PORT --workers 1
+# Start the app: one worker per core by default. --preload imports the app (dataset,
+# models) once in the master so workers share those pages copy-on-write; background
+# jobs run in a single elected worker (Backend/leader.py).
+WORKERS=${WEB_CONCURRENCY:-$(nproc 2>/dev/null || echo 2)}
+# Upstream rate budgets are per instance; each worker takes its share (Backend/http_client.py)
+export WEB_CONCURRENCY=$WORKERS
+exec gunicorn -k uvicorn.workers.UvicornWorker Backend.main:app --bind 0.0.0.0:$PORT \
+    --workers "$WORKERS" --preload
@@ -1,18 +1,38 @@
 import os
+import io
 import csv
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from pathlib import Path
 
+# Optional: serialise concurrent runs (cron overlap) on POSIX
+try:
+    import fcntl
+    HAS_FCNTL = True
+except Exception:
+    HAS_FCNTL = False
+
 # ---------- CONFIG ----------
 
 # Use env var in production; fallback to your token for local testing
 WAQI_TOKEN = os.getenv("WAQI_TOKEN", "9fe0a55684bf08d8c8131b1cba6233542f86f55d")
 
-# ABSOLUTE PATH TO YOUR EXISTING CSV  (change only if your path is different)
-CSV_PATH = Path(r"C:\Users\acer\Air Pollution\Backend\Dataset\aqi_timeseries.csv")
+# Same file the API loads (Backend/main.py); override with AQI_CSV_PATH for cron jobs
+CSV_PATH = Path(os.getenv("AQI_CSV_PATH") or Path(__file__).parent / "Dataset" / "aqi_timeseries.csv")
 DATASET_DIR = CSV_PATH.parent
 
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "8"))
+INGEST_RETRIES = int(os.getenv("INGEST_RETRIES", "3"))
+INGEST_TIMEOUT = float(os.getenv("INGEST_TIMEOUT", "15"))
+# Today's rows are always near the end of the file, so only the tail is scanned
+INGEST_TAIL_BYTES = int(os.getenv("INGEST_TAIL_BYTES", str(1024 * 1024)))
+
+# Header written for a new file; matches the existing dataset and the API's reader
+DEFAULT_COLUMNS = ["date", "city", "aqi"]
+DEFAULT_DELIMITER = ","
+
 # Same cities as used in your app (you can extend this)
 INDIAN_CITIES = [
     "Delhi", "Mumbai", "Bangalore", "Chennai", "Kolkata", "Hyderabad",
@@ -25,47 +45,76 @@ INDIAN_CITIES = [
 # ---------- HELPERS ----------
 
 def fetch_city_aqi(city: str) -> int | None:
-    """Fetch current AQI for a city from WAQI. Returns int or None."""
+    """Fetch current AQI for a city from WAQI, retrying transport errors. Returns int or None."""
     url = f"https://api.waqi.info/feed/{city}/"
-    try:
-        res = requests.get(url, params={"token": WAQI_TOKEN}, timeout=15)
-        res.raise_for_status()
-        data = res.json()
+    for attempt in range(1, INGEST_RETRIES + 1):
+        try:
+            res = requests.get(url, params={"token": WAQI_TOKEN}, timeout=INGEST_TIMEOUT)
+            res.raise_for_status()
+            data = res.json()
+        except Exception as e:
+            if attempt == INGEST_RETRIES:
+                print(f"[ERROR] Fetching {city}: {e}")
+                return None
+            time.sleep(2 ** (attempt - 1))
+            continue
         if data.get("status") != "ok":
             print(f"[WARN] No data for {city}: {data.get('data')}")
             return None
         aqi = data["data"].get("aqi")
         if aqi is None or aqi == "-":
             return None
-        return int(aqi)
-    except Exception as e:
-        print(f"[ERROR] Fetching {city}: {e}")
-        return None
+        try:
+            return int(aqi)
+        except (TypeError, ValueError):
+            return None
+    return None
 
 def ensure_csv_header():
     DATASET_DIR.mkdir(parents=True, exist_ok=True)
-    if not CSV_PATH.exists():
+    if not CSV_PATH.exists() or CSV_PATH.stat().st_size == 0:
         with CSV_PATH.open("w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f, delimiter="\t")
-            writer.writerow(["city", "aqi", "date"])
+            writer = csv.writer(f, delimiter=DEFAULT_DELIMITER)
+            writer.writerow(DEFAULT_COLUMNS)
         print(f"[INFO] Created new CSV with header at {CSV_PATH}")
     else:
         print(f"[INFO] Using existing CSV at {CSV_PATH}")
 
-def already_has_today(city: str, today_str: str) -> bool:
-    if not CSV_PATH.exists():
-        return False
-    with CSV_PATH.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        for row in reader:
-            if row.get("city") == city and row.get("date") == today_str:
-                return True
-    return False
-
-def append_today_row(city: str, aqi: int, today_str: str):
-    with CSV_PATH.open("a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f, delimiter="\t")
-        writer.writerow([city, aqi, today_str])
+def read_layout(f) -> tuple[str, list[str]]:
+    """Delimiter and column order from the header line."""
+    f.seek(0)
+    header = f.readline().decode("utf-8-sig").strip()
+    delimiter = "\t" if "\t" in header else ","
+    columns = [c.strip().lower() for c in header.split(delimiter)]
+    return delimiter, columns
+
+def existing_keys(f, delimiter: str, columns: list[str]) -> tuple[set, bool]:
+    """
+    (city, date) pairs found in the last INGEST_TAIL_BYTES of the file, and
+    whether the file ends with a newline.
+    """
+    size = f.seek(0, os.SEEK_END)
+    start = max(0, size - INGEST_TAIL_BYTES)
+    f.seek(start)
+    raw = f.read()
+    ends_with_newline = raw.endswith(b"\n")
+    # Drop the header (start == 0) or the partial first line of the tail window
+    tail = raw.decode("utf-8-sig", errors="replace").split("\n", 1)
+    tail = tail[1] if len(tail) > 1 else ""
+
+    city_i, date_i = columns.index("city"), columns.index("date")
+    keys = set()
+    for row in csv.reader(io.StringIO(tail), delimiter=delimiter):
+        if len(row) > max(city_i, date_i):
+            keys.add((row[city_i].strip().lower(), row[date_i].strip()))
+    return keys, ends_with_newline
+
+def format_rows(rows: list[dict], delimiter: str, columns: list[str]) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=delimiter, lineterminator="\n")
+    for row in rows:
+        writer.writerow([row.get(col, "") for col in columns])
+    return buf.getvalue()
 
 # ---------- MAIN ----------
 
@@ -76,19 +125,42 @@ def main():
     print(f"[INFO] Updating AQI CSV for {today_str}")
     print(f"[INFO] Target CSV: {CSV_PATH}")
 
-    for city in INDIAN_CITIES:
-        if already_has_today(city, today_str):
-            print(f"[SKIP] {city} already has entry for {today_str}")
-            continue
-
-        aqi = fetch_city_aqi(city)
-        if aqi is not None:
-            append_today_row(city, aqi, today_str)
-            print(f"[OK] {city}: {aqi}")
-        else:
-            print(f"[MISS] {city}: no AQI value")
-
-    print("[INFO] Done.")
+    with CSV_PATH.open("rb+") as f:
+        if HAS_FCNTL:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)  # released when the file is closed
+
+        delimiter, columns = read_layout(f)
+        if not {"city", "aqi", "date"} <= set(columns):
+            raise SystemExit(f"[ERROR] Unexpected header in {CSV_PATH}: {columns}")
+        have, ends_with_newline = existing_keys(f, delimiter, columns)
+
+        todo = [c for c in INDIAN_CITIES if (c.lower(), today_str) not in have]
+        for city in INDIAN_CITIES:
+            if city not in todo:
+                print(f"[SKIP] {city} already has entry for {today_str}")
+
+        with ThreadPoolExecutor(max_workers=INGEST_CONCURRENCY) as pool:
+            results = list(pool.map(fetch_city_aqi, todo))
+
+        new_rows = []
+        for city, aqi in zip(todo, results):
+            if aqi is not None:
+                new_rows.append({"city": city, "aqi": aqi, "date": today_str})
+                print(f"[OK] {city}: {aqi}")
+            else:
+                print(f"[MISS] {city}: no AQI value")
+
+        if new_rows:
+            # One write of whole lines, so readers never see a partial day
+            payload = format_rows(new_rows, delimiter, columns)
+            if not ends_with_newline:
+                payload = "\n" + payload
+            f.seek(0, os.SEEK_END)
+            f.write(payload.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    print(f"[INFO] Done. Appended {len(new_rows)} rows.")
 
 if __name__ == "__main__":
     main()